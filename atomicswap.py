@@ -8,57 +8,100 @@ Email: hal0x2328@splyse.tech
 Date: May 8 2018
 
 This code demonstrates atomic NEP-5 token swap using contract-tradable tokens
-This contract is deployed on the Neo TestNet at the address
-ATom1c3QN46UCbpELUyJBCwF2Q7HLhxDjjtx
+
+Requires an MCT with the batched staked storage operations GetMany and
+PutMany. No deployed MCT provides them yet, neither the TestNet tokens nor
+mct-privnet.avm, so for now this contract only runs in the local emulator
+(see docs/emulator.md).
+
+One deployment serves any number of tokens. The owner registers the
+accepted token scripthashes and sets a rate per direction of each pair;
+the contract calls the tokens dynamically, so it has to be deployed with
+dynamic invoke enabled, which adds 500 GAS to the deployment fee
+(python -m mct_tools.analyze shows the total). Staked storage is paid for
+with CTX (MCT_HASH).
+
+The contract keeps its own count of the tokens it holds under
+'reserve/' + token scripthash, updated on owner top-ups, swaps and
+ownerWithdraw, so a swap does not have to ask the token contract for the
+balance. Tokens sent to the contract without onTokenTransfer (such as the
+initial storage stake) are not counted until the owner invokes
+resyncReserves, which sets the counters to the actual balances.
+ownerWithdraw only pays out counted tokens, so a counter never goes
+below zero, and keeps the storage stake in the contract.
+
+This trades GAS for app calls: a swap replaces the balanceOf call with
+the write of both counters, and storage writes cost at least 1 GAS each.
+In the emulator a completed swap costs about 12 GAS instead of 9.2, which
+is above the 10 GAS free allowance, while a rejected swap makes one app
+call less.
+
+Storage
+-------
+
+'token/' + token                  token is accepted (registered by the owner)
+fromtoken + totoken               rate, totoken units per fromtoken * 10^8
+'reserve/' + token                tokens held by the contract
+
+Contract operations
+-------------------
+
+# owner
+registerToken(token)
+unregisterToken(token)
+setExchangeRate(fromtoken, totoken, rate)
+setExchangeRates([[fromtoken, totoken, rate], ...])  # up to 32 pairs
+resyncReserves(token, ...)  # up to 32 tokens
+ownerWithdraw(token, amount)
+
+# anyone
+exchangeRate(fromtoken, totoken)
+
+# relayed from the token transfer() operation; pays out totoken at the
+# current rate, or rejects the transfer if the rate is not desired_rate
+onTokenTransfer(from, to, amount, totoken[, desired_rate[, max_slippage]])
+
+Slippage and partial fills
+--------------------------
+
+Without max_slippage a swap with a desired_rate only goes through at
+exactly that rate. With it, any rate at most max_slippage basis points
+(1/100 of a percent) below desired_rate is accepted, as is any higher
+rate, so a swap quoted just before a rate update does not have to be
+retried. Use 0 to accept desired_rate or better.
+
+If the contract holds less of totoken than the swap would pay out, it
+fills as much as it holds and sends the unfilled part of the amount back
+in the same invocation. The incoming tokens only reach the contract after
+onTokenTransfer returns, so the refund is paid from its reserve of the
+token sent; if that is too small as well, the transfer is rejected.
 
 """
 from boa.interop.Neo.Runtime import GetTrigger, CheckWitness
 from boa.interop.Neo.TriggerType import Application, Verification
 from boa.interop.System.ExecutionEngine import GetExecutingScriptHash, GetCallingScriptHash
-from boa.interop.Neo.App import RegisterAppCall
+from boa.interop.Neo.App import RegisterAppCall, DynamicAppCall
 from boa.builtins import concat
 
 OWNER = b'\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00'
 minimum_hold = 10000 * 100000000  # contract must maintain this amount of tokens for staked storage
 
-# TestNet CTX
-TOKEN1 = b'\xe7\xb12\xb9\x95\xf4=\xbb\xdd\xd2\xa3&\x8a\x04\xa2\xae\x08\x1e\xff\x9a'
-
-# TestNet CTY
-TOKEN2 = b'\xe7\xb2\x06\xc4\xc6#\xebGKQ\x03>M\x10\xdd\x94\xc9\xcb\xd9\x81'
-
-Token1Contract = RegisterAppCall('9aff1e08aea2048a26a3d2ddbb3df495b932b1e7', 'operation', 'args')
-Token2Contract = RegisterAppCall('81d9cbc994dd104d3e03514b47eb23c6c406b2e7', 'operation', 'args')
+# TestNet CTX, the token staked for storage
+MCT_HASH = b'\xe7\xb12\xb9\x95\xf4=\xbb\xdd\xd2\xa3&\x8a\x04\xa2\xae\x08\x1e\xff\x9a'
+MCTContract = RegisterAppCall('9aff1e08aea2048a26a3d2ddbb3df495b932b1e7', 'operation', 'args')
 
 def Main(operation, args):
 
-    trigger = GetTrigger()
-
-    if trigger == Verification():
-        if CheckWitness(OWNER):
-            return True
-
-        return False
+    # Most frequent operations first; handlers load the constants they use
+    # (see mct-dapp-template.py)
 
-    elif trigger == Application():
-        if operation == 'setExchangeRate':
-            if not CheckWitness(OWNER):
-                return False
-
-            if len(args) != 3:
-                return False
-
-            fromtoken = args[0]
-            totoken = args[1]
-            rate = args[2]
-            
-            tokenkey = concat(fromtoken, totoken)
+    trigger = GetTrigger()
 
-            if len(tokenkey) != 40:
-                return False
+    if trigger == Application():
+        if operation == 'onTokenTransfer':
+            print('onTokenTransfer() called')
+            return handle_token_received(GetCallingScriptHash(), args)
 
-            return Put(tokenkey, rate)
- 
         if operation == 'exchangeRate':
             if len(args) != 2:
                 return False
@@ -73,43 +116,150 @@ def Main(operation, args):
 
             return Get(tokenkey)
 
-        if operation == 'ownerWithdraw':
-            if not CheckWitness(OWNER):
-                return False
+        return owner_operation(operation, args)
 
-            if len(args) != 2:
-                return False
-         
-            t_scripthash = args[0]
-            t_amount = args[1]
+    elif trigger == Verification():
+        return verify()
+
+    return False
+
+
+def verify():
+    if CheckWitness(OWNER):
+        return True
+
+    return False
+
+
+def owner_operation(operation, args):
+
+    if not CheckWitness(OWNER):
+        return False
+
+    if operation == 'setExchangeRate':
+        if len(args) != 3:
+            return False
+
+        return set_exchange_rates([args])
+
+    if operation == 'setExchangeRates':
+        if len(args) != 1:
+            return False
+
+        return set_exchange_rates(args[0])
 
-            myhash = GetExecutingScriptHash()
+    if operation == 'ownerWithdraw':
+        if len(args) != 2:
+            return False
+     
+        t_scripthash = args[0]
+        t_amount = args[1]
+
+        if t_amount <= 0:
+            return False
+
+        # only counted tokens can be withdrawn, and never the storage stake
+        reservekey = concat('reserve/', t_scripthash)
+        reserve = Get(reservekey)
+        available = reserve
+        if t_scripthash == MCT_HASH:
+            available = reserve - minimum_hold
+
+        if t_amount > available:
+            print('amount is more than the counted reserve, invoke resyncReserves first')
+            return False
+
+        myhash = GetExecutingScriptHash()
 
-            if t_scripthash == TOKEN1: 
-                return Token1Contract('transfer', [myhash, OWNER, t_amount])
-            elif t_scripthash == TOKEN2: 
-                return Token2Contract('transfer', [myhash, OWNER, t_amount])
+        success = DynamicAppCall(t_scripthash, 'transfer', [myhash, OWNER, t_amount])
+
+        if success:
+            Put(reservekey, reserve - t_amount)
+        return success
+
+    if operation == 'resyncReserves':
+        count = len(args)
+
+        if count == 0:
+            return False
+
+        if count > 32:
+            print('too many tokens, the limit is 32')
+            return False
 
-        chash = GetCallingScriptHash()
+        myhash = GetExecutingScriptHash()
+        reservekeys = []
+        balances = []
 
-        if chash != TOKEN1:
-            if chash != TOKEN2:  # for some reason comparing these with "and"
-                                 # returns an extra value on evaluation stack
-                print('Token type not accepted by this contract')
+        for token in args:
+            if len(token) != 20:
                 return False
 
-        if operation == 'onTokenTransfer':
-            print('onTokenTransfer() called')
-            return handle_token_received(chash, args)
+            reservekeys.append(concat('reserve/', token))
+            balances.append(DynamicAppCall(token, 'balanceOf', [myhash]))
+
+        return PutMany(reservekeys, balances)
+
+    if operation == 'registerToken':
+        if len(args) != 1:
+            return False
+
+        token = args[0]
+
+        if len(token) != 20:
+            return False
+
+        return Put(concat('token/', token), True)
+
+    if operation == 'unregisterToken':
+        if len(args) != 1:
+            return False
+
+        token = args[0]
+
+        if len(token) != 20:
+            return False
+
+        return Delete(concat('token/', token))
 
     return False
 
 
+def set_exchange_rates(pairs):
+
+    count = len(pairs)
+
+    if count == 0:
+        return False
+
+    if count > 32:
+        print('too many pairs, the limit is 32')
+        return False
+
+    tokenkeys = []
+    rates = []
+
+    for pair in pairs:
+        if len(pair) != 3:
+            return False
+
+        tokenkey = concat(pair[0], pair[1])
+
+        if len(tokenkey) != 40:
+            return False
+
+        tokenkeys.append(tokenkey)
+        rates.append(pair[2])
+
+    return PutMany(tokenkeys, rates)
+
+
 def handle_token_received(chash, args):
   
     swap_rate = 0
     desired_rate = 0
     current_balance = 0
+    totoken = ''
 
     arglen = len(args)
 
@@ -121,8 +271,11 @@ def handle_token_received(chash, args):
     t_to = args[1]
     t_amount = args[2]
 
-    if arglen == 4:
-        desired_rate = args[3]  # optional 4th argument passed by transfer()
+    if arglen > 3:
+        totoken = args[3]  # 4th argument passed by transfer()
+
+    if arglen > 4:
+        desired_rate = args[4]  # optional 5th argument
 
     if len(t_from) != 20:
         return False
@@ -137,45 +290,107 @@ def handle_token_received(chash, args):
 
     if t_from == OWNER:
         # topping up contract token balance
-        return True
+        reservekey = concat('reserve/', chash)
+        topup = GetMany([concat('token/', chash), reservekey])
+
+        if not topup[0]:
+            print('Token type not accepted by this contract')
+            return False
+
+        return Put(reservekey, topup[1] + t_amount)
+
+    if len(totoken) != 20:
+        print('token to swap to not specified')
+        return False
+
+    if totoken == chash:
+        print('cannot swap a token for itself')
+        return False
 
-    if chash == TOKEN1:
-        swap_rate = Get(concat(TOKEN1, TOKEN2)) 
-        current_balance = Token2Contract('balanceOf', [myhash])
-    elif chash == TOKEN2:
-        swap_rate = Get(concat(TOKEN2, TOKEN1))
-        current_balance = Token1Contract('balanceOf', [myhash])
+    # the pair's rate, both reserves and both registry entries in one
+    # staked storage call
+    reservekeys = [concat('reserve/', chash), concat('reserve/', totoken)]
+    tokenkeys = [concat('token/', chash), concat('token/', totoken)]
+    swap = GetMany([concat(chash, totoken), reservekeys[0], reservekeys[1], tokenkeys[0], tokenkeys[1]])
+    swap_rate = swap[0]
+    current_balance = swap[2]
+
+    if not swap[3]:
+        print('Token type not accepted by this contract')
+        return False
+
+    if not swap[4]:
+        print('Token type not accepted by this contract')
+        return False
 
     if swap_rate == 0:
         print('swap rate has not been set for this token pair')
         return False
 
     if desired_rate > 0:
-        if swap_rate != desired_rate:
+        if arglen > 5:
+            # optional 6th argument, in basis points below desired_rate
+            max_slippage = args[5]
+            if max_slippage < 0 or max_slippage > 10000:
+                print('max_slippage must be 0 to 10000 basis points')
+                return False
+            if swap_rate * 10000 < desired_rate * (10000 - max_slippage):
+                print('swap rate is more than max_slippage below desired_rate')
+                return False
+        elif swap_rate != desired_rate:
             print('could not meet desired swap_rate, invoke exchangeRate again')
             return False
 
     tokens_out = swap_rate * t_amount / 100000000
+    refund = 0
+
+    if totoken == MCT_HASH:
+        current_balance = current_balance - minimum_hold
 
     print('check balance')
-    if tokens_out > current_balance - minimum_hold:
-        print('cannot fulfill order, insufficient balance in contract')
-        return False
+    if tokens_out > current_balance:
+        # fill what the reserve allows and refund the rest of the amount
+        filled = current_balance * 100000000 / swap_rate
+        tokens_out = swap_rate * filled / 100000000
+        refund = t_amount - filled
+
+        refundable = swap[1]
+        if chash == MCT_HASH:
+            refundable = refundable - minimum_hold
+
+        if tokens_out <= 0 or refund > refundable:
+            print('cannot fulfill order, insufficient balance in contract')
+            return False
 
     print('Executing transfer')
-    if chash == TOKEN1: 
-        return Token2Contract('transfer', [myhash, t_from, tokens_out])
-    elif chash == TOKEN2: 
-        return Token1Contract('transfer', [myhash, t_from, tokens_out])
+    success = DynamicAppCall(totoken, 'transfer', [myhash, t_from, tokens_out])
 
-    return False
+    # returning False does not revert storage, so only count a completed swap
+    if success:
+        if refund > 0:
+            # the payout has been made, so a failed refund must fault the
+            # invocation rather than just reject the transfer
+            refunded = DynamicAppCall(chash, 'transfer', [myhash, t_from, refund])
+            if not refunded:
+                raise Exception('refund of the unfilled amount failed')
+        PutMany(reservekeys, [swap[1] + t_amount - refund, swap[2] - tokens_out])
+    return success
 
 
 def Get(key):
-   return Token1Contract('Get', [key])
+   return MCTContract('Get', [key])
 
 def Delete(key):
-    return Token1Contract('Delete', [key]) 
+    return MCTContract('Delete', [key]) 
 
 def Put(key, value):
-   return Token1Contract('Put', [key, value])
+   return MCTContract('Put', [key, value])
+
+def GetMany(keys):
+    return MCTContract('GetMany', [keys])
+
+def DeleteMany(keys):
+    return MCTContract('DeleteMany', [keys])
+
+def PutMany(keys, values):
+    return MCTContract('PutMany', [keys, values])
@@ -7,7 +7,8 @@ Email: hal0x2328@splyse.tech
 
 Date: May 8 2018
 
-This code demonstrates use of MCT receive/send and staked storage functions
+This code demonstrates use of MCT receive/send and staked storage functions,
+and the dispatch layout in Main is a good starting point for new contracts
 
 Deployment in neo-python:
 
@@ -34,57 +35,72 @@ MCTContract = RegisterAppCall('c186bcb4dc6db8e08be09191c6173456144c4b8d', 'opera
 
 def Main(operation, args):
 
-    trigger = GetTrigger()
+    # Operations are dispatched in order of how often they are called, so
+    # the common case skips the fewest comparisons (each failed one costs
+    # about 7 opcodes). Main itself uses no module-level constants:
+    # neo-boa copies every constant a function uses into a local each time
+    # the function is called, so they belong in the handlers that need them.
 
-    if trigger == Verification():
-        if CheckWitness(OWNER):
-            return True
+    trigger = GetTrigger()
 
-        return False
+    if trigger == Application():
 
-    elif trigger == Application():
+        if operation == 'onTokenTransfer':
+            print('onTokenTransfer() called')
+            return handle_token_received(GetCallingScriptHash(), args)
 
         if operation == 'hello':
-            print('hello world!')
-            totalcalls = Get('totalCalls')
-            totalcalls = totalcalls + 1
-            print(totalcalls)
-            if Put('totalCalls', totalcalls):
-                return True
-            print('staked storage call failed')
-            return False
+            return hello()
          
         if operation == 'ownerWithdraw':
-            if not CheckWitness(OWNER):
-                print('only the contract owner can withdraw MCT from the contract')
-                return False
+            return owner_withdraw(args)
 
-            if len(args) != 1:
-                print('withdraw amount not specified')
-                return False
-         
-            t_amount = args[0]
-            myhash = GetExecutingScriptHash()
+    elif trigger == Verification():
+        return verify()
 
-            return MCTContract('transfer', [myhash, OWNER, t_amount])
+    return False
 
-        # end of normal invocations, reject any non-MCT invocations
 
-        caller = GetCallingScriptHash()
+def verify():
+    if CheckWitness(OWNER):
+        return True
 
-        if caller != MCT_SCRIPTHASH:
-            print('token type not accepted by this contract')
-            return False
+    return False
 
-        if operation == 'onTokenTransfer':
-            print('onTokenTransfer() called')
-            return handle_token_received(caller, args)
 
+def hello():
+    print('hello world!')
+    totalcalls = Get('totalCalls')
+    totalcalls = totalcalls + 1
+    print(totalcalls)
+    if Put('totalCalls', totalcalls):
+        return True
+    print('staked storage call failed')
     return False
 
 
+def owner_withdraw(args):
+    if not CheckWitness(OWNER):
+        print('only the contract owner can withdraw MCT from the contract')
+        return False
+
+    if len(args) != 1:
+        print('withdraw amount not specified')
+        return False
+         
+    t_amount = args[0]
+    myhash = GetExecutingScriptHash()
+
+    return MCTContract('transfer', [myhash, OWNER, t_amount])
+
+
 def handle_token_received(chash, args):
 
+    # reject any non-MCT invocations
+    if chash != MCT_SCRIPTHASH:
+        print('token type not accepted by this contract')
+        return False
+
     arglen = len(args)
 
     if arglen < 3:
@@ -138,3 +154,12 @@ def Delete(key):
 def Put(key, value):
     return MCTContract('Put', [key, value])
 
+def GetMany(keys):
+    return MCTContract('GetMany', [keys])
+
+def DeleteMany(keys):
+    return MCTContract('DeleteMany', [keys])
+
+def PutMany(keys, values):
+    return MCTContract('PutMany', [keys, values])
+
@@ -14,6 +14,9 @@ the original payee to sell their interest in the locked tokens, while
 still allowing the depositor to do KYC checks on the new payee before 
 approving the change.
 
+Each deployment holds a single lock. To hold many locks, optionally
+vesting in tranches, in one deployment see mct-vesting-contract.py.
+
 The amount of tokens locked in the contract must be greater than the
 minimum MCT contract storage stake in order for the storage functions 
 to work that permit the payee address to be changed.
@@ -34,6 +37,7 @@ from boa.interop.Neo.Runtime import GetTrigger, CheckWitness
 from boa.interop.Neo.TriggerType import Application, Verification
 from boa.interop.System.ExecutionEngine import GetExecutingScriptHash, GetCallingScriptHash
 from boa.interop.Neo.App import RegisterAppCall
+from boa.builtins import concat, substr
 
 # Party1 is the depositor, who is sending funds to be locked in the contract
 PARTY1 = b'#\xba\'\x03\xc52c\xe8\xd6\xe5"\xdc2 39\xdc\xd8\xee\xe9'
@@ -43,6 +47,13 @@ PARTY2 = b'\x8a\xed\xf3\xc92;\xd2\xeb\xb6\x8b\xe7mi\x9b=\xa4m{wz'
 
 unlockTime = 1531501200  # soon. real soon
 
+# The payee and the pending payee change approvals are stored together
+# under the key 'p': the current payee (20 bytes), then the new payee
+# proposed by Party1 and the one proposed by the current payee (20 bytes
+# each, all zero if none). Until a change is approved there is no record
+# and PARTY2 is the payee.
+NO_APPROVALS = b'\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00'
+
 # mainnet
 #MCT_SCRIPTHASH = b'?\xbc`|\x12\xc2\x87642$\xa4\xb4\xd8\xf5\x13\xa5\xc2|\xa8'
 # privatenet
@@ -55,123 +66,162 @@ MCTContract = RegisterAppCall('c186bcb4dc6db8e08be09191c6173456144c4b8d', 'opera
 
 def Main(operation, args):
 
+    # Most frequent operations first; handlers load the constants they use
+    # (see mct-dapp-template.py)
+
     trigger = GetTrigger()
 
-    if trigger == Verification():
+    if trigger == Application():
+
+        if operation == 'onTokenTransfer':
+            return handle_token_received(GetCallingScriptHash())
+
+        if operation == 'withdraw':
+            return withdraw()
+
+        if operation == 'setNewPayee':
+            return set_new_payee(args)
+
+        if operation == 'getCurrentPayee':
+            return get_current_payee()
+
+        if operation == 'getUnlockTime':
+            return get_unlock_time()
+
+    elif trigger == Verification():
         # This should never be necessary but just in case someone
         # accidentally sends non-MCT assets to the contract they 
         # can be recovered instead of being burned forever
 
-        if CheckWitness(PARTY1):
-            return True
+        return verify()
+
+    return False
 
+
+def verify():
+    if CheckWitness(PARTY1):
+        return True
+
+    return False
+
+
+# onTokenTransfer - reject any non-MCT invocations, and any transfer not made
+# by the depositor
+
+def handle_token_received(caller):
+    if caller != MCT_SCRIPTHASH:
+        print('token type not accepted by this contract')
         return False
 
-    elif trigger == Application():
+    if CheckWitness(PARTY1):
+        return True  # this is how party 1 deposits stake+locked tokens
 
-        # setNewPayee(newPayee) - if the current payee wants to assign
-        # the tokens to another party, the contract payee can be changed
-        # but only if both the depositor and current payee agree
-        
-        if operation == 'setNewPayee':
-            if len(args) != 1:
-                print('New payee scripthash not specified')
-                return False
+    print('onTokenTransfer() called from address other than party 1')
+    return False
+
+
+# setNewPayee(newPayee) - if the current payee wants to assign
+# the tokens to another party, the contract payee can be changed
+# but only if both the depositor and current payee agree
+
+def set_new_payee(args):
+    if len(args) != 1:
+        print('New payee scripthash not specified')
+        return False
          
-            new_payee = args[0]
-
-            if len(new_payee) != 20:
-                print('Incorrect new payee scripthash length')
-                return False
-
-            current_payee = Get('payee')
-
-            if len(current_payee) != 20:
-                current_payee = PARTY2
-
-            if CheckWitness(PARTY1):  # depositor approval
-                party2_payee = Get('Party2_Payee_Change_Approval')
-                if new_payee == party2_payee:
-                    Put('payee', new_payee) 
-                    Delete('Party1_Payee_Change_Approval')
-                    Delete('Party2_Payee_Change_Approval')
-                else:  
-                    Put('Party1_Payee_Change_Approval', new_payee)
-                return True
-
-            if CheckWitness(current_payee):  # current payee approval
-                party1_payee = Get('Party1_Payee_Change_Approval')
-                if new_payee == party1_payee:
-                    Put('payee', new_payee) 
-                    Delete('Party1_Payee_Change_Approval')
-                    Delete('Party2_Payee_Change_Approval')
-                else:  
-                    Put('Party1_Payee_Change_Approval', new_payee)
-                return True
-
-            print('Not authorized to approve payee change')
-            return False
-
-
-        # getCurrentPayee() - return currently set payee value
-        
-        if operation == 'getCurrentPayee':
-            current_payee = Get('payee')
+    new_payee = args[0]
 
-            if len(current_payee) != 20:
-                current_payee = PARTY2
+    if len(new_payee) != 20:
+        print('Incorrect new payee scripthash length')
+        return False
 
-            return current_payee
+    no_payee = substr(NO_APPROVALS, 0, 20)
+    if new_payee == no_payee:
+        print('Incorrect new payee scripthash')
+        return False
 
-            
-        # getUnlockTime() - return hard-coded unlock timestamp
+    # A change usually goes: the depositor proposes a new payee for PARTY2,
+    # then PARTY2 approves it. Each step is first tried as one conditional
+    # write, which MCT only makes if the record is in that expected state.
+    proposal = concat(concat(PARTY2, new_payee), no_payee)
+    depositor = CheckWitness(PARTY1)
+    if depositor:
+        if PutIfAbsent('p', proposal):
+            return True
+    elif CheckWitness(PARTY2):
+        if CompareAndSwap('p', proposal, concat(new_payee, NO_APPROVALS)):
+            return True
 
-        if operation == 'getUnlockTime':
-            return unlockTime
+    # otherwise the payee and both pending approvals, one read and one write
+    state = Get('p')
+    if len(state) != 60:
+        state = concat(PARTY2, NO_APPROVALS)
+
+    current_payee = substr(state, 0, 20)
+    party1_payee = substr(state, 20, 20)
+    party2_payee = substr(state, 40, 20)
+
+    if depositor:  # depositor approval
+        if new_payee == party2_payee:
+            Put('p', concat(new_payee, NO_APPROVALS))
+        else:  
+            Put('p', concat(concat(current_payee, new_payee), party2_payee))
+        return True
+
+    if CheckWitness(current_payee):  # current payee approval
+        if new_payee == party1_payee:
+            Put('p', concat(new_payee, NO_APPROVALS))
+        else:  
+            Put('p', concat(concat(current_payee, party1_payee), new_payee))
+        return True
+
+    print('Not authorized to approve payee change')
+    return False
 
 
-        # withdraw() - if this operation is called after the unlock
-        # period, the entire contract balance will be automatically
-        # transferred to the current payee 
+# getCurrentPayee() - return currently set payee value
 
-        if operation == 'withdraw':
-            header = GetHeader(GetHeight())
-            if header.Timestamp < unlockTime:
-                print('unlock period has not yet expired')
-                return False
+def get_current_payee():
+    current_payee = substr(Get('p'), 0, 20)
 
-            # This contract's script hash, owner of the locked MCT tokens
-            myhash = GetExecutingScriptHash()
-            
-            # Payout to current payee address
-            payee = Get('payee')
+    if len(current_payee) != 20:
+        current_payee = PARTY2
 
-            if len(payee) != 20:
-                payee = PARTY2
+    return current_payee
 
-            t_amount = MCTContract('balanceOf', [myhash])
 
-            if t_amount > 0:
-                print('Transferring all funds in contract to payee')
-                return MCTContract('transfer', [myhash, payee, t_amount])
-            else:
-                print('No funds in contract')
-            return False
-    
-        # end of normal invocations, reject any non-MCT invocations
+# getUnlockTime() - return hard-coded unlock timestamp
 
-        caller = GetCallingScriptHash()
+def get_unlock_time():
+    return unlockTime
 
-        if caller != MCT_SCRIPTHASH:
-            print('token type not accepted by this contract')
-            return False
 
-        if operation == 'onTokenTransfer':
-            if CheckWitness(PARTY1):
-                return True  # this is how party 1 deposits stake+locked tokens
+# withdraw() - if this operation is called after the unlock
+# period, the entire contract balance will be automatically
+# transferred to the current payee 
+
+def withdraw():
+    header = GetHeader(GetHeight())
+    if header.Timestamp < unlockTime:
+        print('unlock period has not yet expired')
+        return False
+
+    # This contract's script hash, owner of the locked MCT tokens
+    myhash = GetExecutingScriptHash()
+            
+    # Payout to current payee address
+    payee = substr(Get('p'), 0, 20)
+
+    if len(payee) != 20:
+        payee = PARTY2
 
-            print('onTokenTransfer() called from address other than party 1')
+    t_amount = MCTContract('balanceOf', [myhash])
 
+    if t_amount > 0:
+        print('Transferring all funds in contract to payee')
+        return MCTContract('transfer', [myhash, payee, t_amount])
+    else:
+        print('No funds in contract')
     return False
 
 # Staked storage appcalls
@@ -185,3 +235,21 @@ def Delete(key):
 def Put(key, value):
     return MCTContract('Put', [key, value])
 
+def GetMany(keys):
+    return MCTContract('GetMany', [keys])
+
+def DeleteMany(keys):
+    return MCTContract('DeleteMany', [keys])
+
+def PutMany(keys, values):
+    return MCTContract('PutMany', [keys, values])
+
+def PutIfAbsent(key, value):
+    return MCTContract('PutIfAbsent', [key, value])
+
+def CompareAndSwap(key, expected, value):
+    return MCTContract('CompareAndSwap', [key, expected, value])
+
+def DeleteIfEquals(key, expected):
+    return MCTContract('DeleteIfEquals', [key, expected])
+
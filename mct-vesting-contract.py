@@ -0,0 +1,339 @@
+"""
+MCT Vesting Contract Example
+============================================
+
+This contract holds any number of MCT locks in one deployment. Each
+deposit creates its own lock, with its own depositor, payee and unlock
+time, so escrowed payouts don't each need a separately compiled copy of
+mct-lock-contract.py with its own deployment and 10,000 MCT stake.
+
+Requires an MCT with the batched staked storage operations GetMany,
+PutMany and DeleteMany. No deployed MCT provides them yet, neither the
+TestNet tokens nor mct-privnet.avm, so for now this contract only runs in
+the local emulator (see docs/emulator.md).
+
+A lock can optionally vest in tranches: the amount is split into equal
+parts that unlock one interval apart, the first at the unlock time. A
+payee collects everything that has matured across all of their locks with
+a single withdrawMany, which makes one MCT transfer for the total.
+
+The contract owner stakes the 10,000 MCT the storage functions need; the
+stake is kept apart from the locked tokens and is never paid out to a
+payee. Payee changes are not supported, use mct-lock-contract.py for a
+lock that needs them.
+
+Contract operations
+-------------------
+
+# relayed from the MCT contract transfer() operation
+onTokenTransfer::[payee, unlock_time]  # locks the transferred amount
+onTokenTransfer::[payee, unlock_time, tranches, interval]  # in tranches
+
+# invoked directly
+withdrawMany(payee)  # pays out every matured tranche of the payee's locks
+rejectLock(lock_id)  # payee only, refunds what is left to the depositor
+lock(lock_id)  # lock record
+locksOf(payee)  # ids of the payee's open locks, 32 bytes each
+
+Storage
+-------
+
+    'lock/' + lock_id               lock record, lock_id is the deposit tx hash
+        offset  length  field
+        0       20      depositor
+        20      20      payee
+        40      1       tranches
+        41      1       tranches still locked
+        42      1       length n of the unlock time
+        43      n       unlock time
+        43+n    1       length m of the interval
+        44+n    m       interval in seconds
+        44+n+m  -       amount
+
+    'locks/' + payee                ids of the payee's open locks
+
+Tranche i (counting from 0) unlocks at unlock time + i * interval and pays
+amount / tranches, except the last one, which also pays the remainder. A
+lock is deleted once its last tranche is paid out. A payee can have up to
+30 open locks, which keeps their lock list within a single 1 KB write.
+Since anyone can open a lock for any payee, the payee can reject locks
+they did not ask for, which returns whatever the lock has not yet paid
+out to its depositor and frees its place in the list.
+
+-----
+Deployment in neo-python:
+
+build mct-vesting-contract.py
+import contract mct-vesting-contract.avm 0710 05 False False
+wallet tkn_send MCT {owner address} {vesting contract address} 1000000000000
+
+# lock 500 MCT for {payee address} until July 13, 2018
+sc invoke {MCT contract hash} transfer ['{from address}','{vesting contract address}',50000000000,
+    ['{payee address}',1531501200]]
+
+"""
+
+from boa.interop.Neo.Blockchain import GetHeader, GetHeight
+from boa.interop.Neo.Block import Timestamp
+from boa.interop.Neo.Runtime import GetTrigger, CheckWitness
+from boa.interop.Neo.TriggerType import Application, Verification
+from boa.interop.System.ExecutionEngine import GetExecutingScriptHash, GetCallingScriptHash, GetScriptContainer
+from boa.interop.Neo.Transaction import GetHash
+from boa.interop.Neo.App import RegisterAppCall
+from boa.builtins import concat, substr
+
+# address that will stake the tokens for the contract to have storage
+OWNER = b'\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00'
+
+# mainnet
+#MCT_SCRIPTHASH = b'?\xbc`|\x12\xc2\x87642$\xa4\xb4\xd8\xf5\x13\xa5\xc2|\xa8'
+# privatenet
+MCT_SCRIPTHASH = b'\x8dKL\x14V4\x17\xc6\x91\x91\xe0\x8b\xe0\xb8m\xdc\xb4\xbc\x86\xc1'
+
+# mainnet
+#MCTContract = RegisterAppCall('a87cc2a513f5d8b4a42432343687c2127c60bc3f', 'operation', 'args')
+# privatenet
+MCTContract = RegisterAppCall('c186bcb4dc6db8e08be09191c6173456144c4b8d', 'operation', 'args')
+
+OnError = RegisterAction('error', 'message')
+
+def Main(operation, args):
+
+    # Most frequent operations first (see mct-dapp-template.py)
+
+    trigger = GetTrigger()
+
+    if trigger == Application():
+
+        if operation == 'onTokenTransfer':
+            return handle_token_received(GetCallingScriptHash(), args)
+
+        arglen = len(args)
+
+        if operation == 'withdrawMany':
+            assert arglen == 1, 'incorrect argument length'
+            return withdrawMany(args[0])
+
+        elif operation == 'rejectLock':
+            assert arglen == 1, 'incorrect argument length'
+            return rejectLock(args[0])
+
+        elif operation == 'lock':
+            assert arglen == 1, 'incorrect argument length'
+            lock = Get(concat('lock/', args[0]))
+            assert len(lock) > 0, 'no such lock exists'
+            return lock
+
+        elif operation == 'locksOf':
+            assert arglen == 1, 'incorrect argument length'
+            return Get(concat('locks/', args[0]))
+
+    elif trigger == Verification():
+        # recovers non-MCT assets sent to the contract by accident
+        return CheckWitness(OWNER)
+
+    AssertionError('unknown operation - code: XxXxXxXx')
+
+
+def handle_token_received(chash, args):
+
+    assert chash == MCT_SCRIPTHASH, 'token type not accepted by this contract'
+
+    arglen = len(args)
+    assert arglen > 2, 'incorrect arg length'
+
+    # parameters of MCT transfer
+    t_from = args[0]
+    t_to = args[1]
+    t_amount = args[2] * 1
+
+    assert len(t_from) == 20, 'invalid address'
+    assert t_to == GetExecutingScriptHash(), 'destination error'
+    assert t_amount > 0, 'no funds transferred'
+
+    if arglen == 3:
+        assert t_from == OWNER, 'lock terms not specified'
+        return True  # just staking MCT tokens for storage
+
+    assert arglen == 4, 'incorrect arg length'
+    p_args = args[3]  # 4th argument passed by MCT transfer()
+    p_len = len(p_args)
+
+    payee = p_args[0]
+    unlock_time = p_args[1] * 1
+    tranches = 1
+    interval = 1
+    if p_len == 4:
+        tranches = p_args[2] * 1
+        interval = p_args[3] * 1
+    else:
+        assert p_len == 2, 'incorrect lock arguments'
+
+    assert len(payee) == 20, 'invalid payee address'
+    assert unlock_time > 0, 'invalid unlock time'
+    assert interval > 0, 'invalid vesting interval'
+    assert tranches > 0, 'invalid number of tranches'
+    assert tranches <= 120, 'too many tranches'
+    assert t_amount >= tranches, 'amount too small to split into tranches'
+
+    tx = GetScriptContainer()
+    lock_id = tx.Hash
+    lock_keys = [concat('lock/', lock_id), concat('locks/', payee)]
+    state = GetMany(lock_keys)
+    assert len(state[0]) == 0, 'one lock per transaction'
+    ids = state[1]
+    assert len(ids) < 960, 'payee has too many open locks'  # 30 ids of 32 bytes
+
+    terms = concat(concat(concat(concat(t_from, payee), tranches), tranches), len(unlock_time))
+    terms = concat(concat(concat(terms, unlock_time), len(interval)), interval)
+    r = PutMany(lock_keys, [concat(terms, t_amount), concat(ids, lock_id)])
+    return True
+
+
+def withdrawMany(payee):
+    """
+    Pay out every tranche of the payee's locks that has matured since the
+    last withdrawal, in one transfer. Anyone may call this; the tokens
+    only ever go to the payee.
+    """
+    index_key = concat('locks/', payee)
+    ids = Get(index_key)
+    count = len(ids) / 32
+    assert count > 0, 'payee has no open locks'
+
+    lock_keys = []
+    i = 0
+    while i < count:
+        lock_keys.append(concat('lock/', substr(ids, i * 32, 32)))
+        i += 1
+    locks = GetMany(lock_keys)
+
+    header = GetHeader(GetHeight())
+    now = header.Timestamp
+
+    total = 0
+    open_ids = ''
+    put_keys = []
+    put_values = []
+    delete_keys = []
+    i = 0
+    for lock in locks:
+        lock_key = lock_keys[i]
+        lock_id = substr(ids, i * 32, 32)
+        i += 1
+
+        tranches = substr(lock, 40, 1) * 1
+        locked = substr(lock, 41, 1) * 1
+        n = substr(lock, 42, 1) * 1
+        unlock_time = substr(lock, 43, n) * 1
+        m = substr(lock, 43 + n, 1) * 1
+        interval = substr(lock, 44 + n, m) * 1
+        amount = substr(lock, 44 + n + m, len(lock) - 44 - n - m) * 1
+
+        matured = 0
+        if now >= unlock_time:
+            matured = (now - unlock_time) / interval + 1
+            if matured > tranches:
+                matured = tranches
+
+        released = tranches - locked
+        if matured > released:
+            total = total + amount * matured / tranches - amount * released / tranches
+            if matured == tranches:
+                delete_keys.append(lock_key)
+            else:
+                put_keys.append(lock_key)
+                put_values.append(concat(concat(substr(lock, 0, 41), tranches - matured), substr(lock, 42, len(lock) - 42)))
+                open_ids = concat(open_ids, lock_id)
+        else:
+            open_ids = concat(open_ids, lock_id)
+
+    assert total > 0, 'no tranches have matured'
+
+    myhash = GetExecutingScriptHash()
+    r = MCTContract('transfer', [myhash, payee, total])
+    assert r, 'payout transfer failed'
+
+    if len(open_ids) == len(ids):
+        r = PutMany(put_keys, put_values)
+        return total
+
+    if len(open_ids) > 0:
+        put_keys.append(index_key)
+        put_values.append(open_ids)
+    else:
+        delete_keys.append(index_key)
+    if len(put_keys) > 0:
+        r = PutMany(put_keys, put_values)
+    r = DeleteMany(delete_keys)
+    return total
+
+def rejectLock(lock_id):
+    """
+    Drop one of the payee's locks and refund what it has not yet paid out
+    to the depositor. Tranches that have matured but were not withdrawn
+    are refunded too, so a payee who wants them calls withdrawMany first.
+    """
+    lock_key = concat('lock/', lock_id)
+    lock = Get(lock_key)
+    assert len(lock) > 0, 'no such lock exists'
+
+    depositor = substr(lock, 0, 20)
+    payee = substr(lock, 20, 20)
+    assert CheckWitness(payee), 'only the payee can reject a lock'
+
+    tranches = substr(lock, 40, 1) * 1
+    locked = substr(lock, 41, 1) * 1
+    n = substr(lock, 42, 1) * 1
+    m = substr(lock, 43 + n, 1) * 1
+    amount = substr(lock, 44 + n + m, len(lock) - 44 - n - m) * 1
+    refund = amount - amount * (tranches - locked) / tranches
+
+    index_key = concat('locks/', payee)
+    ids = Get(index_key)
+    count = len(ids) / 32
+    open_ids = ''
+    i = 0
+    while i < count:
+        other = substr(ids, i * 32, 32)
+        if other != lock_id:
+            open_ids = concat(open_ids, other)
+        i += 1
+
+    myhash = GetExecutingScriptHash()
+    r = MCTContract('transfer', [myhash, depositor, refund])
+    assert r, 'refund transfer failed'
+
+    if len(open_ids) > 0:
+        r = Put(index_key, open_ids)
+        r = Delete(lock_key)
+    else:
+        r = DeleteMany([lock_key, index_key])
+    return refund
+
+# Staked storage appcalls
+
+def Get(key):
+    return MCTContract('Get', [key])
+
+def Delete(key):
+    return MCTContract('Delete', [key])
+
+def Put(key, value):
+    return MCTContract('Put', [key, value])
+
+def GetMany(keys):
+    return MCTContract('GetMany', [keys])
+
+def DeleteMany(keys):
+    return MCTContract('DeleteMany', [keys])
+
+def PutMany(keys, values):
+    return MCTContract('PutMany', [keys, values])
+
+
+# required in order to use assert
+
+def AssertionError(msg):
+    OnError(msg) # for neo-cli ApplicationLog
+    raise Exception(msg)
@@ -37,10 +37,9 @@ namespace Neo.SmartContract
 		private static bool put_mct(object[] data)
 		{
 			if (!Runtime.CheckWitness(owner)) return false;
-			byte[] value = get_mct((object)data[0]);
-			if (value != null) return false;
-      
-			return MCTContract("Put", data);
+
+			// MCT only stores the value if the key is not set yet
+			return MCTContract("PutIfAbsent", data);
 		}
 
 		private static byte[] get_mct(object[] key)
@@ -48,13 +47,14 @@ namespace Neo.SmartContract
 			return MCTContract("Get", key);
 		}
 
-		private static bool delete_mct(object[] key)
+		// args: key, owner (the value stored under the key)
+		private static bool delete_mct(object[] data)
 		{
-			byte[] owner = get_mct(key);
-			if (owner == null) return false;
+			byte[] owner = (byte[])data[1];
 			if (!Runtime.CheckWitness(owner)) return false;
-      
-			return MCTContract("Delete", key);
+
+			// MCT only deletes the key if it still holds the owner
+			return MCTContract("DeleteIfEquals", data);
 		}
 	}
 }
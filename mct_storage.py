@@ -0,0 +1,174 @@
+"""
+Staked storage cache
+====================
+
+Every Get, Put and Delete on MCT staked storage is an app call that checks
+the calling contract's stake again. This module keeps the keys an
+invocation touches in a cache, so a contract can read and write its
+records where it needs them and still make as few calls as possible:
+
+* a key is read from MCT at most once per invocation, and reads of keys
+  written or deleted earlier in the invocation are answered from the cache
+* CachedGetMany reads all the keys it is missing with one GetMany
+* writes are kept until Flush, which stores the final value of every key
+  with one Put or PutMany and deletes with one Delete or DeleteMany
+* a key written twice is stored once, a key written and then deleted is
+  only deleted, and writes that leave a key as it was read are dropped
+
+Usage, from a contract in the same directory:
+
+    from mct_storage import StorageCache, CachedGet, CachedPut, Flush
+
+    cache = StorageCache()
+    count = CachedGet(cache, 'count')
+    r = CachedPut(cache, 'count', count + 1)
+    ...
+    r = Flush(cache)
+
+Nothing is written before Flush, so call it once, after the last write and
+before returning. The cache lives in a local variable: neo-boa has no
+globals, so functions that use it take it as an argument.
+
+Storing an empty value deletes the key, as both read back as empty. Flush
+splits writes into batches of 64 keys, the limit of the batched operations;
+CachedGetMany can read at most 64 keys that are not cached yet.
+
+The cache is opt-in; none of the example contracts use it. Each cached
+access costs a few dozen opcodes and Flush about 150 plus about 85 per
+key it stores (see tests/contracts/storage_cache.py), so the cache pays
+off where an invocation would otherwise repeat calls for the same keys.
+The importing contract provides the staked storage helpers called here (Get,
+Put, Delete, GetMany, PutMany, DeleteMany), each an app call to its MCT
+script hash, as in mct-dapp-template.py.
+"""
+from boa.builtins import has_key, keys
+
+MAX_BATCH_KEYS = 64  # keys per PutMany/DeleteMany
+
+
+def StorageCache():
+    """
+    Return an empty cache: the values read from MCT, and the values written
+    since, which Flush stores.
+    """
+    return [{}, {}]
+
+def CachedGet(cache, key):
+    written = cache[1]
+    if has_key(written, key):
+        return written[key]
+    loaded = cache[0]
+    if has_key(loaded, key):
+        return loaded[key]
+    value = Get(key)
+    loaded[key] = value
+    return value
+
+def CachedGetMany(cache, key_list):
+    """
+    Return the values of the keys in key_list, reading those that are not
+    cached with a single GetMany.
+    """
+    loaded = cache[0]
+    written = cache[1]
+    missing = []
+    total = len(key_list)
+    i = 0
+    while i < total:
+        key = key_list[i]
+        if not has_key(written, key):
+            if not has_key(loaded, key):
+                missing.append(key)
+        i += 1
+
+    count = len(missing)
+    if count == 1:
+        key = missing[0]
+        loaded[key] = Get(key)
+    elif count > 1:
+        read = GetMany(missing)
+        i = 0
+        while i < count:
+            loaded[missing[i]] = read[i]
+            i += 1
+
+    result = []
+    i = 0
+    while i < total:
+        key = key_list[i]
+        if has_key(written, key):
+            result.append(written[key])
+        else:
+            result.append(loaded[key])
+        i += 1
+    return result
+
+def CachedPut(cache, key, value):
+    cache[1][key] = value
+    return True
+
+def CachedDelete(cache, key):
+    cache[1][key] = ''
+    return True
+
+def CachedDeleteMany(cache, key_list):
+    written = cache[1]
+    count = len(key_list)
+    i = 0
+    while i < count:
+        written[key_list[i]] = ''
+        i += 1
+    return True
+
+def Flush(cache):
+    """
+    Store and delete the keys written since the cache was created, with one
+    app call for each batch. Returns True if MCT accepted them all.
+    """
+    loaded = cache[0]
+    written = cache[1]
+
+    put_keys = []
+    put_values = []
+    delete_keys = []
+    written_keys = keys(written)
+    count = len(written_keys)
+    i = 0
+    while i < count:
+        key = written_keys[i]
+        value = written[key]
+        i += 1
+        if has_key(loaded, key):
+            if loaded[key] == value:
+                continue  # unchanged
+            loaded[key] = value
+        if len(value) > 0:
+            if len(put_keys) == MAX_BATCH_KEYS:
+                if not PutMany(put_keys, put_values):
+                    return False
+                put_keys = []
+                put_values = []
+            put_keys.append(key)
+            put_values.append(value)
+        else:
+            if len(delete_keys) == MAX_BATCH_KEYS:
+                if not DeleteMany(delete_keys):
+                    return False
+                delete_keys = []
+            delete_keys.append(key)
+    cache[1] = {}
+
+    count = len(put_keys)
+    if count == 1:
+        if not Put(put_keys[0], put_values[0]):
+            return False
+    elif count > 1:
+        if not PutMany(put_keys, put_values):
+            return False
+
+    count = len(delete_keys)
+    if count == 1:
+        return Delete(delete_keys[0])
+    if count > 1:
+        return DeleteMany(delete_keys)
+    return True
@@ -0,0 +1,8 @@
+"""
+Off-chain tooling for MCT and the example contracts: an in-process AVM
+emulator with a Python stand-in for MCT, benchmarks built on it, and an
+indexer for the contracts' ApplicationLog events.
+"""
+from .chain import Chain, InvocationResult, ScriptBuilder, script_hash_from_string
+from .mct import MCTToken
+from .privnet import Privnet
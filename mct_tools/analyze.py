@@ -0,0 +1,446 @@
+"""
+Static analyzer for compiled contracts
+======================================
+
+Disassembles an .avm script and reports what decides its deployment and
+invocation costs without running it:
+
+    python -m mct_tools.analyze mct-privnet.avm
+    python -m mct_tools.analyze build/safe-remote-purchase.avm --disassemble
+    python -m mct_tools.analyze old/atomicswap.avm build/atomicswap.avm
+
+* script size, functions and their sizes (from the .avmdbgnfo debug map
+  next to the script, or from the CALL targets if there is none)
+* opcode histogram, syscalls used and embedded constants
+* the deployment fee implied by the syscalls and app calls used
+* the worst-case path length, in instructions, of each operation Main
+  dispatches on, and of functions called from Main that dispatch on
+  their own (such as onTokenTransfer sub-operations)
+
+Operations are found by the way the compilers emit `operation == 'name'`:
+a push of the name followed by EQUAL (NUMEQUAL in older neon builds) and
+a conditional jump. Path lengths
+include the functions called along the way; loops are counted once and
+app calls to other contracts as a single instruction.
+
+Given two scripts the second is compared to the first, and the command
+exits non-zero when it is larger, costs more to deploy or has a longer
+worst-case path for any operation.
+"""
+import argparse
+import collections
+import json
+import os
+import re
+import sys
+
+from . import opcodes as op
+from .profiler import DebugMap
+
+# Contract.Create fees in GAS, see the NEO 2.x StateReader
+DEPLOY_FEE = 100
+STORAGE_FEE = 400
+DYNAMIC_INVOKE_FEE = 500
+FREE_GAS = 10
+
+OPERATION_NAME = re.compile(br'^[A-Za-z_][A-Za-z0-9_]*$')
+PRINTABLE = re.compile(br'^[ -~]+$')
+
+ENDS = (op.RET, op.THROW, op.TAILCALL, op.CALL_ET, op.CALL_EDT)
+BRANCHES = (op.JMPIF, op.JMPIFNOT)
+CALLS = (op.CALL, op.CALL_I)
+
+
+class Function(object):
+
+    def __init__(self, name, entry):
+        self.name = name
+        self.entry = entry
+        self.blocks = {}  # start offset -> Block
+        self.longest = None  # worst-case path from entry, in instructions
+
+    @property
+    def instructions(self):
+        return [ins for block in self.blocks.values() for ins in block.instructions]
+
+    @property
+    def size(self):
+        return sum(ins.size for ins in self.instructions)
+
+
+class Block(object):
+
+    def __init__(self, start):
+        self.start = start
+        self.instructions = []
+        self.successors = []
+
+
+class Script(object):
+    """A disassembled script, split into functions and basic blocks."""
+
+    def __init__(self, script, debug_map=None):
+        self.script = bytes(script)
+        self.debug_map = debug_map
+        self.instructions = list(op.iter_instructions(self.script))
+        self.by_offset = dict((ins.offset, ins) for ins in self.instructions)
+        self.functions = {}
+        self._find_functions()
+        self._longest_cache = {}
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            script = f.read()
+        map_path = os.path.splitext(path)[0] + '.avmdbgnfo'
+        debug_map = DebugMap.load(map_path) if os.path.exists(map_path) else None
+        return cls(script, debug_map)
+
+    # structure
+
+    def _name(self, offset):
+        name = self.debug_map.function_at(offset) if self.debug_map else None
+        if name:
+            return name
+        return 'entry' if offset == 0 else 'sub_%04x' % offset
+
+    def _find_functions(self):
+        pending = [0]
+        while pending:
+            entry = pending.pop()
+            if entry in self.functions or entry not in self.by_offset:
+                continue
+            function = Function(self._name(entry), entry)
+            self.functions[entry] = function
+            for ins in self._build_blocks(function):
+                if ins.opcode in CALLS:
+                    pending.append(ins.target)
+
+    def _build_blocks(self, function):
+        # leaders: the entry and every jump target or fall-through after a jump
+        seen = set()
+        leaders = set([function.entry])
+        todo = [function.entry]
+        while todo:
+            offset = todo.pop()
+            while offset in self.by_offset and offset not in seen:
+                seen.add(offset)
+                ins = self.by_offset[offset]
+                following = offset + ins.size
+                if ins.opcode in ENDS:
+                    break
+                if ins.opcode == op.JMP:
+                    leaders.add(ins.target)
+                    todo.append(ins.target)
+                    break
+                if ins.opcode in BRANCHES:
+                    leaders.update((ins.target, following))
+                    todo.append(ins.target)
+                offset = following
+
+        calls = []
+        block = None
+        for offset in sorted(seen):
+            ins = self.by_offset[offset]
+            if block is None or offset in leaders:
+                block = Block(offset)
+                function.blocks[offset] = block
+            block.instructions.append(ins)
+            if ins.opcode in CALLS:
+                calls.append(ins)
+            following = offset + ins.size
+            if ins.opcode in ENDS:
+                block = None
+            elif ins.opcode == op.JMP:
+                block.successors = [ins.target]
+                block = None
+            elif ins.opcode in BRANCHES:
+                block.successors = [following, ins.target]
+                block = None
+            elif following in leaders or following not in seen:
+                if following in seen:
+                    block.successors = [following]
+                block = None
+        return calls
+
+    # path lengths
+
+    def weight(self, ins, active=()):
+        """Instructions executed by ``ins``, including a called function."""
+        if ins.opcode in CALLS:
+            return 1 + self.longest_path(self.functions[ins.target], active)
+        return 1
+
+    def longest_path(self, function, active=()):
+        """Worst-case instructions from the function's entry to a return."""
+        if function.longest is not None:
+            return function.longest
+        if function.entry in active:
+            return 0  # recursion, counted once
+        active = active + (function.entry,)
+        function.longest = self._longest_from(function, function.entry, active, {}, set())
+        return function.longest
+
+    def _longest_from(self, function, start, active, memo, stack):
+        if start in memo:
+            return memo[start]
+        block = function.blocks[start]
+        stack.add(start)
+        tail = 0
+        for successor in block.successors:
+            if successor in stack or successor not in function.blocks:
+                continue  # loop back edge
+            tail = max(tail, self._longest_from(function, successor, active, memo, stack))
+        stack.discard(start)
+        memo[start] = sum(self.weight(ins, active) for ins in block.instructions) + tail
+        return memo[start]
+
+    def _longest_to(self, function):
+        """Worst-case instructions executed before each block starts."""
+        order = []
+        state = {}
+
+        def visit(start):
+            state[start] = 1
+            for successor in function.blocks[start].successors:
+                if successor in function.blocks and successor not in state:
+                    visit(successor)
+            state[start] = 2
+            order.append(start)
+
+        visit(function.entry)
+        order.reverse()
+        before = dict((start, None) for start in function.blocks)
+        before[function.entry] = 0
+        position = dict((start, i) for i, start in enumerate(order))
+        for start in order:
+            if before[start] is None:
+                continue
+            block = function.blocks[start]
+            end = before[start] + sum(self.weight(ins) for ins in block.instructions)
+            for successor in block.successors:
+                if successor in position and position[successor] > position[start]:
+                    if before[successor] is None or end > before[successor]:
+                        before[successor] = end
+        return before
+
+    def operations(self):
+        """
+        Worst-case path length of each operation dispatched in the entry
+        function, or in a function it calls, as {name: instructions}.
+        """
+        entry = self.functions[0]
+        result = collections.OrderedDict()
+        for name, length in self._dispatch(entry, 0, 0):
+            result[name] = length
+
+        before = self._longest_to(entry)
+        for start, block in sorted(entry.blocks.items()):
+            if before[start] is None:
+                continue
+            prefix = before[start]
+            for i, ins in enumerate(block.instructions):
+                if ins.opcode not in CALLS or ins.target == 0:
+                    prefix += 1 if ins.opcode not in CALLS else 0
+                    continue
+                callee = self.functions[ins.target]
+                rest = sum(self.weight(x) for x in block.instructions[i + 1:])
+                rest += max([self._longest_from(entry, s, (), {}, set())
+                             for s in block.successors if s in entry.blocks] or [0])
+                for name, length in self._dispatch(callee, prefix + 1, rest):
+                    name = '%s::%s' % (callee.name, name)
+                    result[name] = max(result.get(name, 0), length)
+                prefix += self.weight(ins)
+        return result
+
+    def _dispatch(self, function, prefix, suffix):
+        before = self._longest_to(function)
+        for start, block in sorted(function.blocks.items()):
+            instructions = block.instructions
+            if len(instructions) < 3 or before[start] is None:
+                continue
+            push, equal, jump = instructions[-3:]
+            if jump.opcode not in BRANCHES or equal.opcode not in (op.EQUAL, op.NUMEQUAL):
+                continue
+            if not push.operand or push.opcode > op.PUSHDATA4 or not OPERATION_NAME.match(push.operand):
+                continue
+            # JMPIFNOT falls through when the names are equal, JMPIF jumps
+            matched = block.successors[0] if jump.opcode == op.JMPIFNOT else block.successors[1]
+            length = before[start] + sum(self.weight(ins) for ins in instructions)
+            length += self._longest_from(function, matched, (), {}, set()) + suffix
+            yield push.operand.decode('ascii'), prefix + length
+
+    # reports
+
+    def syscalls(self):
+        return collections.Counter(ins.syscall for ins in self.instructions if ins.opcode == op.SYSCALL)
+
+    def opcode_histogram(self):
+        return collections.Counter(ins.name for ins in self.instructions)
+
+    def constants(self):
+        return [ins for ins in self.instructions
+                if op.PUSHBYTES1 <= ins.opcode <= op.PUSHDATA4 and ins.operand]
+
+    @property
+    def uses_storage(self):
+        return any(name.startswith(('Neo.Storage.', 'System.Storage.')) for name in self.syscalls())
+
+    @property
+    def uses_dynamic_invoke(self):
+        return any(ins.opcode in op.APP_CALLS and ins.app_call_hash is None for ins in self.instructions)
+
+    @property
+    def deploy_fee(self):
+        fee = DEPLOY_FEE
+        if self.uses_storage:
+            fee += STORAGE_FEE
+        if self.uses_dynamic_invoke:
+            fee += DYNAMIC_INVOKE_FEE
+        return fee
+
+    def summary(self):
+        functions = sorted(self.functions.values(), key=lambda f: f.entry)
+        constants = self.constants()
+        return {
+            'size': len(self.script),
+            'instructions': len(self.instructions),
+            'deploy_fee': self.deploy_fee,
+            'storage': self.uses_storage,
+            'dynamic_invoke': self.uses_dynamic_invoke,
+            'worst_path': self.longest_path(self.functions[0]),
+            'functions': collections.OrderedDict(
+                (f.name, {'offset': f.entry, 'size': f.size, 'worst_path': self.longest_path(f)})
+                for f in functions),
+            'operations': self.operations(),
+            'syscalls': dict(self.syscalls()),
+            'constants': {'count': len(constants), 'bytes': sum(len(c.operand) for c in constants)},
+            'opcodes': dict(self.opcode_histogram()),
+        }
+
+    def disassemble(self):
+        lines = []
+        for ins in self.instructions:
+            function = self.functions.get(ins.offset)
+            if function is not None:
+                lines.append('%s:' % function.name)
+            operand = ''
+            if ins.opcode == op.SYSCALL:
+                operand = ins.syscall
+            elif ins.opcode in op.JUMPS:
+                operand = '%04d' % ins.target
+            elif ins.operand:
+                operand = ins.operand.hex()
+                if OPERATION_NAME.match(ins.operand):
+                    operand += '  ; %s' % ins.operand.decode('ascii')
+            lines.append('  %04d  %-12s %s' % (ins.offset, ins.name, operand))
+        return '\n'.join(lines)
+
+
+def format_report(name, script, top=12):
+    summary = script.summary()
+    out = ['%s: %d bytes, %d instructions, worst-case path %d' % (
+        name, summary['size'], summary['instructions'], summary['worst_path'])]
+    fee = summary['deploy_fee']
+    out.append('deployment fee: %d GAS (%d after the %d GAS allowance), storage %s, dynamic invoke %s' % (
+        fee, fee - FREE_GAS, FREE_GAS, 'yes' if summary['storage'] else 'no',
+        'yes' if summary['dynamic_invoke'] else 'no'))
+
+    out.append('')
+    out.append('%-44s %6s %6s %10s' % ('function', 'offset', 'bytes', 'worst path'))
+    for fname, info in summary['functions'].items():
+        out.append('%-44s %6d %6d %10d' % (fname, info['offset'], info['size'], info['worst_path']))
+
+    if summary['operations']:
+        out.append('')
+        out.append('%-44s %10s' % ('operation', 'worst path'))
+        for operation, length in summary['operations'].items():
+            out.append('%-44s %10d' % (operation, length))
+
+    out.append('')
+    out.append('%-44s %6s' % ('syscall', 'sites'))
+    for syscall, count in sorted(summary['syscalls'].items()):
+        out.append('%-44s %6d' % (syscall, count))
+
+    constants = script.constants()
+    out.append('')
+    out.append('constants: %d pushes, %d bytes; largest:' % (len(constants), summary['constants']['bytes']))
+    for ins in sorted(constants, key=lambda c: (-len(c.operand), c.offset))[:5]:
+        preview = ins.operand[:24]
+        text = repr(preview.decode('ascii')) if PRINTABLE.match(preview) else preview.hex()
+        out.append('  %04d  %4d bytes  %s%s' % (ins.offset, len(ins.operand), text,
+                                                '...' if len(ins.operand) > 24 else ''))
+
+    out.append('')
+    out.append('opcodes: ' + ', '.join('%s %d' % item for item in
+                                       script.opcode_histogram().most_common(top)))
+    return '\n'.join(out)
+
+
+def compare(old, new):
+    """Return (lines, regressions) comparing two script summaries."""
+    lines = ['%-44s %10s %10s %8s' % ('', 'old', 'new', 'change')]
+    regressions = []
+
+    def row(label, before, after, check=True):
+        if before is None or after is None:
+            lines.append('%-44s %10s %10s' % (label, '-' if before is None else before,
+                                                 '-' if after is None else after))
+            return
+        lines.append('%-44s %10d %10d %+8d' % (label, before, after, after - before))
+        if check and after > before:
+            regressions.append('%s: %d -> %d' % (label, before, after))
+
+    row('script bytes', old['size'], new['size'])
+    row('instructions', old['instructions'], new['instructions'], check=False)
+    row('deployment fee (GAS)', old['deploy_fee'], new['deploy_fee'])
+    row('worst-case path', old['worst_path'], new['worst_path'], check=False)
+    for name in _merged(old['operations'], new['operations']):
+        row('operation ' + name, old['operations'].get(name), new['operations'].get(name))
+    for name in _merged(old['functions'], new['functions']):
+        before = old['functions'].get(name)
+        after = new['functions'].get(name)
+        row('function %s bytes' % name, before and before['size'], after and after['size'], check=False)
+    return lines, regressions
+
+
+def _merged(first, second):
+    names = list(first)
+    names.extend(name for name in second if name not in first)
+    return names
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('scripts', nargs='+', metavar='AVM', help='script to analyze, or old and new script')
+    parser.add_argument('--disassemble', action='store_true', help='print the disassembly')
+    parser.add_argument('--json', action='store_true', help='print the summary as JSON')
+    args = parser.parse_args(argv)
+    if len(args.scripts) > 2:
+        parser.error('give one script, or two to compare')
+
+    scripts = [Script.load(path) for path in args.scripts]
+    if len(scripts) == 2:
+        old, new = scripts[0].summary(), scripts[1].summary()
+        lines, regressions = compare(old, new)
+        if args.json:
+            print(json.dumps({'old': old, 'new': new, 'regressions': regressions}, indent=2))
+            return 1 if regressions else 0
+        print('\n'.join(lines))
+        for line in regressions:
+            print('REGRESSION ' + line)
+        return 1 if regressions else 0
+
+    script = scripts[0]
+    if args.json:
+        print(json.dumps(script.summary(), indent=2))
+    else:
+        print(format_report(args.scripts[0], script))
+    if args.disassemble:
+        print('')
+        print(script.disassemble())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
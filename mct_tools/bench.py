@@ -0,0 +1,319 @@
+"""
+Invocation cost benchmarks for the example contracts
+====================================================
+
+Runs every operation of the example contracts, and MCT's own transfers,
+on an emulated privnet and reports, per invocation, the opcodes executed,
+GAS consumed, app calls made and staked/contract storage bytes written.
+
+    python -m mct_tools.bench                       # table
+    python -m mct_tools.bench --mct avm             # against mct-privnet.avm
+    python -m mct_tools.bench --profile release     # the release builds
+    python -m mct_tools.bench --json > baseline.json
+    python -m mct_tools.bench --compare baseline.json
+
+The run exits non-zero when an operation that should succeed faults
+(only against the stand-in: mct-privnet.avm lacks the newer operations
+some contracts call), and, with --compare, when any operation got more
+expensive in opcodes, GAS or bytes written than in the baseline.
+
+When a suite cannot set up the state its next operation needs, for
+instance because a contract calls an MCT operation mct-privnet.avm does
+not implement, the rest of that suite is skipped and reported as a single
+FAULT row named 'setup'.
+"""
+import argparse
+import json
+import sys
+
+from . import multisend
+from .blobstore import digest_of
+from .build import PROFILES
+from .chain import ScriptBuilder
+from .mct import PRIVNET_OWNER
+from .privnet import Privnet, SetupError, ZERO_OWNER
+from .srp import created_sale_id, encode_legacy_sale
+
+COIN = 10 ** 8
+
+# mct-lock-contract.py constants
+LOCK_PARTY2 = b'\x8a\xed\xf3\xc92;\xd2\xeb\xb6\x8b\xe7mi\x9b=\xa4m{wz'
+LOCK_UNLOCK_TIME = 1531501200
+
+VESTING_UNLOCK_TIME = 1531003600
+
+ALICE = b'\x11' * 20
+BOB = b'\x12' * 20
+CAROL = b'\x13' * 20
+
+FIELDS = ('opcodes', 'gas_units', 'app_calls', 'storage_bytes_written')
+
+# operations benchmarked for the cost of failing
+EXPECTED_FAULTS = [
+    ('mct-vesting-contract', 'withdrawMany (locked)'),
+]
+
+
+def bench_dapp_template(net):
+    chain = net.chain
+    dapp = net.deploy('mct-dapp-template.py')
+    net.fund('MCT', ALICE, 100 * COIN)
+    net.fund('MCT', ZERO_OWNER, 100 * COIN)
+    yield 'hello', chain.invoke(dapp, 'hello')
+    yield 'onTokenTransfer (owner top-up)', net.transfer('MCT', ZERO_OWNER, dapp, COIN)
+    yield 'onTokenTransfer (first payment)', net.transfer('MCT', ALICE, dapp, 5 * COIN)
+    yield 'onTokenTransfer (repeat payment)', net.transfer('MCT', ALICE, dapp, 5 * COIN)
+    yield 'onTokenTransfer (reject-me)', net.transfer('MCT', ALICE, dapp, 5 * COIN, 'reject-me')
+    yield 'ownerWithdraw', chain.invoke(dapp, 'ownerWithdraw', [COIN], signers=[ZERO_OWNER])
+
+
+def bench_atomicswap(net):
+    chain = net.chain
+    swap = net.deploy('atomicswap.py', stake=('CTX',))
+    mct = net.tokens['MCT']
+    ctx = net.tokens['CTX']
+    cty = net.tokens['CTY']
+    for symbol in ('MCT', 'CTX', 'CTY'):
+        net.fund(symbol, ZERO_OWNER, 100000 * COIN)
+    net.fund('CTX', ALICE, 1000 * COIN)
+    net.fund('CTY', BOB, 1000 * COIN)
+    net.fund('MCT', CAROL, 1000 * COIN)
+    yield 'registerToken', chain.invoke(swap, 'registerToken', [ctx], signers=[ZERO_OWNER])
+    for token in (cty, mct):
+        chain.invoke(swap, 'registerToken', [token], signers=[ZERO_OWNER])
+    yield 'onTokenTransfer (owner top-up)', net.transfer('CTY', ZERO_OWNER, swap, 50000 * COIN)
+    net.transfer('MCT', ZERO_OWNER, swap, 50000 * COIN)
+    yield 'resyncReserves', chain.invoke(swap, 'resyncReserves', [ctx, cty], signers=[ZERO_OWNER])
+    yield 'setExchangeRate', chain.invoke(swap, 'setExchangeRate', [ctx, cty, 2 * COIN], signers=[ZERO_OWNER])
+    rates = [[cty, ctx, COIN // 2], [mct, cty, 3 * COIN], [cty, mct, COIN // 3], [mct, ctx, COIN]]
+    yield 'setExchangeRates (4 pairs)', chain.invoke(swap, 'setExchangeRates', [rates], signers=[ZERO_OWNER])
+    yield 'exchangeRate', chain.invoke(swap, 'exchangeRate', [ctx, cty])
+    yield 'onTokenTransfer (swap CTX->CTY)', net.transfer('CTX', ALICE, swap, 10 * COIN, cty)
+    yield 'onTokenTransfer (swap at desired rate)', net.transfer('CTX', ALICE, swap, 10 * COIN, cty, 2 * COIN)
+    yield 'onTokenTransfer (swap CTY->CTX)', net.transfer('CTY', BOB, swap, 10 * COIN, ctx)
+    yield 'onTokenTransfer (swap MCT->CTY)', net.transfer('MCT', CAROL, swap, 10 * COIN, cty)
+    yield 'onTokenTransfer (rate mismatch)', net.transfer('CTX', ALICE, swap, 10 * COIN, cty, 3 * COIN)
+    yield 'onTokenTransfer (within slippage)', net.transfer('CTX', ALICE, swap, 10 * COIN, cty, 2 * COIN + COIN // 50, 100)
+    # only a few CTX above the storage stake are left to pay out
+    yield 'onTokenTransfer (partial fill)', net.transfer('CTY', BOB, swap, 100 * COIN, ctx)
+    yield 'ownerWithdraw', chain.invoke(swap, 'ownerWithdraw', [cty, COIN], signers=[ZERO_OWNER])
+
+
+def bench_lock_contract(net):
+    chain = net.chain
+    lock = net.deploy('mct-lock-contract.py', stake=())
+    yield 'onTokenTransfer (deposit)', net.transfer('MCT', PRIVNET_OWNER, lock, 20000 * COIN)
+    yield 'getUnlockTime', chain.invoke(lock, 'getUnlockTime')
+    yield 'getCurrentPayee', chain.invoke(lock, 'getCurrentPayee')
+    yield 'setNewPayee (depositor proposes)', chain.invoke(lock, 'setNewPayee', [CAROL], signers=[PRIVNET_OWNER])
+    yield 'setNewPayee (payee approves)', chain.invoke(lock, 'setNewPayee', [CAROL], signers=[LOCK_PARTY2])
+    yield 'withdraw (locked)', chain.invoke(lock, 'withdraw')
+    chain.advance_to(LOCK_UNLOCK_TIME)
+    yield 'withdraw', chain.invoke(lock, 'withdraw')
+
+
+def bench_safe_remote_purchase(net):
+    chain = net.chain
+    srp = net.deploy('safe-remote-purchase.py', stake=('CTX',))
+    net.fund('CTX', ALICE, 10000 * COIN)
+    net.fund('CTX', BOB, 10000 * COIN)
+    price = 100 * COIN
+    description = 'vintage mechanical keyboard, boxed, ships worldwide'
+    digest = digest_of(description)  # sale records hold the hash, the text is kept off-chain
+
+    created = net.transfer('CTX', ALICE, srp, 2 * price, ['createSale', BOB, price, digest])
+    yield 'onTokenTransfer::createSale', created
+    sale_id = _sale_id(created)
+    yield 'sale', chain.invoke(srp, 'sale', [sale_id])
+    yield 'onTokenTransfer::buyerDeposit', net.transfer('CTX', BOB, srp, 2 * price, ['buyerDeposit', sale_id])
+    yield 'confirmShipment', chain.invoke(srp, 'confirmShipment', [sale_id], signers=[ALICE])
+    yield 'confirmReceived', chain.invoke(srp, 'confirmReceived', [sale_id], signers=[BOB])
+
+    created = net.transfer('CTX', ALICE, srp, 2 * price, ['createSale', b'', price, digest])
+    yield 'deleteSale', chain.invoke(srp, 'deleteSale', [_sale_id(created)], signers=[ALICE])
+
+    # state changes of a sale with a long description, which costs the same
+    # as any other as only its hash is stored
+    created = net.transfer('CTX', ALICE, srp, 2 * price, ['createSale', BOB, price, digest_of(description * 30)])
+    yield 'onTokenTransfer::createSale (1.5 KB)', created
+    sale_id = _sale_id(created)
+    yield 'onTokenTransfer::buyerDeposit (1.5 KB)', net.transfer('CTX', BOB, srp, 2 * price, ['buyerDeposit', sale_id])
+    yield 'confirmShipment (1.5 KB)', chain.invoke(srp, 'confirmShipment', [sale_id], signers=[ALICE])
+
+    # one buyer closing several sales with the same seller
+    shipped = [_shipped_sale(net, srp, price, digest) for _ in range(5)]
+    yield 'confirmReceivedMany (5 sales)', chain.invoke(srp, 'confirmReceivedMany', [shipped], signers=[BOB])
+    yield 'salesBy (page of 10)', chain.invoke(srp, 'salesBy', [ALICE, 0, 10])
+
+    # a seller with 8 open sales spread over 12 index slots
+    net.fund('CTX', CAROL, 10000 * COIN)
+    for i in range(12):
+        created = net.transfer('CTX', CAROL, srp, 2 * price, ['createSale', b'', price, digest])
+        if i % 3 == 1:
+            net.expect(chain.invoke(srp, 'deleteSale', [_sale_id(created)], signers=[CAROL]))
+    yield 'salesBy (page of 10, 3 gaps)', chain.invoke(srp, 'salesBy', [CAROL, 0, 10])
+    first = chain.invoke(srp, 'salesPage', [CAROL, b'', 5])
+    yield 'salesPage (page of 5)', first
+    yield 'salesPage (next page)', chain.invoke(srp, 'salesPage', [CAROL, first.result[0], 5])
+
+    # a sale stored by the previous, Serialize()-based version of the contract
+    legacy_id = b'\x42' * 32
+    record = encode_legacy_sale(legacy_id, ALICE, BOB, price, description, 'awaiting shipment')
+    net.put_staked('CTX', srp, b'sales/' + legacy_id, record)
+    yield 'sale (legacy record)', chain.invoke(srp, 'sale', [legacy_id])
+    yield 'migrateSale', chain.invoke(srp, 'migrateSale', [legacy_id])
+    legacy_id = b'\x43' * 32
+    record = encode_legacy_sale(legacy_id, ALICE, BOB, price, description, 'awaiting shipment')
+    net.put_staked('CTX', srp, b'sales/' + legacy_id, record)
+    yield 'confirmShipment (legacy record)', chain.invoke(srp, 'confirmShipment', [legacy_id], signers=[ALICE])
+
+
+def _sale_id(created):
+    sale_id = created_sale_id(created)
+    if sale_id is None:
+        raise SetupError('createSale created no sale: %s %s' % (created.state, created.fault or ''))
+    return sale_id
+
+
+def _shipped_sale(net, srp, price, digest):
+    created = net.expect(net.transfer('CTX', ALICE, srp, 2 * price, ['createSale', BOB, price, digest]))
+    sale_id = _sale_id(created)
+    net.expect(net.transfer('CTX', BOB, srp, 2 * price, ['buyerDeposit', sale_id]))
+    net.expect(net.chain.invoke(srp, 'confirmShipment', [sale_id], signers=[ALICE]))
+    return sale_id
+
+
+def bench_vesting_contract(net):
+    chain = net.chain
+    vesting = net.deploy('mct-vesting-contract.py')
+    net.fund('MCT', ALICE, 10000 * COIN)
+    created = net.transfer('MCT', ALICE, vesting, 1000 * COIN, [CAROL, VESTING_UNLOCK_TIME])
+    yield 'onTokenTransfer (lock)', created
+    terms = [CAROL, VESTING_UNLOCK_TIME, 4, 3600]
+    yield 'onTokenTransfer (lock in 4 tranches)', net.transfer('MCT', ALICE, vesting, 1000 * COIN, terms)
+    for _ in range(3):
+        net.expect(net.transfer('MCT', ALICE, vesting, 1000 * COIN, terms))
+    yield 'lock', chain.invoke(vesting, 'lock', [created.tx.hash])
+    yield 'locksOf', chain.invoke(vesting, 'locksOf', [CAROL])
+    unwanted = net.transfer('MCT', ALICE, vesting, 1, [CAROL, VESTING_UNLOCK_TIME])
+    net.expect(unwanted)
+    yield 'rejectLock', chain.invoke(vesting, 'rejectLock', [unwanted.tx.hash], signers=[CAROL])
+    yield 'withdrawMany (locked)', chain.invoke(vesting, 'withdrawMany', [CAROL])
+    chain.advance_to(VESTING_UNLOCK_TIME)
+    yield 'withdrawMany (5 locks, first tranche)', chain.invoke(vesting, 'withdrawMany', [CAROL])
+    chain.advance_to(VESTING_UNLOCK_TIME + 3 * 3600)
+    yield 'withdrawMany (4 locks, last tranches)', chain.invoke(vesting, 'withdrawMany', [CAROL])
+
+
+def bench_mct(net):
+    chain = net.chain
+    mct = net.tokens['MCT']
+    recipients = [(bytes([0x20, i]) + b'\x00' * 18, (i + 1) * COIN) for i in range(100)]
+    yield 'transfer', net.transfer('MCT', PRIVNET_OWNER, ALICE, COIN)
+    script = ScriptBuilder()
+    for address, amount in recipients:
+        script.emit_app_call(mct, 'transfer', [PRIVNET_OWNER, address, amount])
+    yield 'transfer (100 recipients, one script)', chain.run_script(
+        script.to_bytes(), signers=[PRIVNET_OWNER], operation='transfer')
+    payload = multisend.pack(recipients)
+    yield 'transferMulti (100 recipients)', chain.invoke(
+        mct, 'transferMulti', [PRIVNET_OWNER, payload], signers=[PRIVNET_OWNER])
+
+
+SUITES = [
+    ('mct', bench_mct),
+    ('mct-dapp-template', bench_dapp_template),
+    ('atomicswap', bench_atomicswap),
+    ('mct-lock-contract', bench_lock_contract),
+    ('safe-remote-purchase', bench_safe_remote_purchase),
+    ('mct-vesting-contract', bench_vesting_contract),
+]
+
+
+def run(mct='native', suites=None, profile='debug'):
+    """Run the suites, each on a fresh privnet, and return a list of rows."""
+    rows = []
+    for name, suite in SUITES:
+        if suites and name not in suites:
+            continue
+        net = Privnet(mct=mct, profile=profile)
+        try:
+            for label, result in suite(net):
+                row = {'contract': name, 'operation': label, 'state': result.state}
+                for field in FIELDS:
+                    row[field] = getattr(result, field)
+                rows.append(row)
+        except SetupError:
+            sys.stderr.write('%s: %s\n' % (name, sys.exc_info()[1]))
+            row = {'contract': name, 'operation': 'setup', 'state': 'FAULT'}
+            for field in FIELDS:
+                row[field] = 0
+            rows.append(row)
+    return rows
+
+
+def format_table(rows):
+    lines = ['%-22s %-40s %-5s %8s %9s %5s %7s' % (
+        'contract', 'operation', 'state', 'opcodes', 'GAS', 'calls', 'written')]
+    for row in rows:
+        lines.append('%-22s %-40s %-5s %8d %9.3f %5d %7d' % (
+            row['contract'], row['operation'], row['state'], row['opcodes'],
+            row['gas_units'] / 1000.0, row['app_calls'], row['storage_bytes_written']))
+    return '\n'.join(lines)
+
+
+def compare(rows, baseline):
+    """Return a list of human-readable regressions against ``baseline`` rows."""
+    previous = dict(((r['contract'], r['operation']), r) for r in baseline)
+    regressions = []
+    for row in rows:
+        old = previous.get((row['contract'], row['operation']))
+        if old is None:
+            continue
+        if old['state'] != row['state']:
+            regressions.append('%s %s: state %s -> %s' % (
+                row['contract'], row['operation'], old['state'], row['state']))
+        for field in ('opcodes', 'gas_units', 'storage_bytes_written'):
+            if row[field] > old[field]:
+                regressions.append('%s %s: %s %d -> %d' % (
+                    row['contract'], row['operation'], field, old[field], row[field]))
+    return regressions
+
+
+def unexpected_faults(rows):
+    """Return the rows that faulted without being listed in EXPECTED_FAULTS."""
+    return [row for row in rows if row['state'] != 'HALT' and
+            (row['contract'], row['operation']) not in EXPECTED_FAULTS]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--mct', choices=('native', 'avm'), default='native',
+                        help='run against the Python stand-in or mct-privnet.avm')
+    parser.add_argument('--suite', action='append', help='only run the named contract suite')
+    parser.add_argument('--profile', choices=PROFILES, default='debug',
+                        help='run the debug or release builds of the contracts')
+    parser.add_argument('--json', action='store_true', help='print rows as JSON')
+    parser.add_argument('--compare', metavar='BASELINE', help='baseline JSON to check against')
+    args = parser.parse_args(argv)
+
+    rows = run(args.mct, args.suite, args.profile)
+    print(json.dumps(rows, indent=2) if args.json else format_table(rows))
+
+    failed = False
+    if args.mct == 'native':
+        for row in unexpected_faults(rows):
+            sys.stderr.write('UNEXPECTED FAULT %s %s\n' % (row['contract'], row['operation']))
+            failed = True
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(rows, json.load(f))
+        for line in regressions:
+            print('REGRESSION ' + line)
+        failed = failed or bool(regressions)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
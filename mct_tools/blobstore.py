@@ -0,0 +1,115 @@
+"""
+Content-addressed blob store
+============================
+
+Keeps data that contracts only refer to by hash, such as the sale
+descriptions of safe-remote-purchase.py, in a local directory. Each blob
+is a file named by the SHA-256 hash of its content, so the hash stored
+on-chain is all a client needs to find it, and anything read back is
+checked against that hash before it is returned:
+
+    store = BlobStore('blobs')
+    digest = store.put(b'vintage mechanical keyboard')   # 32 bytes
+    store.get(digest)
+
+    python -m mct_tools.blobstore put description.txt     # prints the hash
+    python -m mct_tools.blobstore get <hash>
+
+Blobs live under <root>/<first 2 hex digits>/<remaining 62>. The store
+needs no network; share or back up the directory to make blobs available
+to other clients. --store (or MCT_BLOB_STORE) selects the directory,
+./blobs by default.
+"""
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+
+
+def digest_of(data):
+    """Return the SHA-256 hash a blob is stored under."""
+    return hashlib.sha256(_to_bytes(data)).digest()
+
+
+def _to_bytes(data):
+    return data.encode('utf-8') if isinstance(data, str) else bytes(data)
+
+
+class BlobStore(object):
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, digest):
+        if len(digest) != 32:
+            raise ValueError('blob hashes are 32 bytes')
+        name = digest.hex()
+        return os.path.join(self.root, name[:2], name[2:])
+
+    def __contains__(self, digest):
+        return os.path.exists(self.path(digest))
+
+    def put(self, data):
+        """Store ``data`` (bytes, or str as UTF-8) and return its hash."""
+        data = _to_bytes(data)
+        digest = digest_of(data)
+        path = self.path(digest)
+        if os.path.exists(path):
+            return digest
+
+        directory = os.path.dirname(path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        # write under a temporary name first, so readers never see a partial blob
+        fd, temp = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp, path)
+        except BaseException:
+            os.unlink(temp)
+            raise
+        return digest
+
+    def get(self, digest):
+        """
+        Return the blob stored under ``digest``. Raises KeyError if it is
+        not in the store and ValueError if its content does not match.
+        """
+        try:
+            with open(self.path(digest), 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            raise KeyError(digest.hex())
+        if digest_of(data) != digest:
+            raise ValueError('blob %s does not match its hash' % digest.hex())
+        return data
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--store', default=os.environ.get('MCT_BLOB_STORE', 'blobs'),
+                        help='blob directory (default: $MCT_BLOB_STORE or ./blobs)')
+    commands = parser.add_subparsers(dest='command')
+    put = commands.add_parser('put', help='store files and print their hashes')
+    put.add_argument('files', nargs='+')
+    get = commands.add_parser('get', help='write a blob to stdout')
+    get.add_argument('hash')
+    args = parser.parse_args(argv)
+
+    store = BlobStore(args.store)
+    if args.command == 'put':
+        for name in args.files:
+            with open(name, 'rb') as f:
+                print('%s  %s' % (store.put(f.read()).hex(), name))
+    elif args.command == 'get':
+        sys.stdout.buffer.write(store.get(bytes.fromhex(args.hash)))
+    else:
+        parser.print_help()
+        return 2
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
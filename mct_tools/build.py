@@ -0,0 +1,250 @@
+"""
+Compile the example contracts
+=============================
+
+Wraps the neo-boa compiler so the emulator and benchmarks can find the
+.avm builds (and the .avmdbgnfo debug maps) under build/. neo-boa only
+runs on Python 3.6/3.7, so run this module with that interpreter:
+
+    pip install neo-boa==0.7.2
+    python -m mct_tools.build [contract.py ...]
+
+The emulator itself has no dependencies and can load the builds from any
+Python 3 version.
+
+Profiles
+--------
+
+debug     the contracts as written, into build/
+release   into build/release/, without the diagnostics production
+          invocations should not pay for: print() statements are removed
+          and the messages of assert, AssertionError() and
+          raise Exception() are replaced by numeric codes
+
+A release build writes <contract>.errors.json next to the .avm, mapping
+each code to its message. Line numbers are kept, so the debug maps still
+point at the original source lines.
+
+    python -m mct_tools.build --profile release
+    python -m mct_tools.build --report     # bytes and GAS saved by release
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUILD_DIR = os.path.join(ROOT, 'build')
+
+PROFILES = ('debug', 'release')
+
+CONTRACTS = [
+    'mct-dapp-template.py',
+    'atomicswap.py',
+    'mct-lock-contract.py',
+    'safe-remote-purchase.py',
+    'mct-vesting-contract.py',
+]
+
+
+# single-line statements and calls the release profile rewrites
+PRINT = re.compile(r'^(\s*)print\(.*\)\s*(#.*)?$')
+ASSERT_MESSAGE = re.compile(r'''^(\s*assert .*,\s*)(['"])(.*)\2(\s*(#.*)?)$''')
+ERROR_MESSAGE = re.compile(r'''\b(AssertionError|Exception)\((['"])(.*?)\2\)''')
+
+
+def build_dir(profile='debug'):
+    if profile not in PROFILES:
+        raise ValueError('profile must be one of %s' % ', '.join(PROFILES))
+    return BUILD_DIR if profile == 'debug' else os.path.join(BUILD_DIR, profile)
+
+
+def avm_path(source, profile='debug'):
+    name = os.path.splitext(os.path.basename(source))[0]
+    return os.path.join(build_dir(profile), name + '.avm')
+
+
+def compile_contract(source, profile='debug'):
+    """Compile ``source`` with neo-boa and return the path of the .avm."""
+    try:
+        from boa.compiler import Compiler
+    except ImportError:
+        raise RuntimeError('neo-boa is required to compile %s (pip install neo-boa==0.7.2 '
+                           'under Python 3.6 or 3.7)' % source)
+
+    if not os.path.isabs(source):
+        source = os.path.join(ROOT, source)
+    output = avm_path(source, profile)
+    if not os.path.isdir(os.path.dirname(output)):
+        os.makedirs(os.path.dirname(output))
+
+    modules = _local_imports(source)
+    if profile == 'release':
+        source, modules = _release_sources(source, modules, os.path.dirname(output))
+
+    # neo-boa imports local modules by name; make sure it finds the ones
+    # of this profile rather than those of an earlier build
+    for module in modules:
+        sys.modules.pop(os.path.splitext(os.path.basename(module))[0], None)
+    sys.path.insert(0, os.path.dirname(source))
+    try:
+        Compiler.load_and_save(source, output_path=output)
+    finally:
+        sys.path.remove(os.path.dirname(source))
+
+    # neo-boa writes the debug map next to the source, move it along
+    if os.path.dirname(source) != os.path.dirname(output):
+        for suffix in ('.avmdbgnfo', '.abi.json'):
+            side = os.path.splitext(source)[0] + suffix
+            if os.path.exists(side):
+                shutil.move(side, os.path.splitext(output)[0] + suffix)
+    return output
+
+
+def release_source(text, codes):
+    """
+    Return ``text`` with print() statements replaced by ``pass`` and error
+    messages by numeric codes. ``codes`` maps messages to their codes and
+    gets the new ones, numbered from 1.
+    """
+    def code(message):
+        if message not in codes:
+            codes[message] = len(codes) + 1
+        return str(codes[message])
+
+    lines = []
+    for line in text.splitlines():
+        match = PRINT.match(line)
+        if match:
+            line = match.group(1) + 'pass'
+        else:
+            match = ASSERT_MESSAGE.match(line)
+            if match:
+                line = match.group(1) + code(match.group(3)) + match.group(4)
+            line = ERROR_MESSAGE.sub(lambda m: '%s(%s)' % (m.group(1), code(m.group(3))), line)
+        lines.append(line + '\n')
+    return ''.join(lines)
+
+
+def _release_sources(source, modules, directory):
+    """
+    Write the release sources of a contract and the local modules it
+    imports to ``directory``, and the message of each error code to
+    <contract>.errors.json. Returns the paths of the written sources.
+    """
+    codes = {}
+    written = []
+    for path in [source] + modules:
+        with open(path) as f:
+            text = release_source(f.read(), codes)
+        target = os.path.join(directory, os.path.basename(path))
+        with open(target, 'w') as f:
+            f.write(text)
+        written.append(target)
+
+    errors = os.path.splitext(avm_path(source, 'release'))[0] + '.errors.json'
+    with open(errors, 'w') as f:
+        json.dump(dict((str(c), m) for m, c in sorted(codes.items(), key=lambda item: item[1])), f, indent=2)
+    return written[0], written[1:]
+
+
+def load_script(source, profile='debug'):
+    """Return the compiled script for ``source``, building it if needed."""
+    path = avm_path(source, profile)
+    if not os.path.exists(path) or _stale(source, path):
+        path = compile_contract(source, profile)
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _stale(source, path):
+    if not os.path.isabs(source):
+        source = os.path.join(ROOT, source)
+    try:
+        from boa.compiler import Compiler  # noqa: F401
+    except ImportError:
+        return False  # cannot rebuild anyway, use what is there
+    built = os.path.getmtime(path)
+    return any(os.path.getmtime(f) > built for f in [source] + _local_imports(source))
+
+
+def _local_imports(source):
+    """Return the modules next to ``source`` that it imports, such as mct_storage.py."""
+    directory = os.path.dirname(source)
+    modules = []
+    with open(source) as f:
+        for line in f:
+            words = line.split()
+            if len(words) > 1 and words[0] in ('from', 'import'):
+                module = os.path.join(directory, words[1].replace('.', os.sep) + '.py')
+                if os.path.exists(module):
+                    modules.append(module)
+    return modules
+
+
+def report(contracts, mct='native'):
+    """
+    Build ``contracts`` in both profiles and return, per contract, the
+    script sizes and the opcodes and GAS of its benchmark suite in each.
+    """
+    from . import bench
+
+    totals = {}
+    suites = [os.path.splitext(os.path.basename(source))[0] for source in contracts]
+    for profile in PROFILES:
+        for row in bench.run(mct=mct, suites=suites, profile=profile):
+            total = totals.setdefault((row['contract'], profile), {'opcodes': 0, 'gas_units': 0})
+            total['opcodes'] += row['opcodes']
+            total['gas_units'] += row['gas_units']
+
+    rows = []
+    for name, source in zip(suites, contracts):
+        row = {'contract': name}
+        for profile in PROFILES:
+            row[profile + '_bytes'] = os.path.getsize(avm_path(source, profile))
+            for field in ('opcodes', 'gas_units'):
+                row[profile + '_' + field] = totals.get((name, profile), {}).get(field, 0)
+        rows.append(row)
+    return rows
+
+
+def format_report(rows):
+    lines = ['%-24s %7s %7s %6s %8s %8s %6s %9s %9s %7s' % (
+        'contract', 'bytes', 'release', 'saved', 'opcodes', 'release', 'saved', 'GAS', 'release', 'saved')]
+    for row in rows:
+        lines.append('%-24s %7d %7d %5.1f%% %8d %8d %5.1f%% %9.3f %9.3f %7.3f' % (
+            row['contract'], row['debug_bytes'], row['release_bytes'],
+            _saved(row['debug_bytes'], row['release_bytes']),
+            row['debug_opcodes'], row['release_opcodes'],
+            _saved(row['debug_opcodes'], row['release_opcodes']),
+            row['debug_gas_units'] / 1000.0, row['release_gas_units'] / 1000.0,
+            (row['debug_gas_units'] - row['release_gas_units']) / 1000.0))
+    lines.append('script bytes, and opcodes and GAS summed over the benchmark suite of each contract')
+    return '\n'.join(lines)
+
+
+def _saved(before, after):
+    return 100.0 * (before - after) / before if before else 0.0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('contracts', nargs='*', help='contracts to build (default: all examples)')
+    parser.add_argument('--profile', choices=PROFILES, default='debug')
+    parser.add_argument('--report', action='store_true',
+                        help='build both profiles and report the bytes and GAS release saves')
+    args = parser.parse_args(argv)
+
+    contracts = args.contracts or CONTRACTS
+    if args.report:
+        print(format_report(report(contracts)))
+        return 0
+    for source in contracts:
+        print('%s -> %s' % (source, os.path.relpath(compile_contract(source, args.profile), ROOT)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,292 @@
+"""
+Emulated chain state
+====================
+
+Holds deployed contracts, contract storage and block headers, and runs
+invocations the way a neo-python ``testinvoke`` followed by relaying the
+transaction would: storage changes are committed only when the script
+ends in HALT.
+"""
+import hashlib
+import os
+import struct
+
+from .types import from_python, to_json, int_to_bytes
+from .vm import ExecutionEngine, HALT, TRIGGER_APPLICATION, hash160
+from .interop import GAS_UNIT
+from . import opcodes as op
+
+GENESIS_TIMESTAMP = 1531000000
+BLOCK_INTERVAL = 15
+
+
+def script_hash_from_string(value):
+    """Convert a big-endian hex script hash ('c186bc...') to VM byte order."""
+    value = value[2:] if value.startswith('0x') else value
+    return bytes.fromhex(value)[::-1]
+
+
+class Contract(object):
+
+    def __init__(self, script, script_hash=None, name=None, native=None, payable=False):
+        self.script = script
+        self.script_hash = script_hash if script_hash is not None else hash160(script)
+        self.name = name or self.script_hash[::-1].hex()
+        self.native = native
+        self.payable = payable
+
+
+class Header(object):
+
+    def __init__(self, index, timestamp):
+        self.index = index
+        self.timestamp = timestamp
+        self.hash = hashlib.sha256(struct.pack('<II', index, timestamp)).digest()
+
+
+class Transaction(object):
+
+    def __init__(self, script, signers, nonce):
+        self.script = script
+        self.signers = frozenset(signers)
+        self.hash = hashlib.sha256(script + struct.pack('<Q', nonce)).digest()
+
+
+class Storage(object):
+    """Committed contract storage: script hash -> {key: value}."""
+
+    def __init__(self):
+        self.contracts = {}
+
+    def get(self, script_hash, key):
+        return self.contracts.get(script_hash, {}).get(key, b'')
+
+    def items(self, script_hash):
+        return self.contracts.get(script_hash, {})
+
+    def size(self, script_hash=None):
+        hashes = [script_hash] if script_hash is not None else list(self.contracts)
+        return sum(len(k) + len(v) for h in hashes for k, v in self.items(h).items())
+
+
+class StorageView(object):
+    """Copy-on-write view over Storage for the duration of one invocation."""
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.changes = {}
+
+    def get(self, script_hash, key):
+        change = self.changes.get((script_hash, key))
+        if change is not None:
+            return change[0]
+        return self.storage.get(script_hash, key)
+
+    def put(self, script_hash, key, value):
+        self.changes[(script_hash, key)] = (value,)
+
+    def delete(self, script_hash, key):
+        self.changes[(script_hash, key)] = (b'',)
+
+    def find(self, script_hash, prefix):
+        merged = dict(self.storage.items(script_hash))
+        for (h, key), (value,) in self.changes.items():
+            if h == script_hash:
+                merged[key] = value
+        return sorted((k, v) for k, v in merged.items() if k.startswith(prefix) and v != b'')
+
+    def commit(self):
+        for (script_hash, key), (value,) in self.changes.items():
+            contract_storage = self.storage.contracts.setdefault(script_hash, {})
+            if value == b'':
+                contract_storage.pop(key, None)
+            else:
+                contract_storage[key] = value
+        self.changes = {}
+
+
+class ScriptBuilder(object):
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def emit(self, opcode, operand=b''):
+        self.data.append(opcode)
+        self.data.extend(operand)
+        return self
+
+    def emit_push(self, value):
+        value = from_python(value)
+        if isinstance(value, bool):
+            return self.emit(op.PUSH1 if value else op.PUSH0)
+        if isinstance(value, int):
+            if value == -1:
+                return self.emit(op.PUSHM1)
+            if value == 0:
+                return self.emit(op.PUSH0)
+            if 0 < value <= 16:
+                return self.emit(op.PUSH1 + value - 1)
+            return self.emit_push(int_to_bytes(value))
+        if isinstance(value, list):
+            for item in reversed(value):
+                self.emit_push(item)
+            self.emit_push(len(value))
+            return self.emit(op.PACK)
+        length = len(value)
+        if length == 0:
+            return self.emit(op.PUSH0)
+        if length <= op.PUSHBYTES75:
+            return self.emit(length, value)
+        if length <= 0xFF:
+            return self.emit(op.PUSHDATA1, bytes([length]) + value)
+        if length <= 0xFFFF:
+            return self.emit(op.PUSHDATA2, struct.pack('<H', length) + value)
+        return self.emit(op.PUSHDATA4, struct.pack('<I', length) + value)
+
+    def emit_app_call(self, script_hash, operation, args):
+        self.emit_push(list(args))
+        self.emit_push(operation)
+        return self.emit(op.APPCALL, script_hash)
+
+    def to_bytes(self):
+        return bytes(self.data)
+
+
+class InvocationResult(object):
+
+    def __init__(self, engine, tx, operation):
+        self.operation = operation
+        self.tx = tx
+        self.state = engine.state
+        self.fault = engine.fault
+        self.stack = list(engine.eval_stack)
+        self.opcodes = engine.opcodes
+        self.gas_units = engine.gas_units
+        self.app_calls = engine.app_calls
+        self.storage_writes = engine.storage_writes
+        self.storage_bytes_written = engine.storage_bytes_written
+        self.storage_deletes = engine.storage_deletes
+        self.notifications = engine.notifications
+        self.logs = engine.logs
+
+    @property
+    def halted(self):
+        return self.state == HALT
+
+    @property
+    def result(self):
+        return self.stack[-1] if self.stack else None
+
+    @property
+    def gas(self):
+        return self.gas_units * GAS_UNIT
+
+    def application_log(self, block_index):
+        """neo-python style ApplicationLog JSON for this invocation."""
+        return {
+            'txid': '0x' + self.tx.hash[::-1].hex(),
+            'block': block_index,
+            'executions': [{
+                'trigger': 'Application',
+                'vmstate': self.state,
+                'gas_consumed': '%.3f' % self.gas,
+                'stack': [to_json(item) for item in self.stack],
+                'notifications': [
+                    {'contract': '0x' + h[::-1].hex(), 'state': to_json(state)}
+                    for h, state in self.notifications
+                ],
+            }],
+        }
+
+    def __repr__(self):
+        return '<InvocationResult %s %s opcodes=%d gas=%.3f>' % (
+            self.operation, self.state, self.opcodes, self.gas)
+
+
+class Chain(object):
+    """
+    In-process stand-in for a privnet. Contracts are deployed from compiled
+    .avm scripts or registered as native Python objects.
+    """
+
+    def __init__(self, timestamp=GENESIS_TIMESTAMP):
+        self.contracts = {}
+        self.storage = Storage()
+        self.headers = [Header(0, timestamp)]
+        self.nonce = 0
+        self.invocations = []  # (block index, InvocationResult) of committed runs
+        self.on_engine = None  # called with every new ExecutionEngine, e.g. to attach a tracer
+        self.advance()
+
+    @property
+    def height(self):
+        return len(self.headers) - 1
+
+    @property
+    def timestamp(self):
+        return self.headers[-1].timestamp
+
+    def header(self, index):
+        if 0 <= index < len(self.headers):
+            return self.headers[index]
+        return b''
+
+    def header_by_hash(self, block_hash):
+        for header in self.headers:
+            if header.hash == block_hash:
+                return header
+        return b''
+
+    def advance(self, blocks=1, seconds=BLOCK_INTERVAL):
+        for _ in range(blocks):
+            self.headers.append(Header(len(self.headers), self.timestamp + seconds))
+
+    def advance_to(self, timestamp):
+        while self.timestamp < timestamp:
+            self.advance()
+
+    def deploy(self, script, name=None, payable=False, script_hash=None):
+        contract = Contract(bytes(script), script_hash=script_hash, name=name, payable=payable)
+        self.contracts[contract.script_hash] = contract
+        return contract.script_hash
+
+    def deploy_file(self, path, name=None):
+        with open(path, 'rb') as f:
+            script = f.read()
+        if name is None:
+            name = os.path.splitext(os.path.basename(path))[0]
+        return self.deploy(script, name=name)
+
+    def register_native(self, native, name=None):
+        contract = Contract(b'', script_hash=native.script_hash, name=name, native=native)
+        self.contracts[native.script_hash] = contract
+        return native.script_hash
+
+    def invoke(self, script_hash, operation, args=(), signers=(), commit=True, gas_limit=None):
+        """
+        Invoke ``operation`` on a contract. ``signers`` are the script
+        hashes that pass CheckWitness. The storage changes are kept when
+        the script halts and ``commit`` is set.
+        """
+        script = ScriptBuilder().emit_app_call(script_hash, operation, args).to_bytes()
+        return self.run_script(script, signers, commit, gas_limit, operation)
+
+    def run_script(self, script, signers=(), commit=True, gas_limit=None, operation=None):
+        self.nonce += 1
+        tx = Transaction(script, signers, self.nonce)
+        view = StorageView(self.storage)
+        engine = ExecutionEngine(self, view, tx, TRIGGER_APPLICATION, gas_limit)
+        if self.on_engine is not None:
+            self.on_engine(engine)
+        engine.load_script(script)
+        engine.execute()
+        if engine.state == HALT and commit:
+            view.commit()
+        result = InvocationResult(engine, tx, operation)
+        if commit:
+            self.invocations.append((self.height, result))
+        return result
+
+    def application_logs(self, start=0):
+        """ApplicationLog JSON of the committed invocations in blocks ``start`` onwards."""
+        return [result.application_log(height) for height, result in self.invocations if height >= start]
@@ -0,0 +1,367 @@
+"""
+Off-chain event indexer
+=======================
+
+Reads ApplicationLog JSON, decodes the MCT transfer events and the
+notifications of the example contracts, and keeps an SQLite index that
+can be queried without test-invoking the contracts one id at a time:
+
+    sales               Safe Remote Purchase sales by seller, buyer and state
+    swap_fills          atomic swaps: what each trader sent and received
+    lock_withdrawals    payouts from lock and vesting contracts
+    errors              'error' notifications (OnError) of any contract
+
+Logs come from JSON files (one log per line, or a JSON list of logs, each
+with a 'block' field as written by InvocationResult.application_log), from
+a node's RPC interface (getblock and the ApplicationLogs plugin's
+getapplicationlog), or from an emulated Chain:
+
+    python -m mct_tools.indexer --db index.sqlite --srp 0x... --swap 0x... logs.jsonl
+    python -m mct_tools.indexer --db index.sqlite --lock 0x... --rpc http://127.0.0.1:30333
+
+    index = Indexer('index.sqlite', srp=[srp_hash])
+    index.index(chain.application_logs(index.height + 1))
+
+The index is committed block by block together with the height of the
+last block indexed, and logs of blocks up to that height are skipped, so
+an interrupted or repeated run resumes where the previous one stopped.
+
+Script hashes, addresses and txids are stored in the '0x' + big-endian hex
+form ApplicationLogs use; sale ids as the hex of the bytes the contract
+takes, amounts as integers in the token's smallest unit.
+"""
+import argparse
+import json
+import sqlite3
+import sys
+
+from .chain import script_hash_from_string
+from .srp import STATES
+from .types import int_to_bytes
+
+SALE_STATES = dict(STATES)
+SALE_STATES[0] = 'closed'  # completed or deleted
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoint (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    height INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sales (
+    sale_id TEXT NOT NULL,
+    contract TEXT NOT NULL,
+    seller TEXT,
+    buyer TEXT,
+    price INTEGER,
+    state TEXT NOT NULL,
+    created_block INTEGER,
+    updated_block INTEGER NOT NULL,
+    created_txid TEXT,
+    PRIMARY KEY (contract, sale_id)
+);
+CREATE INDEX IF NOT EXISTS sales_seller ON sales (seller, state);
+CREATE INDEX IF NOT EXISTS sales_buyer ON sales (buyer, state);
+CREATE INDEX IF NOT EXISTS sales_txid ON sales (created_txid);
+CREATE TABLE IF NOT EXISTS swap_fills (
+    txid TEXT PRIMARY KEY,
+    block INTEGER NOT NULL,
+    contract TEXT NOT NULL,
+    trader TEXT NOT NULL,
+    token_in TEXT NOT NULL,
+    amount_in INTEGER NOT NULL,
+    token_out TEXT NOT NULL,
+    amount_out INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS swap_fills_trader ON swap_fills (trader);
+CREATE TABLE IF NOT EXISTS lock_withdrawals (
+    txid TEXT NOT NULL,
+    block INTEGER NOT NULL,
+    contract TEXT NOT NULL,
+    token TEXT NOT NULL,
+    payee TEXT NOT NULL,
+    amount INTEGER NOT NULL,
+    PRIMARY KEY (txid, contract, token, payee)
+);
+CREATE INDEX IF NOT EXISTS lock_withdrawals_payee ON lock_withdrawals (payee);
+CREATE TABLE IF NOT EXISTS errors (
+    txid TEXT NOT NULL,
+    block INTEGER NOT NULL,
+    contract TEXT NOT NULL,
+    message TEXT NOT NULL,
+    PRIMARY KEY (txid, contract)
+);
+"""
+
+
+def display_hash(value):
+    """'0x' + big-endian hex of a script hash given in VM byte order."""
+    return '0x' + bytes(value)[::-1].hex()
+
+
+def _hash_string(value):
+    if isinstance(value, (bytes, bytearray)):
+        return display_hash(value)
+    return display_hash(script_hash_from_string(value))
+
+
+def decode_item(item):
+    """Python value of an ApplicationLog stack item: bytes, int, bool or list."""
+    kind = item.get('type')
+    value = item.get('value')
+    if kind == 'ByteArray':
+        return bytes.fromhex(value)
+    if kind == 'Integer':
+        return int(value)
+    if kind == 'Boolean':
+        return bool(value)
+    if kind in ('Array', 'Struct'):
+        return [decode_item(v) for v in value]
+    return value
+
+
+def _int(value):
+    if isinstance(value, (bytes, bytearray)):
+        return int.from_bytes(value, 'little', signed=True)
+    return int(value)
+
+
+def _sale_id(value):
+    # the contract emits new sale ids as integers, but takes and stores them as bytes
+    if isinstance(value, int):
+        value = int_to_bytes(value)
+    return bytes(value).hex()
+
+
+def _text(value):
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode('utf-8', 'replace')
+    return str(value)
+
+
+class Indexer(object):
+    """
+    ``srp``, ``swap`` and ``lock`` list the script hashes (VM byte order or
+    hex strings) of the Safe Remote Purchase, atomic swap and lock or
+    vesting contracts to index.
+    """
+
+    def __init__(self, path, srp=(), swap=(), lock=()):
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+        self.srp = set(_hash_string(h) for h in srp)
+        self.swap = set(_hash_string(h) for h in swap)
+        self.lock = set(_hash_string(h) for h in lock)
+
+    @property
+    def height(self):
+        """Height of the last block indexed, -1 before the first one."""
+        row = self.db.execute('SELECT height FROM checkpoint WHERE id = 0').fetchone()
+        return row[0] if row else -1
+
+    def close(self):
+        self.db.close()
+
+    def index(self, logs):
+        """
+        Index ``logs`` (ApplicationLog dicts in block order) and return the
+        number indexed. Each block is committed with its checkpoint once
+        the first log of a later block arrives, and the last block when the
+        logs run out.
+        """
+        checkpoint = self.height
+        block = None
+        count = 0
+        for log in logs:
+            height = log['block']
+            if height <= checkpoint:
+                continue
+            if block is not None and height != block:
+                self._commit(block)
+            block = height
+            self._index_log(log, height)
+            count += 1
+        if block is not None:
+            self._commit(block)
+        return count
+
+    def _commit(self, height):
+        self.db.execute('INSERT OR REPLACE INTO checkpoint (id, height) VALUES (0, ?)', (height,))
+        self.db.commit()
+
+    def _index_log(self, log, height):
+        txid = log['txid']
+        for execution in log.get('executions', []):
+            halted = 'FAULT' not in execution.get('vmstate', '')
+            transfers = []
+            for notification in execution.get('notifications', []):
+                contract = notification['contract']
+                state = decode_item(notification['state'])
+                if not isinstance(state, list) or not state:
+                    continue
+                event = _text(state[0])
+                if event == 'error':
+                    self.db.execute('INSERT OR REPLACE INTO errors VALUES (?, ?, ?, ?)',
+                                    (txid, height, contract, _text(state[1]) if len(state) > 1 else ''))
+                elif not halted:
+                    continue  # the state changes of a FAULTed invocation were rolled back
+                elif event == 'transfer' and len(state) == 4:
+                    transfers.append((contract, state[1], state[2], _int(state[3])))
+                elif contract in self.srp:
+                    self._sale_event(txid, contract, event, state[1:], height)
+            if halted and transfers:
+                self._transfers(txid, height, transfers)
+
+    def _sale_event(self, txid, contract, event, args, height):
+        if event == 'saleCreated' and len(args) == 4:
+            sale_id, seller, buyer, price = args
+            self.db.execute('INSERT OR REPLACE INTO sales VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', (
+                _sale_id(sale_id), contract, display_hash(seller),
+                display_hash(buyer) if _int(buyer) else None, _int(price),
+                SALE_STATES[1], height, height, txid))
+        elif event == 'saleState' and len(args) == 3:
+            sale_id, state, buyer = args
+            state = SALE_STATES.get(_int(state), str(_int(state)))
+            sale_id = _sale_id(sale_id)
+            cursor = self.db.execute(
+                'UPDATE sales SET state = ?, buyer = ?, updated_block = ? WHERE contract = ? AND sale_id = ?',
+                (state, display_hash(buyer), height, contract, sale_id))
+            if not cursor.rowcount:  # created before the contract emitted events
+                self.db.execute(
+                    'INSERT INTO sales (sale_id, contract, buyer, state, updated_block) VALUES (?, ?, ?, ?, ?)',
+                    (sale_id, contract, display_hash(buyer), state, height))
+
+    def _transfers(self, txid, height, transfers):
+        for token, t_from, t_to, amount in transfers:
+            source = display_hash(t_from) if t_from else None
+            if source in self.lock:
+                self.db.execute('INSERT OR REPLACE INTO lock_withdrawals VALUES (?, ?, ?, ?, ?, ?)',
+                                (txid, height, source, token, display_hash(t_to), amount))
+
+        # a swap is a transfer into the swap contract and one back out to
+        # the same address in another token, within one transaction; a
+        # partial fill also sends part of the amount back in the same token
+        for token_in, t_from, t_to, amount_in in transfers:
+            if not t_to or display_hash(t_to) not in self.swap:
+                continue
+            refunded = sum(amount for token, r_from, r_to, amount in transfers
+                           if token == token_in and r_from == t_to and r_to == t_from)
+            for token_out, r_from, r_to, amount_out in transfers:
+                if r_from == t_to and r_to == t_from and token_out != token_in:
+                    self.db.execute('INSERT OR REPLACE INTO swap_fills VALUES (?, ?, ?, ?, ?, ?, ?, ?)', (
+                        txid, height, display_hash(t_to), display_hash(t_from),
+                        token_in, amount_in - refunded, token_out, amount_out))
+                    break
+
+    # queries
+
+    def sales(self, seller=None, buyer=None, state=None):
+        """Sales as dicts, optionally only those of a seller, buyer or state."""
+        clauses = []
+        params = []
+        for column, value in (('seller', seller), ('buyer', buyer)):
+            if value is not None:
+                clauses.append(column + ' = ?')
+                params.append(_hash_string(value))
+        if state is not None:
+            clauses.append('state = ?')
+            params.append(state)
+        return self._rows('sales', clauses, params, 'created_block, sale_id')
+
+    def sale_by_txid(self, txid):
+        """The sale created by transaction ``txid`` (a "0x" string or bytes in VM order), or None."""
+        rows = self._rows('sales', ['created_txid = ?'], [_hash_string(txid)], 'sale_id')
+        return rows[0] if rows else None
+
+    def swap_fills(self, trader=None):
+        if trader is None:
+            return self._rows('swap_fills', [], [], 'block, txid')
+        return self._rows('swap_fills', ['trader = ?'], [_hash_string(trader)], 'block, txid')
+
+    def lock_withdrawals(self, payee=None):
+        if payee is None:
+            return self._rows('lock_withdrawals', [], [], 'block, txid')
+        return self._rows('lock_withdrawals', ['payee = ?'], [_hash_string(payee)], 'block, txid')
+
+    def errors(self):
+        return self._rows('errors', [], [], 'block, txid')
+
+    def _rows(self, table, clauses, params, order):
+        query = 'SELECT * FROM ' + table
+        if clauses:
+            query += ' WHERE ' + ' AND '.join(clauses)
+        cursor = self.db.execute(query + ' ORDER BY ' + order, params)
+        columns = [d[0] for d in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def read_logs(paths):
+    """Yield the ApplicationLogs in JSON files, one per line or as a JSON list."""
+    for path in paths:
+        with open(path) as f:
+            text = f.read()
+        if text.lstrip().startswith('['):
+            for log in json.loads(text):
+                yield log
+        else:
+            for line in text.splitlines():
+                if line.strip():
+                    yield json.loads(line)
+
+
+class RPCClient(object):
+
+    def __init__(self, url):
+        self.url = url
+        self.id = 0
+
+    def call(self, method, *params):
+        from urllib.request import Request, urlopen
+
+        self.id += 1
+        body = json.dumps({'jsonrpc': '2.0', 'id': self.id, 'method': method, 'params': list(params)})
+        request = Request(self.url, body.encode('utf-8'), {'Content-Type': 'application/json'})
+        with urlopen(request) as response:
+            reply = json.loads(response.read().decode('utf-8'))
+        if reply.get('error'):
+            raise RuntimeError('%s: %s' % (method, reply['error']))
+        return reply['result']
+
+
+def rpc_logs(url, start):
+    """Yield the ApplicationLogs of the invocations in blocks ``start`` onwards."""
+    rpc = RPCClient(url)
+    for height in range(start, rpc.call('getblockcount')):
+        block = rpc.call('getblock', height, 1)
+        for tx in block['tx']:
+            if tx['type'] != 'InvocationTransaction':
+                continue
+            log = rpc.call('getapplicationlog', tx['txid'])
+            log['block'] = height
+            yield log
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--db', required=True, help='SQLite index file, created if missing')
+    parser.add_argument('--srp', action='append', default=[], help='Safe Remote Purchase script hash')
+    parser.add_argument('--swap', action='append', default=[], help='atomic swap script hash')
+    parser.add_argument('--lock', action='append', default=[], help='lock or vesting contract script hash')
+    parser.add_argument('--rpc', metavar='URL', help='read logs from a node instead of files')
+    parser.add_argument('logs', nargs='*', help='ApplicationLog JSON files')
+    args = parser.parse_args(argv)
+
+    indexer = Indexer(args.db, srp=args.srp, swap=args.swap, lock=args.lock)
+    try:
+        if args.rpc:
+            logs = rpc_logs(args.rpc, indexer.height + 1)
+        else:
+            logs = read_logs(args.logs)
+        count = indexer.index(logs)
+        print('indexed %d logs, at block %d' % (count, indexer.height))
+    finally:
+        indexer.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,299 @@
+"""
+Interop services and GAS pricing
+================================
+
+SYSCALL handlers for the subset of the NEO 2.x interop API that neo-boa
+contracts use, plus the fee schedule from the reference ApplicationEngine.
+Fees are counted in units of 0.001 GAS.
+"""
+from . import opcodes as op
+from .types import VMFault, Map, to_bytes, to_int, serialize, deserialize
+
+GAS_UNIT = 0.001
+
+OPCODE_PRICES = {
+    op.NOP: 0,
+    op.APPCALL: 10, op.TAILCALL: 10,
+    op.CALL_E: 10, op.CALL_ED: 10, op.CALL_ET: 10, op.CALL_EDT: 10,
+    op.SHA1: 10, op.SHA256: 10,
+    op.HASH160: 20, op.HASH256: 20,
+    op.CHECKSIG: 100, op.VERIFY: 100,
+}
+
+SYSCALL_PRICES = {
+    'Neo.Runtime.CheckWitness': 200,
+    'Neo.Blockchain.GetHeader': 100,
+    'Neo.Blockchain.GetBlock': 200,
+    'Neo.Blockchain.GetTransaction': 100,
+    'Neo.Blockchain.GetTransactionHeight': 100,
+    'Neo.Blockchain.GetAccount': 100,
+    'Neo.Blockchain.GetValidators': 200,
+    'Neo.Blockchain.GetAsset': 100,
+    'Neo.Blockchain.GetContract': 100,
+    'Neo.Transaction.GetReferences': 200,
+    'Neo.Transaction.GetUnspentCoins': 200,
+    'Neo.Transaction.GetWitnesses': 200,
+    'Neo.Storage.Get': 100,
+    'Neo.Storage.Delete': 100,
+    'Neo.Storage.Find': 1,
+}
+
+
+def opcode_price(opcode):
+    if opcode <= op.PUSH16:
+        return 0
+    return OPCODE_PRICES.get(opcode, 1)
+
+
+def storage_put_price(key, value):
+    return ((len(key) + len(value) - 1) // 1024 + 1) * 1000
+
+
+def syscall_price(engine, name):
+    if name == 'Neo.Storage.Put':
+        stack = engine.eval_stack
+        return storage_put_price(to_bytes(stack[-2]), to_bytes(stack[-3]))
+    return SYSCALL_PRICES.get(name, 1)
+
+
+class StorageContext(object):
+    __slots__ = ('script_hash',)
+
+    def __init__(self, script_hash):
+        self.script_hash = script_hash
+
+
+class StorageIterator(object):
+    """Result of Storage.Find; also serves Iterator/Enumerator syscalls."""
+
+    def __init__(self, pairs):
+        self._pairs = pairs
+        self._index = -1
+
+    def next(self):
+        self._index += 1
+        return self._index < len(self._pairs)
+
+    def key(self):
+        return self._pairs[self._index][0]
+
+    def value(self):
+        return self._pairs[self._index][1]
+
+
+def _pop(engine):
+    try:
+        return engine.eval_stack.pop()
+    except IndexError:
+        raise VMFault('evaluation stack underflow')
+
+
+def _push(engine, item):
+    engine.eval_stack.append(item)
+
+
+def _storage_context(engine):
+    context = _pop(engine)
+    if not isinstance(context, StorageContext):
+        raise VMFault('expected a storage context')
+    if context.script_hash != engine.current_script_hash:
+        raise VMFault('storage context does not belong to the executing script')
+    return context
+
+
+# Runtime
+
+def runtime_get_trigger(engine):
+    _push(engine, engine.trigger)
+
+
+def runtime_check_witness(engine):
+    _push(engine, engine.check_witness(to_bytes(_pop(engine))))
+
+
+def runtime_notify(engine):
+    engine.notify(_pop(engine))
+
+
+def runtime_log(engine):
+    engine.log(to_bytes(_pop(engine)).decode('utf-8', 'replace'))
+
+
+def runtime_get_time(engine):
+    _push(engine, engine.chain.timestamp)
+
+
+def runtime_serialize(engine):
+    _push(engine, serialize(_pop(engine)))
+
+
+def runtime_deserialize(engine):
+    _push(engine, deserialize(to_bytes(_pop(engine))))
+
+
+# Execution engine
+
+def get_script_container(engine):
+    _push(engine, engine.tx)
+
+
+def get_executing_script_hash(engine):
+    _push(engine, engine.current_script_hash)
+
+
+def get_calling_script_hash(engine):
+    _push(engine, engine.calling_script_hash)
+
+
+def get_entry_script_hash(engine):
+    _push(engine, engine.entry_script_hash)
+
+
+# Blockchain
+
+def blockchain_get_height(engine):
+    _push(engine, engine.chain.height)
+
+
+def blockchain_get_header(engine):
+    item = _pop(engine)
+    data = to_bytes(item)
+    if len(data) == 32:
+        header = engine.chain.header_by_hash(data)
+    else:
+        header = engine.chain.header(to_int(item))
+    _push(engine, header)
+
+
+def blockchain_get_contract(engine):
+    contract = engine.chain.contracts.get(to_bytes(_pop(engine)))
+    _push(engine, contract if contract is not None else b'')
+
+
+def header_get_index(engine):
+    _push(engine, _pop(engine).index)
+
+
+def header_get_timestamp(engine):
+    _push(engine, _pop(engine).timestamp)
+
+
+def header_get_hash(engine):
+    _push(engine, _pop(engine).hash)
+
+
+def transaction_get_hash(engine):
+    _push(engine, _pop(engine).hash)
+
+
+def contract_get_script(engine):
+    _push(engine, _pop(engine).script)
+
+
+def contract_is_payable(engine):
+    _push(engine, _pop(engine).payable)
+
+
+def contract_get_storage_context(engine):
+    contract = _pop(engine)
+    _push(engine, StorageContext(contract.script_hash))
+
+
+# Storage
+
+def storage_get_context(engine):
+    _push(engine, StorageContext(engine.current_script_hash))
+
+
+def storage_get(engine):
+    context = _storage_context(engine)
+    key = to_bytes(_pop(engine))
+    _push(engine, engine.storage.get(context.script_hash, key))
+
+
+def storage_put(engine):
+    context = _storage_context(engine)
+    key = to_bytes(_pop(engine))
+    if len(key) > 1024:
+        raise VMFault('storage key too long')
+    value = to_bytes(_pop(engine))
+    engine.storage_put(context.script_hash, key, value)
+
+
+def storage_delete(engine):
+    context = _storage_context(engine)
+    engine.storage_delete(context.script_hash, to_bytes(_pop(engine)))
+
+
+def storage_find(engine):
+    context = _storage_context(engine)
+    prefix = to_bytes(_pop(engine))
+    _push(engine, StorageIterator(engine.storage.find(context.script_hash, prefix)))
+
+
+def iterator_create(engine):
+    item = _pop(engine)
+    if isinstance(item, Map):
+        pairs = item.items()
+    elif isinstance(item, list):
+        pairs = list(enumerate(item))
+    else:
+        raise VMFault('cannot iterate over %s' % type(item).__name__)
+    _push(engine, StorageIterator(pairs))
+
+
+def iterator_next(engine):
+    _push(engine, _pop(engine).next())
+
+
+def iterator_key(engine):
+    _push(engine, _pop(engine).key())
+
+
+def iterator_value(engine):
+    _push(engine, _pop(engine).value())
+
+
+SYSCALLS = {
+    'Neo.Runtime.GetTrigger': runtime_get_trigger,
+    'Neo.Runtime.CheckWitness': runtime_check_witness,
+    'Neo.Runtime.Notify': runtime_notify,
+    'Neo.Runtime.Log': runtime_log,
+    'Neo.Runtime.GetTime': runtime_get_time,
+    'Neo.Runtime.Serialize': runtime_serialize,
+    'Neo.Runtime.Deserialize': runtime_deserialize,
+    'System.ExecutionEngine.GetScriptContainer': get_script_container,
+    'System.ExecutionEngine.GetExecutingScriptHash': get_executing_script_hash,
+    'System.ExecutionEngine.GetCallingScriptHash': get_calling_script_hash,
+    'System.ExecutionEngine.GetEntryScriptHash': get_entry_script_hash,
+    'Neo.Blockchain.GetHeight': blockchain_get_height,
+    'Neo.Blockchain.GetHeader': blockchain_get_header,
+    'Neo.Blockchain.GetContract': blockchain_get_contract,
+    'Neo.Header.GetIndex': header_get_index,
+    'Neo.Header.GetTimestamp': header_get_timestamp,
+    'Neo.Header.GetHash': header_get_hash,
+    'Neo.Block.GetTimestamp': header_get_timestamp,
+    'Neo.Transaction.GetHash': transaction_get_hash,
+    'Neo.Contract.GetScript': contract_get_script,
+    'Neo.Contract.IsPayable': contract_is_payable,
+    'Neo.Contract.GetStorageContext': contract_get_storage_context,
+    'Neo.Storage.GetContext': storage_get_context,
+    'Neo.Storage.Get': storage_get,
+    'Neo.Storage.Put': storage_put,
+    'Neo.Storage.Delete': storage_delete,
+    'Neo.Storage.Find': storage_find,
+    'Neo.Iterator.Create': iterator_create,
+    'Neo.Iterator.Next': iterator_next,
+    'Neo.Iterator.Key': iterator_key,
+    'Neo.Iterator.Value': iterator_value,
+    'Neo.Enumerator.Create': iterator_create,
+    'Neo.Enumerator.Next': iterator_next,
+    'Neo.Enumerator.Value': iterator_value,
+}
+
+
+def invoke_syscall(engine, name):
+    handler = SYSCALLS.get(name)
+    if handler is None:
+        raise VMFault('syscall %s is not supported by the emulator' % name)
+    handler(engine)
@@ -0,0 +1,453 @@
+"""
+Load simulation for the example contracts
+=========================================
+
+Runs randomized multi-party workloads against the emulated privnet and
+reports how the contracts hold up when many parties act in the same
+blocks: invocations per second, the GAS distribution of every operation,
+how often and why invocations fail, and how much staked storage the
+contract ends up with.
+
+    python -m mct_tools.loadsim                               # every workload
+    python -m mct_tools.loadsim --workload swap --parties 500 --steps 2000
+    python -m mct_tools.loadsim --scenarios 32 --workers 8 --json > load.json
+
+Workloads
+---------
+
+srp      safe-remote-purchase.py sales: create, buyer deposit, ship,
+         confirm and delete, with designated buyers and open sales
+swap     atomicswap.py swaps between MCT, CTX and CTY while the owner keeps
+         moving the rates; most swappers pass the rate they were quoted
+         as desired_rate, with --slippage as their max_slippage
+lock     mct-vesting-contract.py locks in tranches and withdrawMany
+
+Parties pick their actions from the chain state as of the start of the
+block, so actions in the same block can conflict: two buyers depositing
+into the same open sale, or a swap quoted before a rate change in the same
+block. Each scenario is an independent privnet with its own seed, and the
+scenarios run on a process pool.
+"""
+import argparse
+import collections
+import json
+import math
+import multiprocessing
+import random
+import sys
+import time
+
+from .blobstore import digest_of
+from .build import load_script
+from .chain import BLOCK_INTERVAL
+from .privnet import Privnet, ZERO_OWNER
+from .srp import created_sale_id
+from .types import to_bool
+
+COIN = 10 ** 8
+
+
+def party(index):
+    return b'\xa0' + index.to_bytes(19, 'big')
+
+
+def outcome(result, script_hash=None):
+    """
+    Return ('ok' | 'rejected' | 'fault', reason) for an invocation. The
+    reason is the last error notification or log message, preferring those
+    of the contract ``script_hash`` over the token's.
+    """
+    if result.halted and to_bool(result.result):
+        return 'ok', ''
+    reason = ''
+    messages = [(h, state[1]) for h, state in result.notifications
+                if isinstance(state, list) and len(state) == 2 and state[0] == b'error']
+    messages.extend(result.logs)
+    own = [message for h, message in messages if h == script_hash]
+    if own or messages:
+        reason = (own or [message for _, message in messages])[-1]
+    if isinstance(reason, bytes):
+        reason = reason.decode('utf-8', 'replace')
+    if result.halted:
+        return 'rejected', reason or 'returned false'
+    return 'fault', reason or result.fault or 'fault'
+
+
+class Workload(object):
+    """
+    A randomized workload on one privnet. ``step`` makes one invocation and
+    returns its label and result; ``begin_block`` refreshes the view of the
+    chain the parties choose their next actions from.
+    """
+    source = None
+    stake = ('MCT',)
+
+    def __init__(self, net, rng, parties):
+        self.net = net
+        self.chain = net.chain
+        self.rng = rng
+        self.parties = [party(i) for i in range(parties)]
+        self.script_hash = net.deploy(self.source, stake=self.stake)
+
+    def begin_block(self):
+        pass
+
+    def step(self):
+        raise NotImplementedError
+
+
+class SalesWorkload(Workload):
+
+    source = 'safe-remote-purchase.py'
+    stake = ('CTX',)
+
+    def __init__(self, net, rng, parties):
+        Workload.__init__(self, net, rng, parties)
+        for address in self.parties:
+            net.fund('CTX', address, 100000 * COIN)
+        self.sales = {}  # sale id -> [seller, buyer, price, status], closed ones until the next block
+        self.view = {}
+        self.acted = set()
+
+    def begin_block(self):
+        self.sales = dict((k, v) for k, v in self.sales.items() if v[3] != 'closed')
+        view = collections.defaultdict(list)
+        for sale_id, (_, _, _, status) in self.sales.items():
+            view[status].append(sale_id)
+        self.view = view
+        self.acted = set()
+
+    def step(self):
+        rng = self.rng
+        actions = ['create'] * 4
+        for status, action in (('new', 'deposit'), ('new', 'delete'), ('paid', 'ship'), ('shipped', 'confirm')):
+            if self.view.get(status):
+                actions.extend([action] * (1 if action == 'delete' else 4))
+        action = rng.choice(actions)
+        if action == 'create':
+            return self.create()
+        status = {'deposit': 'new', 'delete': 'new', 'ship': 'paid', 'confirm': 'shipped'}[action]
+        sale_id = rng.choice(self.view[status])
+        if (sale_id, action) in self.acted and action != 'deposit':
+            return self.create()  # the seller or buyer already sent this one in the block
+        self.acted.add((sale_id, action))
+        seller, buyer, price, _ = self.sales[sale_id]
+        if action == 'deposit':
+            if not buyer:
+                buyer = rng.choice([p for p in rng.sample(self.parties, 2) if p != seller])
+            result = self.net.transfer('CTX', buyer, self.script_hash, 2 * price, ['buyerDeposit', sale_id])
+            if outcome(result)[0] == 'ok':
+                self.sales[sale_id] = [seller, buyer, price, 'paid']
+            return 'onTokenTransfer::buyerDeposit', result
+        if action == 'delete':
+            result = self.chain.invoke(self.script_hash, 'deleteSale', [sale_id], signers=[seller])
+            if outcome(result)[0] == 'ok':
+                self.sales[sale_id][3] = 'closed'
+            return 'deleteSale', result
+        if action == 'ship':
+            result = self.chain.invoke(self.script_hash, 'confirmShipment', [sale_id], signers=[seller])
+            if outcome(result)[0] == 'ok':
+                self.sales[sale_id][3] = 'shipped'
+            return 'confirmShipment', result
+        result = self.chain.invoke(self.script_hash, 'confirmReceived', [sale_id], signers=[buyer])
+        if outcome(result)[0] == 'ok':
+            self.sales[sale_id][3] = 'closed'
+        return 'confirmReceived', result
+
+    def create(self):
+        rng = self.rng
+        seller, buyer = rng.sample(self.parties, 2)
+        if rng.random() < 0.2:
+            buyer = b''  # open to any buyer
+        price = rng.randint(1, 500) * COIN
+        description = digest_of('item %d ' % rng.randint(0, 10 ** 6) * rng.randint(1, 12))
+        result = self.net.transfer('CTX', seller, self.script_hash, 2 * price, ['createSale', buyer, price, description])
+        if outcome(result)[0] == 'ok':
+            self.sales[created_sale_id(result)] = [seller, buyer, price, 'new']
+        return 'onTokenTransfer::createSale', result
+
+
+class SwapWorkload(Workload):
+
+    source = 'atomicswap.py'
+    stake = ('CTX',)
+    rate_changes = 0.05  # share of invocations that are owner rate updates
+    volatility = 0.02  # largest relative change of a rate update
+    quoted = 0.8  # share of swaps passing the quoted rate as desired_rate
+
+    def __init__(self, net, rng, parties, slippage=None):
+        Workload.__init__(self, net, rng, parties)
+        self.slippage = slippage  # max_slippage in basis points, or None for exact rates
+        self.tokens = ['MCT', 'CTX', 'CTY']
+        for symbol in self.tokens:
+            token = net.tokens[symbol]
+            net.expect(self.chain.invoke(self.script_hash, 'registerToken', [token], signers=[ZERO_OWNER]))
+            net.fund(symbol, ZERO_OWNER, 10 ** 6 * COIN)
+            net.expect(net.transfer(symbol, ZERO_OWNER, self.script_hash, 10 ** 6 * COIN))
+            for address in self.parties:
+                net.fund(symbol, address, 10000 * COIN)
+        self.rates = {}
+        pairs = []
+        for a in self.tokens:
+            for b in self.tokens:
+                if a < b:
+                    rate = rng.randint(COIN // 4, 4 * COIN)
+                    self.rates[(a, b)] = rate
+                    self.rates[(b, a)] = COIN * COIN // rate
+                    pairs.extend(self._pair(a, b))
+        net.expect(self.chain.invoke(self.script_hash, 'setExchangeRates', [pairs], signers=[ZERO_OWNER]))
+        self.quotes = {}
+
+    def _pair(self, a, b):
+        tokens = self.net.tokens
+        return [[tokens[a], tokens[b], self.rates[(a, b)]], [tokens[b], tokens[a], self.rates[(b, a)]]]
+
+    def begin_block(self):
+        self.quotes = dict(self.rates)
+
+    def step(self):
+        rng = self.rng
+        a, b = rng.sample(self.tokens, 2)
+        if rng.random() < self.rate_changes:
+            rate = int(self.rates[(a, b)] * (1 + rng.uniform(-self.volatility, self.volatility)))
+            self.rates[(a, b)] = rate
+            self.rates[(b, a)] = COIN * COIN // rate
+            result = self.chain.invoke(self.script_hash, 'setExchangeRates', [self._pair(a, b)], signers=[ZERO_OWNER])
+            return 'setExchangeRates', result
+        sender = rng.choice(self.parties)
+        amount = rng.randint(1, 100) * COIN
+        args = [self.net.tokens[b]]
+        label = 'onTokenTransfer (swap)'
+        if rng.random() < self.quoted:
+            args.append(self.quotes[(a, b)])
+            label = 'onTokenTransfer (swap at desired rate)'
+            if self.slippage is not None:
+                args.append(self.slippage)
+                label = 'onTokenTransfer (swap within slippage)'
+        return label, self.net.transfer(a, sender, self.script_hash, amount, *args)
+
+
+class LockWorkload(Workload):
+
+    source = 'mct-vesting-contract.py'
+
+    def __init__(self, net, rng, parties, horizon):
+        Workload.__init__(self, net, rng, parties)
+        for address in self.parties:
+            net.fund('MCT', address, 100000 * COIN)
+        self.horizon = horizon  # seconds the scenario is expected to cover
+        self.locks = collections.defaultdict(list)  # payee -> time the last tranche of each lock unlocks
+        self.view = []
+        self.acted = set()
+
+    def begin_block(self):
+        self.view = [payee for payee, locks in self.locks.items() if locks]
+        self.acted = set()
+
+    def step(self):
+        rng = self.rng
+        if self.view and rng.random() < 0.3:
+            payee = rng.choice(self.view)
+            if payee not in self.acted:
+                self.acted.add(payee)
+                result = self.chain.invoke(self.script_hash, 'withdrawMany', [payee])
+                if outcome(result)[0] == 'ok':
+                    now = self.chain.timestamp
+                    self.locks[payee] = [end for end in self.locks[payee] if end > now]
+                return 'withdrawMany', result
+        depositor, payee = rng.sample(self.parties, 2)
+        unlock_time = self.chain.timestamp + rng.randint(0, self.horizon)
+        terms = [payee, unlock_time]
+        end = unlock_time
+        label = 'onTokenTransfer (lock)'
+        if rng.random() < 0.5:
+            tranches = rng.randint(2, 12)
+            interval = rng.randint(1, max(1, self.horizon // 10))
+            terms.extend([tranches, interval])
+            end += (tranches - 1) * interval
+            label = 'onTokenTransfer (lock in tranches)'
+        result = self.net.transfer('MCT', depositor, self.script_hash, rng.randint(100, 1000) * COIN, terms)
+        if outcome(result)[0] == 'ok':
+            self.locks[payee].append(end)
+        return label, result
+
+
+WORKLOADS = collections.OrderedDict([
+    ('srp', SalesWorkload),
+    ('swap', SwapWorkload),
+    ('lock', LockWorkload),
+])
+
+
+def run_scenario(task):
+    """
+    Run one scenario on a fresh privnet and return its raw results. Takes a
+    single tuple so it can be mapped over a process pool.
+    """
+    name, seed, parties, steps, block_txs, mct, slippage = task
+    rng = random.Random(seed)
+    net = Privnet(mct=mct)
+    if name == 'lock':
+        workload = LockWorkload(net, rng, parties, horizon=steps // block_txs * BLOCK_INTERVAL)
+    elif name == 'swap':
+        workload = SwapWorkload(net, rng, parties, slippage)
+    else:
+        workload = WORKLOADS[name](net, rng, parties)
+
+    invocations = []
+    started = time.time()
+    for i in range(steps):
+        if i % block_txs == 0:
+            if i:
+                net.chain.advance()
+            workload.begin_block()
+        label, result = workload.step()
+        state, reason = outcome(result, workload.script_hash)
+        invocations.append((label, state, reason, result.gas_units, result.opcodes, result.storage_bytes_written))
+    elapsed = time.time() - started
+
+    footprint = {'keys': 0, 'bytes': 0}
+    for symbol in net.tokens:
+        items = net.staked_items(symbol, workload.script_hash)
+        footprint['keys'] += len(items)
+        footprint['bytes'] += sum(len(k) + len(v) for k, v in items.items())
+    return {
+        'workload': name,
+        'seed': seed,
+        'elapsed': elapsed,
+        'blocks': (steps + block_txs - 1) // block_txs,
+        'invocations': invocations,
+        'footprint': footprint,
+    }
+
+
+def percentile(values, share):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    index = max(0, int(math.ceil(share * len(ordered))) - 1)
+    return ordered[min(index, len(ordered) - 1)]
+
+
+def summarize(scenarios, wall_time):
+    """Aggregate scenario results into per-workload reports."""
+    report = collections.OrderedDict()
+    for scenario in scenarios:
+        entry = report.setdefault(scenario['workload'], {
+            'scenarios': 0, 'invocations': 0, 'elapsed': 0.0, 'blocks': 0,
+            'operations': collections.OrderedDict(), 'failures': collections.Counter(),
+            'storage_keys': [], 'storage_bytes': [],
+        })
+        entry['scenarios'] += 1
+        entry['invocations'] += len(scenario['invocations'])
+        entry['elapsed'] += scenario['elapsed']
+        entry['blocks'] += scenario['blocks']
+        entry['storage_keys'].append(scenario['footprint']['keys'])
+        entry['storage_bytes'].append(scenario['footprint']['bytes'])
+        for label, state, reason, gas_units, opcodes, written in scenario['invocations']:
+            operation = entry['operations'].setdefault(label, {'gas_units': [], 'opcodes': [], 'written': [], 'failed': 0})
+            operation['gas_units'].append(gas_units)
+            operation['opcodes'].append(opcodes)
+            operation['written'].append(written)
+            if state != 'ok':
+                operation['failed'] += 1
+                entry['failures']['%s %s: %s' % (label, state, reason)] += 1
+
+    result = collections.OrderedDict()
+    for name, entry in report.items():
+        operations = collections.OrderedDict()
+        for label, operation in entry['operations'].items():
+            count = len(operation['gas_units'])
+            operations[label] = {
+                'count': count,
+                'failed': operation['failed'],
+                'gas_p50': percentile(operation['gas_units'], 0.5) / 1000.0,
+                'gas_p99': percentile(operation['gas_units'], 0.99) / 1000.0,
+                'gas_max': max(operation['gas_units']) / 1000.0,
+                'opcodes_p50': percentile(operation['opcodes'], 0.5),
+                'opcodes_p99': percentile(operation['opcodes'], 0.99),
+                'written_p99': percentile(operation['written'], 0.99),
+            }
+        result[name] = {
+            'scenarios': entry['scenarios'],
+            'invocations': entry['invocations'],
+            'blocks': entry['blocks'],
+            'invocations_per_second': entry['invocations'] / entry['elapsed'] if entry['elapsed'] else 0.0,
+            'operations': operations,
+            'failures': dict(entry['failures'].most_common()),
+            'storage_keys_p50': percentile(entry['storage_keys'], 0.5),
+            'storage_bytes_p50': percentile(entry['storage_bytes'], 0.5),
+            'storage_bytes_max': max(entry['storage_bytes']),
+        }
+    total = sum(len(s['invocations']) for s in scenarios)
+    return {'wall_time': wall_time, 'invocations': total,
+            'invocations_per_second': total / wall_time if wall_time else 0.0,
+            'workloads': result}
+
+
+def format_report(summary):
+    lines = ['%d invocations in %.1f s, %.0f per second across the pool' % (
+        summary['invocations'], summary['wall_time'], summary['invocations_per_second'])]
+    for name, report in summary['workloads'].items():
+        lines.append('')
+        lines.append('%s: %d scenarios, %d invocations in %d blocks, %.0f per second per worker' % (
+            name, report['scenarios'], report['invocations'], report['blocks'],
+            report['invocations_per_second']))
+        lines.append('staked storage per scenario: %d keys, %d bytes (p50), %d bytes (max)' % (
+            report['storage_keys_p50'], report['storage_bytes_p50'], report['storage_bytes_max']))
+        lines.append('%-40s %7s %7s %9s %9s %9s %8s %8s' % (
+            'operation', 'count', 'failed', 'GAS p50', 'GAS p99', 'GAS max', 'ops p50', 'ops p99'))
+        for label, op in report['operations'].items():
+            lines.append('%-40s %7d %6.1f%% %9.3f %9.3f %9.3f %8d %8d' % (
+                label, op['count'], 100.0 * op['failed'] / op['count'], op['gas_p50'],
+                op['gas_p99'], op['gas_max'], op['opcodes_p50'], op['opcodes_p99']))
+        if report['failures']:
+            lines.append('failures:')
+            for reason, count in report['failures'].items():
+                lines.append('  %6d  %s' % (count, reason))
+    return '\n'.join(lines)
+
+
+def run(workloads, scenarios, parties, steps, block_txs, workers=None, seed=1, mct='native', slippage=None):
+    """Run ``scenarios`` scenarios of each workload on a process pool."""
+    for name in workloads:
+        load_script(WORKLOADS[name].source)  # build once, before the workers start
+    tasks = [(name, seed + i, parties, steps, block_txs, mct, slippage)
+             for name in workloads for i in range(scenarios)]
+    started = time.time()
+    if workers == 1:
+        results = [run_scenario(task) for task in tasks]
+    else:
+        pool = multiprocessing.Pool(workers)
+        try:
+            results = pool.map(run_scenario, tasks, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    return summarize(results, time.time() - started)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--workload', action='append', choices=list(WORKLOADS),
+                        help='only run the named workload')
+    parser.add_argument('--scenarios', type=int, default=8, help='scenarios per workload')
+    parser.add_argument('--parties', type=int, default=100, help='parties per scenario')
+    parser.add_argument('--steps', type=int, default=500, help='invocations per scenario')
+    parser.add_argument('--block-txs', type=int, default=50, help='invocations per block')
+    parser.add_argument('--workers', type=int, help='worker processes (default: one per CPU)')
+    parser.add_argument('--seed', type=int, default=1, help='seed of the first scenario')
+    parser.add_argument('--mct', choices=('native', 'avm'), default='native',
+                        help='run against the Python stand-in or mct-privnet.avm')
+    parser.add_argument('--slippage', type=int, metavar='BPS',
+                        help='max_slippage passed with quoted swaps (default: exact rates)')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args(argv)
+
+    summary = run(args.workload or list(WORKLOADS), args.scenarios, args.parties, args.steps,
+                  args.block_txs, args.workers, args.seed, args.mct, args.slippage)
+    print(json.dumps(summary, indent=2) if args.json else format_report(summary))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,535 @@
+"""
+Python stand-in for the MCT contract
+====================================
+
+Implements the parts of MCT the example contracts rely on, with the same
+storage layout as mct-privnet.avm so state produced by either one can be
+inspected the same way:
+
+    <address>                       NEP-5 balance
+    in_circulation                  total supply
+    minStorageStake                 current minimum stake
+    <contract hash>/st/<key>        staked storage of a contract
+    wl/<contract hash>              contract may receive onTokenTransfer
+
+transfer() calls onTokenTransfer on a whitelisted receiving contract
+(passing the full transfer argument list) and only moves the tokens if it
+returns True. A contract that is not whitelisted yet is credited like a
+plain address, which is how the initial stake is sent, but transfers that
+carry extra arguments for it are rejected.
+
+Instead of True, onTokenTransfer may return the staked storage writes of
+the payment it accepts, which saves calling back into MCT for them:
+
+    [True, [key, ...], [value, ...]]
+
+They are applied to the receiver's staked storage, up to 64 keys, once the
+transfer is accepted and before the tokens move; an empty value deletes
+its key. The receiver needs the minimum stake, as for PutMany, and the
+transfer fails if it is short or the lists are malformed. Returning False,
+or a list whose first item is false, rejects the transfer and nothing is
+written.
+
+transferMulti(from, payload) pays many recipients from one sender in a
+single call. The payload packs one 28-byte entry per recipient, the
+20-byte address followed by the amount as an 8-byte little-endian integer
+(see mct_tools/multisend.py). The sender's witness and balance are checked
+once, for the total, and its balance written once. onTokenTransfer is not
+called, so the whole call fails if a recipient is a whitelisted contract,
+which must see every payment it gets; pay those with transfer. Other
+recipients are credited without the GetContract probe, a contract that is
+not whitelisted like a plain address. Each recipient still gets a
+transfer event.
+
+Staked storage operations require the calling contract to hold at least
+the minimum stake and cannot be invoked directly by a transaction. The
+batched variants check the stake once for the whole list of keys:
+
+    GetMany([key, ...])                   -> [value, ...]
+    PutMany([key, ...], [value, ...])     -> True
+    DeleteMany([key, ...])                -> True
+
+Find pages through the caller's keys that start with a prefix, in key
+order, up to 64 at a time. The keys come back without the caller's
+prefix, and the cursor is the last key of the page, or empty after the
+last page; pass it back to read the next one (empty for the first):
+
+    Find(prefix, cursor, limit)           -> [[key, ...], [value, ...], cursor]
+
+Storage.Find cannot seek, so each page steps over the keys of the earlier
+ones, which is cheap but not free.
+
+The conditional operations check the stored value and write in one call,
+and return False without writing when the check fails (an empty expected
+value matches a key that is not set, an empty new value deletes the key):
+
+    PutIfAbsent(key, value)               -> True if key was not set
+    CompareAndSwap(key, expected, value)  -> True if key held expected
+    DeleteIfEquals(key, expected)         -> True if key held expected
+
+mct-privnet.avm predates transferMulti, the deferred writes, Find and
+the batched and conditional operations, so --mct avm runs cannot use them; it
+takes a list returned by onTokenTransfer as True and drops the writes.
+
+GAS is charged for the storage, witness and contract lookups the stand-in
+performs, plus a fixed opcode estimate per operation taken from running
+mct-privnet.avm in the emulator, so costs stay comparable to a privnet.
+"""
+from .types import Array, to_bytes, to_int, to_bool
+from .interop import SYSCALL_PRICES, storage_put_price
+from .chain import script_hash_from_string
+
+PRIVNET_HASH = script_hash_from_string('c186bcb4dc6db8e08be09191c6173456144c4b8d')
+MAINNET_HASH = script_hash_from_string('a87cc2a513f5d8b4a42432343687c2127c60bc3f')
+TESTNET_CTX_HASH = script_hash_from_string('9aff1e08aea2048a26a3d2ddbb3df495b932b1e7')
+TESTNET_CTY_HASH = script_hash_from_string('81d9cbc994dd104d3e03514b47eb23c6c406b2e7')
+
+# privnet owner wallet AK2nJJpJr6o664CWJKi1QRXjqeic2zRp8y
+PRIVNET_OWNER = bytes.fromhex('23ba2703c53263e8d6e522dc32203339dcd8eee9')
+
+DECIMALS = 8
+TOTAL_SUPPLY = 580000000 * 10 ** DECIMALS
+OWNER_ALLOCATION = 12558000 * 10 ** DECIMALS
+MIN_STORAGE_STAKE = 10000 * 10 ** DECIMALS
+
+STAKED_PREFIX = b'/st/'
+
+# Work mct-privnet.avm does beyond the syscalls charged below, as
+# (opcodes, GAS units), measured by running both in the emulator.
+OVERHEAD = {
+    'balanceOf': (254, 345),
+    'transfer': (419, 347),
+    'Get': (365, 416),
+    'Put': (364, 416),
+    'Delete': (365, 416),
+    'GetMany': (365, 416),
+    'PutMany': (364, 416),
+    'DeleteMany': (365, 416),
+    'transferMulti': (419, 347),  # estimate, as transfer
+    'Find': (365, 416),  # estimate, as GetMany
+    # estimates: the single-key operation plus reading and comparing the value
+    'PutIfAbsent': (372, 420),
+    'CompareAndSwap': (374, 420),
+    'DeleteIfEquals': (373, 420),
+}
+# per key of a batched operation (loop, prefixing and result packing); an
+# estimate, as the deployed contract has no batched operations to measure
+BATCH_KEY_OVERHEAD = (24, 24)
+MAX_BATCH_KEYS = 64
+# per key Find steps over to reach its cursor, as Storage.Find cannot seek
+FIND_SKIP_OVERHEAD = (12, 12)
+DEFAULT_OVERHEAD = (250, 340)
+CONTRACT_SENDER_OVERHEAD = (84, 251)
+# the deployed contract parks the pending transfer in storage across the callback
+RECEIVER_CALLBACK_OVERHEAD = (195, 1422)
+# per recipient of transferMulti (unpacking the entry, crediting and the
+# transfer event); an estimate, as the deployed contract has no transferMulti
+MULTI_ENTRY_OVERHEAD = (48, 48)
+# transferMulti entries: recipient (20 bytes), amount (8 bytes, little-endian)
+MULTI_ENTRY_SIZE = 28
+
+
+class MCTToken(object):
+    """
+    Register with Chain.register_native(). One instance can be registered
+    under several script hashes (e.g. CTX and CTY) by creating one token per
+    hash; each keeps its balances in its own storage.
+    """
+
+    def __init__(self, script_hash=PRIVNET_HASH, owner=PRIVNET_OWNER, symbol='MCT',
+                 name='Master Contract Token'):
+        self.script_hash = script_hash
+        self.owner = owner
+        self.symbol = symbol
+        self.name = name
+
+    # storage helpers, priced like the equivalent syscalls
+
+    def _get(self, engine, key):
+        engine.charge(SYSCALL_PRICES['Neo.Storage.Get'])
+        return engine.storage.get(self.script_hash, key)
+
+    def _put(self, engine, key, value):
+        value = to_bytes(value)
+        if value == b'':
+            self._delete(engine, key)  # a zero balance is removed, not stored
+        else:
+            engine.charge(storage_put_price(key, value))
+            engine.storage_put(self.script_hash, key, value)
+
+    def _delete(self, engine, key):
+        engine.charge(SYSCALL_PRICES['Neo.Storage.Delete'])
+        engine.storage_delete(self.script_hash, key)
+
+    def _check_witness(self, engine, address):
+        engine.charge(SYSCALL_PRICES['Neo.Runtime.CheckWitness'])
+        return engine.check_witness(address)
+
+    def _is_contract(self, engine, address):
+        engine.charge(SYSCALL_PRICES['Neo.Blockchain.GetContract'])
+        contract = engine.chain.contracts.get(address)
+        return contract is not None and contract.native is None
+
+    def _overhead(self, engine, cost):
+        engine.opcodes += cost[0]
+        engine.charge(cost[1])
+
+    def balance(self, engine, address):
+        return to_int(self._get(engine, address))
+
+    def min_stake(self, engine):
+        stake = self._get(engine, b'minStorageStake')
+        return to_int(stake) if stake else MIN_STORAGE_STAKE
+
+    def invoke(self, engine, operation, args):
+        self._overhead(engine, OVERHEAD.get(operation, DEFAULT_OVERHEAD))
+
+        handler = getattr(self, 'op_' + operation, None)
+        if handler is None:
+            engine.log('unknown operation')
+            return False
+        if not isinstance(args, list):
+            args = Array()
+        return handler(engine, args)
+
+    # NEP-5
+
+    def op_name(self, engine, args):
+        return self.name.encode('utf-8')
+
+    def op_symbol(self, engine, args):
+        return self.symbol.encode('utf-8')
+
+    def op_decimals(self, engine, args):
+        return DECIMALS
+
+    def op_totalSupply(self, engine, args):
+        return to_int(self._get(engine, b'in_circulation'))
+
+    def op_balanceOf(self, engine, args):
+        if len(args) != 1:
+            return False
+        return self.balance(engine, to_bytes(args[0]))
+
+    def op_deploy(self, engine, args):
+        if not self._check_witness(engine, self.owner):
+            return False
+        if self._get(engine, b'initialized'):
+            return False
+        self._put(engine, b'initialized', 1)
+        self._put(engine, b'minStorageStake', MIN_STORAGE_STAKE)
+        self._put(engine, self.owner, OWNER_ALLOCATION)
+        self._put(engine, b'in_circulation', OWNER_ALLOCATION)
+        engine.notify(Array([b'transfer', b'', self.owner, OWNER_ALLOCATION]))
+        return True
+
+    def op_transfer(self, engine, args):
+        if len(args) < 3:
+            engine.log('incorrect number of arguments')
+            return False
+
+        t_from = to_bytes(args[0])
+        t_to = to_bytes(args[1])
+        amount = to_int(args[2])
+
+        if len(t_from) != 20 or len(t_to) != 20 or amount <= 0:
+            return False
+
+        if not self._authorized_sender(engine, t_from):
+            engine.log('from address is not the tx sender')
+            return False
+
+        if self.balance(engine, t_from) < amount:
+            engine.log('insufficient funds')
+            return False
+
+        if t_from == t_to:
+            return True
+
+        if self._is_contract(engine, t_to):
+            if not self._get(engine, b'wl/' + t_to):
+                if len(args) > 3:
+                    engine.log('recipient contract is not whitelisted')
+                    return False
+                self._move(engine, t_from, t_to, amount)
+                return True
+
+            self._overhead(engine, RECEIVER_CALLBACK_OVERHEAD)
+            accepted = engine.call_contract(t_to, b'onTokenTransfer', Array(args))
+            writes = None
+            if isinstance(accepted, list):
+                writes = accepted
+                accepted = writes[0] if len(writes) else False
+            if not to_bool(accepted):
+                engine.log('transfer rejected by recipient contract')
+                return False
+            # the receiver may have moved tokens itself while handling the call
+            if self.balance(engine, t_from) < amount:
+                engine.log('insufficient funds')
+                return False
+            if writes is not None and not self._deferred_writes(engine, t_to, writes):
+                return False
+
+        self._move(engine, t_from, t_to, amount)
+        return True
+
+    def op_transferMulti(self, engine, args):
+        if len(args) != 2:
+            engine.log('incorrect number of arguments')
+            return False
+
+        t_from = to_bytes(args[0])
+        payload = to_bytes(args[1])
+        if len(t_from) != 20 or not payload or len(payload) % MULTI_ENTRY_SIZE:
+            engine.log('payload must hold 28-byte (address, amount) entries')
+            return False
+
+        entries = []
+        total = 0
+        for offset in range(0, len(payload), MULTI_ENTRY_SIZE):
+            self._overhead(engine, MULTI_ENTRY_OVERHEAD)
+            amount = to_int(payload[offset + 20:offset + MULTI_ENTRY_SIZE])
+            if amount <= 0:
+                engine.log('transfer amounts must be positive')
+                return False
+            entries.append((payload[offset:offset + 20], amount))
+            total += amount
+
+        if not self._authorized_sender(engine, t_from):
+            engine.log('from address is not the tx sender')
+            return False
+
+        for t_to, _ in entries:
+            if self._get(engine, b'wl/' + t_to):
+                engine.log('whitelisted contracts must be paid with transfer')
+                return False
+
+        balance = self.balance(engine, t_from)
+        if balance < total:
+            engine.log('insufficient funds')
+            return False
+
+        self._put(engine, t_from, balance - total)
+        for t_to, amount in entries:
+            self._put(engine, t_to, self.balance(engine, t_to) + amount)
+            engine.notify(Array([b'transfer', t_from, t_to, amount]))
+        return True
+
+    def _authorized_sender(self, engine, t_from):
+        if self._check_witness(engine, t_from):
+            return True
+        # contracts spend their own tokens by calling transfer directly
+        self._overhead(engine, CONTRACT_SENDER_OVERHEAD)
+        return engine.calling_script_hash == t_from and t_from != engine.entry_script_hash
+
+    def _deferred_writes(self, engine, receiver, writes):
+        """
+        Apply the staked storage writes a receiver returned from
+        onTokenTransfer as [True, [key, ...], [value, ...]]. Returns False,
+        writing nothing, if the lists are malformed or the receiver is not
+        staked.
+        """
+        if len(writes) == 1:
+            return True
+        keys = writes[1] if len(writes) == 3 else None
+        values = writes[2] if len(writes) == 3 else None
+        if not isinstance(keys, list) or not isinstance(values, list) or len(keys) != len(values):
+            engine.log('onTokenTransfer must return True or [True, [key, ...], [value, ...]]')
+            return False
+        if len(keys) > MAX_BATCH_KEYS:
+            engine.log('key list must hold 1 to %d keys' % MAX_BATCH_KEYS)
+            return False
+        if not keys:
+            return True
+
+        if self.balance(engine, receiver) < self.min_stake(engine):
+            engine.log('insufficient tokens staked by receiving contract')
+            return False
+        prefix = receiver + STAKED_PREFIX
+        for key, value in zip(keys, values):
+            self._overhead(engine, BATCH_KEY_OVERHEAD)
+            self._put(engine, prefix + to_bytes(key), value)
+        return True
+
+    def _move(self, engine, t_from, t_to, amount):
+        self._put(engine, t_from, self.balance(engine, t_from) - amount)
+        self._put(engine, t_to, self.balance(engine, t_to) + amount)
+        engine.notify(Array([b'transfer', t_from, t_to, amount]))
+
+    # staked storage
+
+    def _staked_prefix(self, engine, args, count):
+        """Return the staked storage prefix of the calling contract, or None."""
+        if len(args) != count:
+            engine.log('incorrect number of arguments')
+            return None
+
+        caller = engine.calling_script_hash
+        if caller == engine.entry_script_hash:
+            engine.log('staked storage operations cannot be invoked directly')
+            return None
+
+        if self.balance(engine, caller) < self.min_stake(engine):
+            engine.log('insufficient tokens staked by calling contract')
+            return None
+
+        return caller + STAKED_PREFIX
+
+    def _staked_key(self, engine, args, count):
+        """Return the prefixed key for the calling contract, or None."""
+        prefix = self._staked_prefix(engine, args, count)
+        if prefix is None:
+            return None
+        return prefix + to_bytes(args[0])
+
+    def _staked_keys(self, engine, args, count):
+        """Return the prefixed keys of a batched operation, or None."""
+        prefix = self._staked_prefix(engine, args, count)
+        if prefix is None:
+            return None
+
+        keys = args[0]
+        if not isinstance(keys, list) or not 0 < len(keys) <= MAX_BATCH_KEYS:
+            engine.log('key list must hold 1 to %d keys' % MAX_BATCH_KEYS)
+            return None
+
+        for _ in keys:
+            self._overhead(engine, BATCH_KEY_OVERHEAD)
+        return [prefix + to_bytes(key) for key in keys]
+
+    def op_Get(self, engine, args):
+        key = self._staked_key(engine, args, 1)
+        if key is None:
+            return False
+        return self._get(engine, key)
+
+    def op_Put(self, engine, args):
+        key = self._staked_key(engine, args, 2)
+        if key is None:
+            return False
+        self._put(engine, key, args[1])
+        return True
+
+    def op_Delete(self, engine, args):
+        key = self._staked_key(engine, args, 1)
+        if key is None:
+            return False
+        self._delete(engine, key)
+        return True
+
+    def op_GetMany(self, engine, args):
+        keys = self._staked_keys(engine, args, 1)
+        if keys is None:
+            return False
+        return Array([self._get(engine, key) for key in keys])
+
+    def op_PutMany(self, engine, args):
+        keys = self._staked_keys(engine, args, 2)
+        if keys is None:
+            return False
+        values = args[1]
+        if not isinstance(values, list) or len(values) != len(keys):
+            engine.log('key and value lists differ in length')
+            return False
+        for key, value in zip(keys, values):
+            self._put(engine, key, value)
+        return True
+
+    def op_DeleteMany(self, engine, args):
+        keys = self._staked_keys(engine, args, 1)
+        if keys is None:
+            return False
+        for key in keys:
+            self._delete(engine, key)
+        return True
+
+    def op_Find(self, engine, args):
+        prefix = self._staked_prefix(engine, args, 3)
+        if prefix is None:
+            return False
+
+        key_prefix = to_bytes(args[0])
+        cursor = to_bytes(args[1])
+        limit = to_int(args[2])
+        if not 0 < limit <= MAX_BATCH_KEYS:
+            engine.log('limit must be 1 to %d' % MAX_BATCH_KEYS)
+            return False
+        if cursor and not cursor.startswith(key_prefix):
+            engine.log('cursor does not start with the prefix')
+            return False
+
+        engine.charge(SYSCALL_PRICES['Neo.Storage.Find'])
+        keys = Array()
+        values = Array()
+        after = prefix + cursor
+        for key, value in engine.storage.find(self.script_hash, prefix + key_prefix):
+            if cursor and key <= after:
+                self._overhead(engine, FIND_SKIP_OVERHEAD)
+                continue
+            if len(keys) == limit:
+                return Array([keys, values, keys[-1]])
+            self._overhead(engine, BATCH_KEY_OVERHEAD)
+            keys.append(key[len(prefix):])
+            values.append(value)
+        return Array([keys, values, b''])
+
+    def op_PutIfAbsent(self, engine, args):
+        key = self._staked_key(engine, args, 2)
+        if key is None:
+            return False
+        if self._get(engine, key):
+            return False
+        self._put(engine, key, args[1])
+        return True
+
+    def op_CompareAndSwap(self, engine, args):
+        key = self._staked_key(engine, args, 3)
+        if key is None:
+            return False
+        if self._get(engine, key) != to_bytes(args[1]):
+            return False
+        self._put(engine, key, args[2])
+        return True
+
+    def op_DeleteIfEquals(self, engine, args):
+        key = self._staked_key(engine, args, 2)
+        if key is None:
+            return False
+        if self._get(engine, key) != to_bytes(args[1]):
+            return False
+        self._delete(engine, key)
+        return True
+
+    # owner
+
+    def op_setMinStorageStake(self, engine, args):
+        if len(args) != 1 or not self._check_witness(engine, self.owner):
+            return False
+        stake = to_int(args[0])
+        if stake <= 0 or stake > self.min_stake(engine):
+            return False  # the minimum stake can only ever be lowered
+        self._put(engine, b'minStorageStake', stake)
+        return True
+
+    def op_whitelistContract(self, engine, args):
+        if len(args) != 2 or not self._check_witness(engine, self.owner):
+            return False
+        key = b'wl/' + to_bytes(args[0])
+        if to_bool(args[1]):
+            self._put(engine, key, 1)
+        else:
+            self._delete(engine, key)
+        return True
+
+    # setup helpers for emulated chains (not contract operations)
+
+    def mint(self, chain, address, amount):
+        """Credit ``amount`` to ``address`` directly in committed storage."""
+        storage = chain.storage.contracts.setdefault(self.script_hash, {})
+        storage[address] = to_bytes(to_int(storage.get(address, b'')) + amount)
+        supply = to_int(storage.get(b'in_circulation', b'')) + amount
+        storage[b'in_circulation'] = to_bytes(supply)
+        storage.setdefault(b'minStorageStake', to_bytes(MIN_STORAGE_STAKE))
+
+    def balance_of(self, chain, address):
+        return to_int(chain.storage.get(self.script_hash, address))
@@ -0,0 +1,181 @@
+"""
+Multi-recipient MCT transfers
+=============================
+
+Splits a CSV of recipients into transferMulti invocations (see
+mct_tools/mct.py), each paying as many recipients as fit in one
+transaction. Payroll, refund and airdrop jobs then need one transaction,
+one witness check and one write of the sender's balance per few thousand
+recipients instead of a transfer each.
+
+    python -m mct_tools.multisend recipients.csv --from AK2nJJpJr6o664CWJKi1QRXjqeic2zRp8y
+    python -m mct_tools.multisend recipients.csv --from ... --json > batches.json
+
+The CSV has one recipient per line, an address (or a script hash in hex)
+and the amount in MCT with up to 8 decimals:
+
+    address,amount
+    AK2nJJpJr6o664CWJKi1QRXjqeic2zRp8y,3000
+    AUSTxBjGY1rL1WTf6qqjQTHo84LyQ5wWS4,12.5
+
+A header line, empty lines and lines starting with '#' are skipped.
+
+The payload of a transferMulti call packs 28 bytes per recipient, so its
+size is what bounds a batch: a Neo 2.x transaction may be at most
+MAX_TRANSACTION_SIZE bytes, of which TRANSACTION_OVERHEAD are kept for
+the version, attributes, fee inputs and outputs and the sender's witness.
+The payload is a single VM item and stays far below the VM's 1 MB item
+limit. A batch holds up to 3,636 recipients this way, so an airdrop to
+404,453 addresses takes 112 transactions.
+
+transferMulti does not call onTokenTransfer and fails if a recipient is a
+contract whitelisted for it, so pay those with a regular transfer.
+"""
+import argparse
+import csv
+import decimal
+import hashlib
+import json
+import struct
+import sys
+
+from .chain import ScriptBuilder, script_hash_from_string
+from .mct import PRIVNET_HASH, DECIMALS, MULTI_ENTRY_SIZE
+from .vm import MAX_ITEM_SIZE
+
+MAX_TRANSACTION_SIZE = 102400
+TRANSACTION_OVERHEAD = 512
+
+ADDRESS_VERSION = 0x17
+BASE58 = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+
+MAX_AMOUNT = 2 ** 63 - 1
+
+
+def decode_address(text):
+    """Return the script hash, in VM byte order, of an address or a hex script hash."""
+    text = text.strip()
+    if len(text) in (40, 42):
+        return script_hash_from_string(text)
+
+    value = 0
+    for char in text:
+        if char not in BASE58:
+            raise ValueError('invalid address %r' % text)
+        value = value * 58 + BASE58.index(char)
+    data = value.to_bytes(25, 'big') if value < 256 ** 25 else b''
+    if len(data) != 25 or data[0] != ADDRESS_VERSION or \
+            hashlib.sha256(hashlib.sha256(data[:21]).digest()).digest()[:4] != data[21:]:
+        raise ValueError('invalid address %r' % text)
+    return data[1:21]
+
+
+def parse_amount(text):
+    """Return an amount in MCT as an integer number of the smallest unit."""
+    try:
+        amount = decimal.Decimal(text.strip()).scaleb(DECIMALS)
+    except decimal.InvalidOperation:
+        raise ValueError('invalid amount %r' % text)
+    if amount != amount.to_integral_value() or not 0 < amount <= MAX_AMOUNT:
+        raise ValueError('invalid amount %r' % text)
+    return int(amount)
+
+
+def read_recipients(lines):
+    """Return the (script hash, amount) pairs of the CSV ``lines``."""
+    recipients = []
+    for number, row in enumerate(csv.reader(lines), 1):
+        if not row or not row[0].strip() or row[0].lstrip().startswith('#'):
+            continue
+        if len(row) != 2:
+            raise ValueError('line %d: expected address,amount' % number)
+        if number == 1 and not _numeric(row[1]):
+            continue  # header
+        try:
+            recipients.append((decode_address(row[0]), parse_amount(row[1])))
+        except ValueError:
+            raise ValueError('line %d: %s' % (number, sys.exc_info()[1]))
+    return recipients
+
+
+def _numeric(text):
+    try:
+        decimal.Decimal(text.strip())
+    except decimal.InvalidOperation:
+        return False
+    return True
+
+
+def pack(recipients):
+    """Return the transferMulti payload for (script hash, amount) pairs."""
+    return b''.join(address + struct.pack('<q', amount) for address, amount in recipients)
+
+
+def invocation_script(mct_hash, sender, recipients):
+    return ScriptBuilder().emit_app_call(mct_hash, 'transferMulti', [sender, pack(recipients)]).to_bytes()
+
+
+def transaction_size(script):
+    """Size of an invocation transaction with ``script``, overhead included."""
+    length = len(script)
+    prefix = 1 if length < 0xFD else 3 if length <= 0xFFFF else 5
+    return TRANSACTION_OVERHEAD + prefix + length
+
+
+def max_recipients(mct_hash, sender, max_size=MAX_TRANSACTION_SIZE):
+    """Return how many recipients fit in one transferMulti transaction."""
+    count = min(max_size, MAX_ITEM_SIZE) // MULTI_ENTRY_SIZE
+    entry = (b'\x00' * 20, MAX_AMOUNT)
+    while count > 0 and transaction_size(invocation_script(mct_hash, sender, [entry] * count)) > max_size:
+        count -= 1
+    if count == 0:
+        raise ValueError('no recipient fits in %d bytes' % max_size)
+    return count
+
+
+def batches(recipients, mct_hash, sender, max_size=MAX_TRANSACTION_SIZE, max_count=None):
+    """Split ``recipients`` into lists that each fit one transaction."""
+    count = max_recipients(mct_hash, sender, max_size)
+    if max_count:
+        count = min(count, max_count)
+    return [recipients[i:i + count] for i in range(0, len(recipients), count)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('csv', help='recipients, one address,amount per line')
+    parser.add_argument('--from', dest='sender', required=True, help='address paying the transfers')
+    parser.add_argument('--mct', default=PRIVNET_HASH[::-1].hex(), help='MCT script hash (default: privnet)')
+    parser.add_argument('--max-size', type=int, default=MAX_TRANSACTION_SIZE,
+                        help='maximum transaction size in bytes')
+    parser.add_argument('--max-recipients', type=int, help='maximum recipients per transaction')
+    parser.add_argument('--json', action='store_true', help='print the invocation scripts as JSON')
+    args = parser.parse_args(argv)
+
+    sender = decode_address(args.sender)
+    mct_hash = script_hash_from_string(args.mct)
+    with open(args.csv) as f:
+        recipients = read_recipients(f)
+
+    output = []
+    for batch in batches(recipients, mct_hash, sender, args.max_size, args.max_recipients):
+        script = invocation_script(mct_hash, sender, batch)
+        output.append({
+            'recipients': len(batch),
+            'amount': sum(amount for _, amount in batch),
+            'size': transaction_size(script),
+            'script': script.hex(),
+        })
+
+    if args.json:
+        print(json.dumps(output, indent=2))
+    else:
+        print('%5s %10s %20s %7s' % ('tx', 'recipients', 'MCT', 'bytes'))
+        for number, tx in enumerate(output, 1):
+            print('%5d %10d %20s %7d' % (number, tx['recipients'],
+                                        decimal.Decimal(tx['amount']).scaleb(-DECIMALS), tx['size']))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,216 @@
+"""
+NEO 2.x AVM opcode table
+========================
+
+Opcode values, names and operand decoding shared by the emulator and the
+script analysis tools.
+"""
+import struct
+
+PUSH0 = 0x00
+PUSHBYTES1 = 0x01
+PUSHBYTES75 = 0x4B
+PUSHDATA1 = 0x4C
+PUSHDATA2 = 0x4D
+PUSHDATA4 = 0x4E
+PUSHM1 = 0x4F
+PUSH1 = 0x51
+PUSH16 = 0x60
+
+NOP = 0x61
+JMP = 0x62
+JMPIF = 0x63
+JMPIFNOT = 0x64
+CALL = 0x65
+RET = 0x66
+APPCALL = 0x67
+SYSCALL = 0x68
+TAILCALL = 0x69
+
+DUPFROMALTSTACK = 0x6A
+TOALTSTACK = 0x6B
+FROMALTSTACK = 0x6C
+XDROP = 0x6D
+XSWAP = 0x72
+XTUCK = 0x73
+DEPTH = 0x74
+DROP = 0x75
+DUP = 0x76
+NIP = 0x77
+OVER = 0x78
+PICK = 0x79
+ROLL = 0x7A
+ROT = 0x7B
+SWAP = 0x7C
+TUCK = 0x7D
+
+CAT = 0x7E
+SUBSTR = 0x7F
+LEFT = 0x80
+RIGHT = 0x81
+SIZE = 0x82
+
+INVERT = 0x83
+AND = 0x84
+OR = 0x85
+XOR = 0x86
+EQUAL = 0x87
+
+INC = 0x8B
+DEC = 0x8C
+SIGN = 0x8D
+NEGATE = 0x8F
+ABS = 0x90
+NOT = 0x91
+NZ = 0x92
+ADD = 0x93
+SUB = 0x94
+MUL = 0x95
+DIV = 0x96
+MOD = 0x97
+SHL = 0x98
+SHR = 0x99
+BOOLAND = 0x9A
+BOOLOR = 0x9B
+NUMEQUAL = 0x9C
+NUMNOTEQUAL = 0x9E
+LT = 0x9F
+GT = 0xA0
+LTE = 0xA1
+GTE = 0xA2
+MIN = 0xA3
+MAX = 0xA4
+WITHIN = 0xA5
+
+SHA1 = 0xA7
+SHA256 = 0xA8
+HASH160 = 0xA9
+HASH256 = 0xAA
+CHECKSIG = 0xAC
+VERIFY = 0xAD
+CHECKMULTISIG = 0xAE
+
+ARRAYSIZE = 0xC0
+PACK = 0xC1
+UNPACK = 0xC2
+PICKITEM = 0xC3
+SETITEM = 0xC4
+NEWARRAY = 0xC5
+NEWSTRUCT = 0xC6
+NEWMAP = 0xC7
+APPEND = 0xC8
+REVERSE = 0xC9
+REMOVE = 0xCA
+HASKEY = 0xCB
+KEYS = 0xCC
+VALUES = 0xCD
+
+# NEP-8 calls, emitted by neo-boa 0.5 and later
+CALL_I = 0xE0
+CALL_E = 0xE1
+CALL_ED = 0xE2
+CALL_ET = 0xE3
+CALL_EDT = 0xE4
+
+THROW = 0xF0
+THROWIFNOT = 0xF1
+
+NAMES = {}
+for _name, _value in list(globals().items()):
+    if _name.isupper() and isinstance(_value, int):
+        NAMES[_value] = _name
+for _value in range(PUSHBYTES1 + 1, PUSHBYTES75):
+    NAMES[_value] = 'PUSHBYTES%d' % _value
+for _value in range(PUSH1 + 1, PUSH16):
+    NAMES[_value] = 'PUSH%d' % (_value - PUSH1 + 1)
+
+# opcodes followed by a fixed-size operand
+OPERAND_SIZES = {
+    JMP: 2, JMPIF: 2, JMPIFNOT: 2, CALL: 2,
+    APPCALL: 20, TAILCALL: 20,
+    CALL_I: 4, CALL_E: 22, CALL_ED: 2, CALL_ET: 22, CALL_EDT: 2,
+}
+
+JUMPS = (JMP, JMPIF, JMPIFNOT, CALL, CALL_I)
+APP_CALLS = (APPCALL, TAILCALL, CALL_E, CALL_ED, CALL_ET, CALL_EDT)
+
+
+class Instruction(object):
+    """
+    One decoded instruction: its offset, opcode and raw operand bytes
+    (push data, jump offset, script hash or syscall name).
+    """
+    __slots__ = ('offset', 'opcode', 'operand', 'size')
+
+    def __init__(self, offset, opcode, operand, size):
+        self.offset = offset
+        self.opcode = opcode
+        self.operand = operand
+        self.size = size
+
+    @property
+    def name(self):
+        return NAMES.get(self.opcode, 'UNKNOWN_%02X' % self.opcode)
+
+    @property
+    def target(self):
+        """Absolute destination of a jump or call."""
+        if self.opcode == CALL_I:
+            return self.offset + 2 + struct.unpack('<h', self.operand[2:4])[0]
+        return self.offset + struct.unpack('<h', self.operand)[0]
+
+    @property
+    def app_call_hash(self):
+        """Static callee of an app call, or None for a dynamic call."""
+        if self.opcode in (APPCALL, TAILCALL):
+            script_hash = self.operand
+        elif self.opcode in (CALL_E, CALL_ET):
+            script_hash = self.operand[2:]
+        else:
+            return None
+        return script_hash if any(script_hash) else None
+
+    @property
+    def syscall(self):
+        return self.operand.decode('utf-8', 'replace')
+
+    def __repr__(self):
+        return '<%04d %s %s>' % (self.offset, self.name, self.operand.hex())
+
+
+def decode(script, offset):
+    """Decode the instruction at ``offset`` of ``script``."""
+    op = script[offset]
+    pos = offset + 1
+
+    if PUSHBYTES1 <= op <= PUSHBYTES75:
+        length = op
+    elif op == PUSHDATA1:
+        length = script[pos]
+        pos += 1
+    elif op == PUSHDATA2:
+        length = struct.unpack_from('<H', script, pos)[0]
+        pos += 2
+    elif op == PUSHDATA4:
+        length = struct.unpack_from('<I', script, pos)[0]
+        pos += 4
+    elif op == SYSCALL:
+        length = script[pos]
+        pos += 1
+    else:
+        length = OPERAND_SIZES.get(op, 0)
+
+    if pos + length > len(script):
+        raise ValueError('truncated operand at offset %d' % offset)
+
+    operand = bytes(script[pos:pos + length])
+    return Instruction(offset, op, operand, pos + length - offset)
+
+
+def iter_instructions(script):
+    """Linear sweep over every instruction in ``script``."""
+    offset = 0
+    while offset < len(script):
+        ins = decode(script, offset)
+        yield ins
+        offset += ins.size
@@ -0,0 +1,116 @@
+"""
+Emulated privnet with MCT
+=========================
+
+Reproduces the neo-local/nos-local setup from docs/ in-process: MCT is
+available under the privnet, TestNet CTX and TestNet CTY script hashes
+(the example contracts are hard-coded to different ones), the owner
+allocation is deployed, and example contracts can be deployed, staked and
+whitelisted in one call.
+
+MCT is either the Python stand-in (default) or mct-privnet.avm itself:
+
+    net = Privnet()                   # stand-in
+    net = Privnet(mct='avm')          # the compiled privnet contract
+
+Example contracts are deployed from their debug builds, or from their
+release builds (see mct_tools/build.py) with profile='release'.
+"""
+import os
+
+from .chain import Chain
+from .mct import (MCTToken, PRIVNET_HASH, PRIVNET_OWNER, TESTNET_CTX_HASH,
+                  TESTNET_CTY_HASH, MIN_STORAGE_STAKE, STAKED_PREFIX)
+from .build import ROOT, load_script
+from .types import to_bool, to_int
+
+MCT_AVM = os.path.join(ROOT, 'mct-privnet.avm')
+
+TOKENS = (
+    (PRIVNET_HASH, 'MCT'),
+    (TESTNET_CTX_HASH, 'CTX'),
+    (TESTNET_CTY_HASH, 'CTY'),
+)
+
+# OWNER constant of mct-dapp-template.py, atomicswap.py and safe-remote-purchase.py
+ZERO_OWNER = b'\x00' * 20
+
+
+class SetupError(Exception):
+    pass
+
+
+class Privnet(object):
+
+    def __init__(self, mct='native', chain=None, tokens=None, profile='debug'):
+        """
+        ``tokens`` maps symbols to the script hashes of tokens already
+        deployed on ``chain``, as when it is restored from a snapshot;
+        otherwise MCT is deployed under every hash in TOKENS.
+        """
+        if mct not in ('native', 'avm'):
+            raise ValueError("mct must be 'native' or 'avm'")
+        self.mct = mct
+        self.profile = profile
+        self.chain = chain if chain is not None else Chain()
+        self.tokens = dict(tokens) if tokens is not None else {}
+        if tokens is None:
+            for script_hash, symbol in TOKENS:
+                self.add_token(script_hash, symbol)
+
+    def add_token(self, script_hash, symbol):
+        if self.mct == 'native':
+            token = MCTToken(script_hash, symbol=symbol)
+            self.chain.register_native(token, name=symbol)
+        else:
+            with open(MCT_AVM, 'rb') as f:
+                self.chain.deploy(f.read(), name=symbol, script_hash=script_hash)
+        self.tokens[symbol] = script_hash
+        self.expect(self.chain.invoke(script_hash, 'deploy', [], signers=[PRIVNET_OWNER]))
+        return script_hash
+
+    def expect(self, result, value=True):
+        """Raise SetupError unless ``result`` halted with a truthy (or given) value."""
+        if not result.halted or (value is True and not to_bool(result.result)):
+            raise SetupError('%s failed: %s %s %s' % (
+                result.operation, result.state, result.fault or '', [m for _, m in result.logs]))
+        return result
+
+    def transfer(self, symbol, t_from, t_to, amount, *extra, **kwargs):
+        """Send ``amount`` tokens as ``t_from`` (which signs the transaction)."""
+        args = [t_from, t_to, amount] + list(extra)
+        signers = kwargs.get('signers', [t_from])
+        return self.chain.invoke(self.tokens[symbol], 'transfer', args, signers=signers)
+
+    def fund(self, symbol, address, amount):
+        return self.expect(self.transfer(symbol, PRIVNET_OWNER, address, amount))
+
+    def balance(self, symbol, address):
+        result = self.chain.invoke(self.tokens[symbol], 'balanceOf', [address], commit=False)
+        return to_int(result.result)
+
+    def deploy(self, source, stake=('MCT',), name=None):
+        """
+        Deploy a compiled example contract, send it the minimum stake in each
+        token in ``stake`` and whitelist it so it receives onTokenTransfer.
+        """
+        script = load_script(source, self.profile)
+        if name is None:
+            name = os.path.splitext(os.path.basename(source))[0]
+        script_hash = self.chain.deploy(script, name=name)
+        for symbol in stake:
+            self.fund(symbol, script_hash, MIN_STORAGE_STAKE)
+        for symbol in self.tokens:
+            self.expect(self.chain.invoke(self.tokens[symbol], 'whitelistContract',
+                                          [script_hash, True], signers=[PRIVNET_OWNER]))
+        return script_hash
+
+    def staked_items(self, symbol, contract_hash):
+        prefix = contract_hash + STAKED_PREFIX
+        items = self.chain.storage.items(self.tokens[symbol])
+        return dict((k[len(prefix):], v) for k, v in items.items() if k.startswith(prefix))
+
+    def put_staked(self, symbol, contract_hash, key, value):
+        """Write a contract's staked storage directly, e.g. to seed old-format records."""
+        storage = self.chain.storage.contracts.setdefault(self.tokens[symbol], {})
+        storage[contract_hash + STAKED_PREFIX + key] = value
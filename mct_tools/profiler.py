@@ -0,0 +1,348 @@
+"""
+Opcode-level GAS profiler
+=========================
+
+Attributes the opcodes and fees of an invocation to the functions that
+spent them, using the debug maps neo-boa writes next to each build
+(build/<contract>.avmdbgnfo). Cross-contract calls are followed, so MCT
+transfer -> onTokenTransfer -> staked Put shows up as one nested profile.
+Syscall fees are split out as leaves of the function that made them.
+
+    python -m mct_tools.profiler --suite safe-remote-purchase --operation confirmReceived
+    python -m mct_tools.profiler --suite atomicswap --operation 'onTokenTransfer (swap CTX->CTY)' \\
+        --svg swap.svg --folded swap.folded
+    python -m mct_tools.profiler --suite mct-lock-contract --mct avm
+
+prints, per invocation of the bench suite (or the one named), a table of
+functions with their inclusive and self GAS, self opcodes and calls, and
+the most expensive source lines. --svg writes a flame graph, --folded the
+collapsed stacks for flamegraph.pl or speedscope.
+
+Scripts without a debug map, such as mct-privnet.avm, are profiled by
+call target: every CALL destination becomes a function named after its
+offset, and the entry point is called 'entry'. The Python stand-in for
+MCT shows up as one frame per operation.
+
+Profiles can also be taken from scripts:
+
+    profiler = Profiler(net.chain)
+    result = net.chain.invoke(contract, 'operation', args)
+    print(profiler.profile_of(result).table())
+"""
+import argparse
+import collections
+import json
+import os
+import sys
+import zipfile
+
+from . import opcodes as op
+from .build import BUILD_DIR
+from .interop import GAS_UNIT
+from .privnet import Privnet
+
+
+class DebugMap(object):
+    """Function ranges and source lines of a neo-boa .avmdbgnfo file."""
+
+    def __init__(self, methods, lines):
+        self.methods = methods  # [(start, end, name)]
+        self.lines = lines  # sorted [(offset, 'file:line')]
+
+    @classmethod
+    def load(cls, path):
+        name = os.path.splitext(os.path.basename(path))[0]
+        with zipfile.ZipFile(path) as archive:
+            info = json.loads(archive.read(name + '.debug.json').decode('utf-8'))
+        documents = [os.path.basename(d) for d in info.get('documents', [])]
+        methods = []
+        lines = []
+        for method in info['methods']:
+            start, end = method['range'].split('-')
+            methods.append((int(start), int(end), method['name'].lstrip(',')))
+            for point in method.get('sequence-points', []):
+                offset, rest = point.split('[', 1)
+                document, rest = rest.split(']', 1)
+                document = int(document)
+                source = documents[document] if document < len(documents) else name
+                lines.append((int(offset), '%s:%s' % (source, rest.split(':', 1)[0])))
+        lines.sort()
+        return cls(methods, lines)
+
+    def function_at(self, ip):
+        for start, end, name in self.methods:
+            if start <= ip <= end:
+                return name
+        return None
+
+    def line_at(self, ip):
+        found = None
+        for offset, line in self.lines:
+            if offset > ip:
+                break
+            found = line
+        return found
+
+
+class Profile(object):
+    """
+    The profile of one invocation. Costs are kept per call path, a tuple
+    of 'contract:function' frames from the transaction script inwards.
+    Every CALL and app call pushes a new context on the invocation stack,
+    so each context is one frame.
+    """
+
+    def __init__(self, chain, debug_maps):
+        self.chain = chain
+        self.debug_maps = debug_maps
+        self.contexts = []  # invocation stack entries the frames belong to
+        self.frames = []
+        self.gas = collections.Counter()
+        self.opcodes = collections.Counter()
+        self.calls = collections.Counter()
+        self.line_gas = collections.Counter()
+        self.line_opcodes = collections.Counter()
+        self.counted_opcodes = 0
+        self.syscall = None
+        self.step_context = None
+        self.step_line = None
+
+    # tracer callbacks
+
+    def step(self, engine, context, opcode):
+        self._sync(engine)
+
+        debug_map = self.debug_maps.get(context.script_hash)
+        self.step_context = context
+        self.step_line = debug_map.line_at(context.ip) if debug_map else None
+        self.syscall = None
+        if opcode == op.SYSCALL:
+            self.syscall = op.decode(context.script, context.ip).syscall
+
+        path = tuple(self.frames)
+        self.opcodes[path] += 1
+        self.counted_opcodes = engine.opcodes + 1
+        if self.step_line:
+            self.line_opcodes[self.step_line] += 1
+
+    def charged(self, engine, units):
+        self._sync(engine)
+        path = tuple(self.frames)
+        top = self.contexts[-1]
+        if self.syscall is not None and top is self.step_context:
+            path = path + ('syscall:' + self.syscall,)
+        self.gas[path] += units
+        if self.step_line and top is self.step_context:
+            self.line_gas[self.step_line] += units
+
+        # opcodes a native contract reports for itself
+        if engine.opcodes > self.counted_opcodes:
+            self.opcodes[path] += engine.opcodes - self.counted_opcodes
+            self.counted_opcodes = engine.opcodes
+
+    def _sync(self, engine):
+        stack = engine.invocation_stack
+        depth = 0
+        while depth < len(self.contexts) and depth < len(stack) and self.contexts[depth] is stack[depth]:
+            depth += 1
+        del self.contexts[depth:]
+        del self.frames[depth:]
+        for context in stack[depth:]:
+            self.contexts.append(context)
+            self.frames.append('%s:%s' % (self._contract_name(context.script_hash), self._function(context)))
+            self.calls[tuple(self.frames)] += 1
+
+    def _contract_name(self, script_hash):
+        contract = self.chain.contracts.get(script_hash)
+        if contract is None:
+            return 'tx'
+        return contract.name or script_hash[::-1].hex()
+
+    def _function(self, context):
+        if context.native is not None:
+            return context.operation
+        debug_map = self.debug_maps.get(context.script_hash)
+        name = debug_map.function_at(context.ip) if debug_map else None
+        if name:
+            return name
+        return 'entry' if context.ip == 0 else 'sub_%04x' % context.ip
+
+    # reports
+
+    @property
+    def total_gas(self):
+        return sum(self.gas.values())
+
+    @property
+    def total_opcodes(self):
+        return sum(self.opcodes.values())
+
+    def functions(self):
+        """Rows of (frame, inclusive GAS units, self GAS units, self opcodes, calls)."""
+        inclusive = collections.Counter()
+        own = collections.Counter()
+        own_opcodes = collections.Counter()
+        calls = collections.Counter()
+        for path, units in self.gas.items():
+            for frame in set(path):
+                inclusive[frame] += units
+            own[path[-1]] += units
+        for path, count in self.opcodes.items():
+            own_opcodes[path[-1]] += count
+            for frame in set(path):
+                inclusive.setdefault(frame, 0)
+        for path, count in self.calls.items():
+            calls[path[-1]] += count
+        rows = [(frame, inclusive[frame], own[frame], own_opcodes[frame], calls[frame]) for frame in inclusive]
+        rows.sort(key=lambda row: (-row[1], -row[3], row[0]))
+        return rows
+
+    def table(self, lines=10):
+        out = ['%-58s %9s %9s %8s %5s' % ('function', 'incl GAS', 'self GAS', 'opcodes', 'calls')]
+        for frame, incl, own, count, calls in self.functions():
+            out.append('%-58s %9.3f %9.3f %8d %5s' % (
+                frame, incl * GAS_UNIT, own * GAS_UNIT, count, calls or ''))
+        out.append('%-58s %9.3f %9s %8d' % ('total', self.total_gas * GAS_UNIT, '', self.total_opcodes))
+        if lines and self.line_gas:
+            out.append('')
+            out.append('%-58s %9s %9s %8s' % ('source line', '', 'GAS', 'opcodes'))
+            hot = sorted(self.line_gas, key=lambda line: (-self.line_gas[line], line))[:lines]
+            for line in hot:
+                out.append('%-58s %9s %9.3f %8d' % (line, '', self.line_gas[line] * GAS_UNIT,
+                                                    self.line_opcodes[line]))
+        return '\n'.join(out)
+
+    def folded(self, weight='gas'):
+        """Collapsed stacks, one 'frame;frame;... value' line per path."""
+        values = self.gas if weight == 'gas' else self.opcodes
+        return '\n'.join('%s %d' % (';'.join(path), value)
+                         for path, value in sorted(values.items()) if value) + '\n'
+
+    def svg(self, title='', weight='gas'):
+        values = self.gas if weight == 'gas' else self.opcodes
+        return flame_graph_svg(values, title, 'GAS' if weight == 'gas' else 'opcodes')
+
+
+def flame_graph_svg(values, title='', unit='GAS', width=1200, row=18):
+    """Render {path tuple: value} as a self-contained SVG flame graph."""
+    root = {}
+    for path, value in values.items():
+        node = root
+        for frame in path:
+            entry = node.setdefault(frame, [0, {}])
+            entry[0] += value
+            node = entry[1]
+
+    def depth_of(node):
+        return 1 + max([depth_of(child[1]) for child in node.values()] or [0])
+
+    total = float(sum(entry[0] for entry in root.values())) or 1.0
+    depth = depth_of(root)
+    height = (depth + 2) * row
+    scale = GAS_UNIT if unit == 'GAS' else 1
+    fmt = '%.3f' if unit == 'GAS' else '%d'
+    parts = [
+        '<svg xmlns="http://www.w3.org/2000/svg" width="%d" height="%d" font-family="monospace" font-size="11">'
+        % (width, height),
+        '<text x="4" y="%d">%s</text>' % (row - 5, _escape('%s (%s %s)' % (title, fmt % (total * scale), unit))),
+    ]
+
+    def draw(node, x, level):
+        for frame in sorted(node):
+            value, children = node[frame]
+            w = value / total * (width - 8)
+            y = height - (level + 1) * row
+            hue = 20 + (sum(bytearray(frame.split(':')[0].encode('utf-8'))) * 37) % 40
+            label = '%s (%s %s, %.1f%%)' % (frame, fmt % (value * scale), unit, value * 100.0 / total)
+            parts.append('<g><title>%s</title><rect x="%.1f" y="%d" width="%.1f" height="%d" '
+                         'fill="hsl(%d,80%%,60%%)" stroke="white"/>' % (_escape(label), x, y, w, row - 1, hue))
+            if w > 40:
+                parts.append('<text x="%.1f" y="%d">%s</text>' % (
+                    x + 3, y + row - 6, _escape(frame[:int(w / 7)])))
+            parts.append('</g>')
+            draw(children, x, level + 1)
+            x += w
+
+    draw(root, 4.0, 0)
+    parts.append('</svg>')
+    return '\n'.join(parts) + '\n'
+
+
+def _escape(text):
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+class Profiler(object):
+    """
+    Profiles every invocation on ``chain`` from now on. Debug maps are
+    looked up in build/ by contract name.
+    """
+
+    def __init__(self, chain, build_dir=BUILD_DIR):
+        self.chain = chain
+        self.build_dir = build_dir
+        self.debug_maps = {}
+        self.profiles = {}
+        chain.on_engine = self._attach
+
+    def _attach(self, engine):
+        self._load_debug_maps()
+        profile = Profile(self.chain, self.debug_maps)
+        engine.tracer = profile
+        self.profiles[engine.tx.hash] = profile
+
+    def _load_debug_maps(self):
+        for script_hash, contract in self.chain.contracts.items():
+            if script_hash in self.debug_maps or contract.native is not None:
+                continue
+            path = os.path.join(self.build_dir, '%s.avmdbgnfo' % contract.name)
+            self.debug_maps[script_hash] = DebugMap.load(path) if os.path.exists(path) else None
+
+    def profile_of(self, result):
+        return self.profiles[result.tx.hash]
+
+
+def main(argv=None):
+    from .bench import SUITES
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--suite', required=True, choices=[name for name, _ in SUITES],
+                        help='bench suite whose invocations to profile')
+    parser.add_argument('--operation', help='only the bench row with this label')
+    parser.add_argument('--mct', choices=('native', 'avm'), default='native',
+                        help='run against the Python stand-in or mct-privnet.avm')
+    parser.add_argument('--lines', type=int, default=10, help='number of source lines to list')
+    parser.add_argument('--weight', choices=('gas', 'opcodes'), default='gas',
+                        help='what the flame graph and collapsed stacks measure')
+    parser.add_argument('--svg', metavar='FILE', help='write a flame graph (needs --operation)')
+    parser.add_argument('--folded', metavar='FILE', help='write collapsed stacks (needs --operation)')
+    args = parser.parse_args(argv)
+    if (args.svg or args.folded) and not args.operation:
+        parser.error('--svg and --folded need --operation')
+
+    net = Privnet(mct=args.mct)
+    profiler = Profiler(net.chain)
+    found = False
+    for label, result in dict(SUITES)[args.suite](net):
+        if args.operation and label != args.operation:
+            continue
+        found = True
+        profile = profiler.profile_of(result)
+        print('%s %s (%s, %d opcodes, %.3f GAS)' % (args.suite, label, result.state, result.opcodes, result.gas))
+        print(profile.table(args.lines))
+        print('')
+        title = '%s %s' % (args.suite, label)
+        if args.svg:
+            with open(args.svg, 'w') as f:
+                f.write(profile.svg(title, args.weight))
+        if args.folded:
+            with open(args.folded, 'w') as f:
+                f.write(profile.folded(args.weight))
+    if not found:
+        print('no invocation labelled %r in %s' % (args.operation, args.suite))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
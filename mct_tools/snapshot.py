@@ -0,0 +1,212 @@
+"""
+Chain-state snapshots
+=====================
+
+Setting up MCT on a privnet (import, deploy, token import, a 10K MCT stake
+per contract) takes minutes, and even in the emulator seeding hundreds of
+sales takes a while. A snapshot saves the state of an emulated privnet
+once -- deployed contracts, their storage (MCT balances, stakes and the
+staked storage keyspace), block headers and the transaction nonce -- so
+tests and benchmarks can start from it:
+
+    snapshot.save(net, 'sales.snap')
+    net = snapshot.load('sales.snap')       # a Privnet in the saved state
+
+    python -m mct_tools.snapshot create safe-remote-purchase sales.snap --sales 500
+    python -m mct_tools.snapshot info sales.snap
+
+The file is memory-mapped on load. It is laid out as
+
+    magic        8 bytes   MAGIC
+    header size  4 bytes   little-endian
+    header       JSON      chain metadata, contracts and section offsets
+    scripts                the deployed .avm scripts
+    headers                block timestamps, 4 bytes each
+    storage                per contract: (key size: 2 bytes, value size:
+                           4 bytes, key, value) for every item
+
+with offsets relative to the end of the header. Invocation history and
+ApplicationLogs are not part of a snapshot.
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+
+from .blobstore import digest_of
+from .chain import Chain, Header
+from .mct import MCTToken
+from .privnet import Privnet, ZERO_OWNER
+
+MAGIC = b'MCTSNAP1'
+ITEM = struct.Struct('<HI')
+COIN = 10 ** 8
+
+
+def save(net, path):
+    """Write the state of the Privnet ``net`` to ``path``."""
+    chain = net.chain
+    symbols = dict((h, s) for s, h in net.tokens.items())
+    data = bytearray()
+    contracts = []
+    for script_hash, contract in sorted(chain.contracts.items()):
+        entry = {'hash': script_hash.hex(), 'name': contract.name, 'payable': contract.payable}
+        if contract.native is not None:
+            entry['native'] = symbols[script_hash]
+        else:
+            entry['script'] = [len(data), len(contract.script)]
+            data += contract.script
+        contracts.append(entry)
+
+    headers = [len(data), len(chain.headers)]
+    for header in chain.headers:
+        data += struct.pack('<I', header.timestamp)
+
+    storage = []
+    for script_hash, items in sorted(chain.storage.contracts.items()):
+        start = len(data)
+        for key, value in sorted(items.items()):
+            data += ITEM.pack(len(key), len(value))
+            data += key
+            data += value
+        storage.append({'hash': script_hash.hex(), 'offset': start, 'size': len(data) - start,
+                        'count': len(items)})
+
+    header = json.dumps({
+        'mct': net.mct,
+        'nonce': chain.nonce,
+        'tokens': dict((s, h.hex()) for s, h in net.tokens.items()),
+        'contracts': contracts,
+        'headers': headers,
+        'storage': storage,
+    }, sort_keys=True).encode('utf-8')
+    with open(path, 'wb') as f:
+        f.write(MAGIC + struct.pack('<I', len(header)) + header)
+        f.write(data)
+
+
+def read_header(snapshot):
+    """Return (metadata, offset of the data sections) of a mapped snapshot."""
+    if snapshot[:len(MAGIC)] != MAGIC:
+        raise ValueError('not an MCT snapshot')
+    size = struct.unpack_from('<I', snapshot, len(MAGIC))[0]
+    start = len(MAGIC) + 4
+    return json.loads(bytes(snapshot[start:start + size]).decode('utf-8')), start + size
+
+
+def load(path):
+    """Return a Privnet in the state saved to ``path``."""
+    with open(path, 'rb') as f:
+        snapshot = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        meta, base = read_header(snapshot)
+        chain = Chain()
+        for entry in meta['contracts']:
+            script_hash = bytes.fromhex(entry['hash'])
+            if 'native' in entry:
+                chain.register_native(MCTToken(script_hash, symbol=entry['native']), name=entry['name'])
+            else:
+                offset, size = entry['script']
+                script = snapshot[base + offset:base + offset + size]
+                chain.deploy(script, name=entry['name'], payable=entry['payable'], script_hash=script_hash)
+
+        offset, count = meta['headers']
+        timestamps = struct.unpack_from('<%dI' % count, snapshot, base + offset)
+        chain.headers = [Header(index, timestamp) for index, timestamp in enumerate(timestamps)]
+        chain.nonce = meta['nonce']
+
+        for entry in meta['storage']:
+            items = {}
+            position = base + entry['offset']
+            for _ in range(entry['count']):
+                key_size, value_size = ITEM.unpack_from(snapshot, position)
+                position += ITEM.size
+                items[snapshot[position:position + key_size]] = snapshot[position + key_size:position + key_size + value_size]
+                position += key_size + value_size
+            chain.storage.contracts[bytes.fromhex(entry['hash'])] = items
+    finally:
+        snapshot.close()
+
+    tokens = dict((s, bytes.fromhex(h)) for s, h in meta['tokens'].items())
+    return Privnet(mct=meta['mct'], chain=chain, tokens=tokens)
+
+
+def info(path):
+    with open(path, 'rb') as f:
+        snapshot = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            meta, _ = read_header(snapshot)
+        finally:
+            snapshot.close()
+    names = dict((e['hash'], e['name']) for e in meta['contracts'])
+    lines = ['%s: %d bytes, height %d, MCT %s' % (
+        path, os.path.getsize(path), meta['headers'][1] - 1, meta['mct'])]
+    for entry in meta['storage']:
+        lines.append('  %-24s %7d keys %9d bytes' % (
+            names.get(entry['hash'], entry['hash']), entry['count'], entry['size']))
+    return '\n'.join(lines)
+
+
+# states to create from the command line
+
+def create_mct(net, args):
+    return net
+
+
+def create_atomicswap(net, args):
+    swap = net.deploy('atomicswap.py', stake=('CTX',))
+    for symbol in ('MCT', 'CTX', 'CTY'):
+        net.expect(net.chain.invoke(swap, 'registerToken', [net.tokens[symbol]], signers=[ZERO_OWNER]))
+        net.fund(symbol, ZERO_OWNER, 100000 * COIN)
+        net.expect(net.transfer(symbol, ZERO_OWNER, swap, 50000 * COIN))
+    return net
+
+
+def create_safe_remote_purchase(net, args):
+    srp = net.deploy('safe-remote-purchase.py', stake=('CTX',))
+    sellers = [b'\xa1' + i.to_bytes(19, 'big') for i in range(max(1, args.sales // 30 + 1))]
+    for seller in sellers:
+        net.fund('CTX', seller, 2 * 100 * COIN * 30)
+    for i in range(args.sales):
+        seller = sellers[i % len(sellers)]
+        net.expect(net.transfer('CTX', seller, srp, 2 * 100 * COIN, ['createSale', b'', 100 * COIN, digest_of('sale %d' % i)]))
+    return net
+
+
+STATES = {
+    'mct': create_mct,
+    'atomicswap': create_atomicswap,
+    'safe-remote-purchase': create_safe_remote_purchase,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    commands = parser.add_subparsers(dest='command')
+    create = commands.add_parser('create', help='set up a state and save it')
+    create.add_argument('state', choices=sorted(STATES),
+                        help='MCT deployed, plus an atomicswap or safe-remote-purchase contract')
+    create.add_argument('path')
+    create.add_argument('--sales', type=int, default=500, help='open sales for safe-remote-purchase')
+    create.add_argument('--mct', choices=('native', 'avm'), default='native',
+                        help='use the Python stand-in or mct-privnet.avm')
+    show = commands.add_parser('info', help='describe a snapshot')
+    show.add_argument('path')
+    args = parser.parse_args(argv)
+
+    if args.command == 'create':
+        net = STATES[args.state](Privnet(mct=args.mct), args)
+        save(net, args.path)
+        print(info(args.path))
+    elif args.command == 'info':
+        print(info(args.path))
+    else:
+        parser.print_help()
+        return 2
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
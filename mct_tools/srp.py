@@ -0,0 +1,142 @@
+"""
+Safe Remote Purchase sale records
+=================================
+
+Decodes the sale records returned by the `sale` operation of
+safe-remote-purchase.py. The contract stores the terms of a sale under
+'s<sale id>' and its state under 't<sale id>' (see the contract
+docstring); join_sale() combines the two the way the `sale` operation
+does. Sales created by the first version of the contract have the
+32-byte creating transaction hash as their id and were stored whole under
+'sales/<sale id>', as a Serialize()d map, until they are migrated.
+open_sales() lists a party's sales through the contract's salesPage
+operation.
+
+A sale record holds the SHA-256 hash of its description rather than the
+text, which is kept in a BlobStore (mct_tools/blobstore.py). decode_sale()
+returns it as 'description_hash'; 'description' is only set for sales of
+the first version, which hold the text itself:
+
+    args = create_sale_args(store, buyer, price, 'vintage mechanical keyboard')
+    net.transfer('CTX', seller, srp, 2 * price, args)
+    ...
+    sale_description(store, decode_sale(record))
+"""
+from .types import Map, deserialize, serialize, to_bytes, to_int
+
+STATES = {1: 'new', 2: 'awaiting shipment', 3: 'shipment confirmed'}
+
+ANY_BUYER = b'\x00' * 20
+
+# first byte of a Serialize()d map, never a valid packed state
+SERIALIZED_MAP = 0x82
+
+
+def created_sale_id(result):
+    """
+    Return the id of the sale an invocation created, from its saleCreated
+    event, or None. Sale ids are sequential, so a client that sent a
+    createSale transfer learns the id this way rather than from the
+    transaction hash.
+    """
+    for _, state in result.notifications:
+        if isinstance(state, list) and len(state) == 5 and state[0] == b'saleCreated':
+            return to_bytes(state[1])
+    return None
+
+
+def open_sales(chain, contract, party, page_size=64):
+    """
+    Return the ids of a party's open sales, as seller or buyer, reading
+    them page by page with the contract's salesPage operation.
+    """
+    sale_ids = []
+    cursor = b''
+    while True:
+        result = chain.invoke(contract, 'salesPage', [party, cursor, page_size], commit=False)
+        if not result.halted:
+            raise ValueError('salesPage failed: %s' % result.fault)
+        page = result.result
+        sale_ids.extend(to_bytes(sale_id) for sale_id in page[1:])
+        cursor = to_bytes(page[0])
+        if not cursor:
+            return sale_ids
+
+
+def decode_sale(record):
+    """Return the fields of a packed or legacy sale record as a dict."""
+    if record[:1] == bytes([SERIALIZED_MAP]):
+        return decode_legacy_sale(record)
+    if len(record) < 43:
+        raise ValueError('sale record too short')
+
+    price_len = record[41]
+    buyer = record[21:41]
+    sale = {
+        'state': STATES.get(record[0], record[0]),
+        'seller': record[1:21],
+        'buyer': None if buyer == ANY_BUYER else buyer,
+        'price': to_int(record[42:42 + price_len]),
+        'description': None,
+        'description_hash': None,
+    }
+    field = record[42 + price_len:]
+    if field[:1] == b'h':
+        sale['description_hash'] = field[1:]
+    elif field[:1] == b't':
+        sale['description'] = field[1:]
+    elif field:
+        raise ValueError('unknown description format')
+    return sale
+
+
+def create_sale_args(store, buyer, price, description):
+    """
+    Store ``description`` in the BlobStore ``store`` and return the
+    transfer arguments of a createSale that refers to it by hash.
+    """
+    digest = store.put(description) if description else b''
+    return ['createSale', buyer or b'', price, digest]
+
+
+def sale_description(store, sale):
+    """
+    Return the description of a decoded sale, from the BlobStore ``store``
+    and checked against its hash when the sale record holds the hash, or
+    as stored when it holds the text, as sales of the first version do.
+    Returns b'' for a sale without a description and raises KeyError if
+    the description is not in the store.
+    """
+    if sale['description_hash'] is not None:
+        return store.get(sale['description_hash'])
+    return sale['description'] or b''
+
+
+def join_sale(terms, status):
+    """Combine the stored terms and state records of a sale into one record."""
+    return status[:1] + terms[:20] + status[1:21] + terms[20:]
+
+
+def decode_legacy_sale(record):
+    sale = deserialize(record)
+    buyer = to_bytes(sale['buyer'])
+    return {
+        'state': to_bytes(sale['state']).decode('utf-8'),
+        'seller': to_bytes(sale['seller']),
+        'buyer': buyer if len(buyer) == 20 else None,
+        'price': to_int(sale['price']),
+        'description': to_bytes(sale['description']) or None,
+        'description_hash': None,
+    }
+
+
+def encode_legacy_sale(sale_id, seller, buyer, price, description, state='new'):
+    """Build a record the way earlier versions of the contract stored it."""
+    sale = Map()
+    sale[b'id'] = sale_id
+    sale[b'seller'] = seller
+    sale[b'buyer'] = buyer or b''
+    sale[b'description'] = to_bytes(description)
+    sale[b'price'] = price
+    sale[b'state'] = state.encode('utf-8')
+    return serialize(sale)
@@ -0,0 +1,267 @@
+"""
+AVM stack items
+===============
+
+Stack items are kept as plain Python values wherever possible:
+
+    bytes       ByteArray
+    bool        Boolean
+    int         Integer
+    Array       Array (list, reference semantics)
+    Struct      Struct (list, copied on assignment)
+    Map         Map
+    anything    InteropInterface (transactions, headers, storage contexts)
+
+The conversion rules follow the NEO 2.x reference VM, so a contract sees
+the same values here as on a node.
+"""
+import struct
+
+MAX_BIGINT_SIZE = 32
+
+
+class VMFault(Exception):
+    pass
+
+
+class Array(list):
+    pass
+
+
+class Struct(list):
+
+    def clone(self):
+        return Struct(item.clone() if isinstance(item, Struct) else item for item in self)
+
+
+class Map(object):
+    """Insertion-ordered map keyed by the byte value of primitive items."""
+
+    def __init__(self):
+        self._items = {}
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return map_key(key) in self._items
+
+    def __getitem__(self, key):
+        try:
+            return self._items[map_key(key)][1]
+        except KeyError:
+            raise VMFault('map key not found')
+
+    def __setitem__(self, key, value):
+        self._items[map_key(key)] = (key, value)
+
+    def remove(self, key):
+        self._items.pop(map_key(key), None)
+
+    def keys(self):
+        return [k for k, _ in self._items.values()]
+
+    def values(self):
+        return [v for _, v in self._items.values()]
+
+    def items(self):
+        return list(self._items.values())
+
+
+def map_key(item):
+    if isinstance(item, (list, Map)):
+        raise VMFault('map keys must be primitive')
+    return to_bytes(item)
+
+
+def int_to_bytes(value):
+    if value == 0:
+        return b''
+    length = ((value if value >= 0 else ~value).bit_length() + 8) // 8
+    return value.to_bytes(length, 'little', signed=True)
+
+
+def to_bytes(item):
+    if isinstance(item, bytes):
+        return item
+    if isinstance(item, bool):
+        return b'\x01' if item else b''
+    if isinstance(item, int):
+        return int_to_bytes(item)
+    if isinstance(item, bytearray):
+        return bytes(item)
+    if isinstance(item, str):
+        return item.encode('utf-8')
+    raise VMFault('cannot convert %s to a byte array' % type(item).__name__)
+
+
+def to_int(item):
+    if isinstance(item, bool):
+        return int(item)
+    if isinstance(item, int):
+        return item
+    if isinstance(item, (bytes, bytearray)):
+        if len(item) > MAX_BIGINT_SIZE:
+            raise VMFault('integer operand too large')
+        return int.from_bytes(item, 'little', signed=True)
+    raise VMFault('cannot convert %s to an integer' % type(item).__name__)
+
+
+def to_bool(item):
+    if isinstance(item, (bytes, bytearray)):
+        return any(item)
+    if isinstance(item, (bool, int)):
+        return item != 0
+    return item is not None
+
+
+def items_equal(a, b):
+    if a is b:
+        return True
+    if isinstance(a, Struct) and isinstance(b, Struct):
+        return len(a) == len(b) and all(items_equal(x, y) for x, y in zip(a, b))
+    if isinstance(a, (list, Map)) or isinstance(b, (list, Map)):
+        return False
+    if not isinstance(a, (bytes, bool, int)) or not isinstance(b, (bytes, bool, int)):
+        return a == b
+    return to_bytes(a) == to_bytes(b)
+
+
+def from_python(value):
+    """Convert invocation parameters (str, int, bytes, lists) to stack items."""
+    if isinstance(value, str):
+        return value.encode('utf-8')
+    if isinstance(value, bytearray):
+        return bytes(value)
+    if isinstance(value, (list, tuple)) and not isinstance(value, Struct):
+        return Array(from_python(v) for v in value)
+    return value
+
+
+# Runtime.Serialize / Runtime.Deserialize
+
+T_BYTEARRAY = 0x00
+T_BOOLEAN = 0x01
+T_INTEGER = 0x02
+T_INTEROP = 0x40
+T_ARRAY = 0x80
+T_STRUCT = 0x81
+T_MAP = 0x82
+
+
+def write_varint(out, value):
+    if value < 0xFD:
+        out.append(value)
+    elif value <= 0xFFFF:
+        out.append(0xFD)
+        out.extend(struct.pack('<H', value))
+    elif value <= 0xFFFFFFFF:
+        out.append(0xFE)
+        out.extend(struct.pack('<I', value))
+    else:
+        out.append(0xFF)
+        out.extend(struct.pack('<Q', value))
+
+
+def read_varint(data, pos):
+    first = data[pos]
+    if first < 0xFD:
+        return first, pos + 1
+    if first == 0xFD:
+        return struct.unpack_from('<H', data, pos + 1)[0], pos + 3
+    if first == 0xFE:
+        return struct.unpack_from('<I', data, pos + 1)[0], pos + 5
+    return struct.unpack_from('<Q', data, pos + 1)[0], pos + 9
+
+
+def _write_bytes(out, value):
+    write_varint(out, len(value))
+    out.extend(value)
+
+
+def serialize(item):
+    out = bytearray()
+    _serialize(out, item, set())
+    return bytes(out)
+
+
+def _serialize(out, item, seen):
+    if isinstance(item, bytes):
+        out.append(T_BYTEARRAY)
+        _write_bytes(out, item)
+    elif isinstance(item, bool):
+        out.append(T_BOOLEAN)
+        out.append(1 if item else 0)
+    elif isinstance(item, int):
+        out.append(T_INTEGER)
+        _write_bytes(out, int_to_bytes(item))
+    elif isinstance(item, (list, Map)):
+        if id(item) in seen:
+            raise VMFault('cannot serialize a circular reference')
+        seen.add(id(item))
+        if isinstance(item, Map):
+            out.append(T_MAP)
+            write_varint(out, len(item))
+            for key, value in item.items():
+                _serialize(out, key, seen)
+                _serialize(out, value, seen)
+        else:
+            out.append(T_STRUCT if isinstance(item, Struct) else T_ARRAY)
+            write_varint(out, len(item))
+            for value in item:
+                _serialize(out, value, seen)
+        seen.discard(id(item))
+    else:
+        raise VMFault('cannot serialize interop items')
+
+
+def deserialize(data):
+    try:
+        item, pos = _deserialize(data, 0)
+    except (IndexError, struct.error):
+        raise VMFault('malformed serialized data')
+    return item
+
+
+def _deserialize(data, pos):
+    kind = data[pos]
+    pos += 1
+    if kind == T_BYTEARRAY:
+        length, pos = read_varint(data, pos)
+        return bytes(data[pos:pos + length]), pos + length
+    if kind == T_BOOLEAN:
+        return data[pos] != 0, pos + 1
+    if kind == T_INTEGER:
+        length, pos = read_varint(data, pos)
+        return to_int(bytes(data[pos:pos + length])), pos + length
+    if kind in (T_ARRAY, T_STRUCT):
+        count, pos = read_varint(data, pos)
+        result = Struct() if kind == T_STRUCT else Array()
+        for _ in range(count):
+            value, pos = _deserialize(data, pos)
+            result.append(value)
+        return result, pos
+    if kind == T_MAP:
+        count, pos = read_varint(data, pos)
+        result = Map()
+        for _ in range(count):
+            key, pos = _deserialize(data, pos)
+            value, pos = _deserialize(data, pos)
+            result[key] = value
+        return result, pos
+    raise VMFault('unknown serialized item type %02x' % kind)
+
+
+def to_json(item):
+    """ApplicationLog-style JSON form of a stack item."""
+    if isinstance(item, bytes):
+        return {'type': 'ByteArray', 'value': item.hex()}
+    if isinstance(item, bool):
+        return {'type': 'Boolean', 'value': item}
+    if isinstance(item, int):
+        return {'type': 'Integer', 'value': str(item)}
+    if isinstance(item, Map):
+        return {'type': 'Map', 'value': [{'key': to_json(k), 'value': to_json(v)} for k, v in item.items()]}
+    if isinstance(item, list):
+        return {'type': 'Struct' if isinstance(item, Struct) else 'Array', 'value': [to_json(v) for v in item]}
+    return {'type': 'InteropInterface'}
@@ -0,0 +1,799 @@
+"""
+AVM execution engine
+====================
+
+A straightforward interpreter for NEO 2.x AVM scripts. The evaluation and
+alt stacks are shared by every frame on the invocation stack, which is how
+neo-boa output expects them to behave (locals live in an array on the alt
+stack, arguments and return values travel on the evaluation stack).
+
+Native contracts (Python objects registered on the chain, such as the MCT
+stand-in) are called through APPCALL like any deployed script. They get a
+frame of their own on the invocation stack so that GetCallingScriptHash
+inside a contract they call back into reports the native contract's hash.
+"""
+import hashlib
+
+from . import opcodes as op
+from . import interop
+from .types import (VMFault, Array, Struct, Map, to_bytes, to_int, to_bool,
+                    int_to_bytes, items_equal, MAX_BIGINT_SIZE)
+
+MAX_STACK_SIZE = 2 * 1024
+MAX_ITEM_SIZE = 1024 * 1024
+MAX_ARRAY_SIZE = 1024
+MAX_INVOCATION_DEPTH = 1024
+
+TRIGGER_VERIFICATION = 0x00
+TRIGGER_APPLICATION = 0x10
+
+HALT = 'HALT'
+FAULT = 'FAULT'
+
+
+def sha256(data):
+    return hashlib.sha256(data).digest()
+
+
+def hash160(data):
+    return hashlib.new('ripemd160', sha256(data)).digest()
+
+
+class ExecutionContext(object):
+    __slots__ = ('script', 'script_hash', 'ip', 'native', 'operation')
+
+    def __init__(self, script, script_hash, native=None, operation=None):
+        self.script = script
+        self.script_hash = script_hash
+        self.ip = 0
+        self.native = native
+        self.operation = operation  # of a native contract call
+
+
+class ExecutionEngine(object):
+    """
+    Runs one invocation against a storage view. Counters for opcodes,
+    GAS, app calls and storage writes are accumulated on the engine and
+    read back by Chain.invoke.
+    """
+
+    def __init__(self, chain, storage, tx, trigger=TRIGGER_APPLICATION, gas_limit=None):
+        self.chain = chain
+        self.storage = storage
+        self.tx = tx
+        self.trigger = trigger
+        self.gas_limit = gas_limit
+        self.eval_stack = []
+        self.alt_stack = []
+        self.invocation_stack = []
+        self.state = None
+        self.opcodes = 0
+        self.gas_units = 0
+        self.app_calls = 0
+        self.storage_writes = 0
+        self.storage_bytes_written = 0
+        self.storage_deletes = 0
+        self.notifications = []
+        self.logs = []
+        self.fault = None
+        # object with step(engine, context, opcode), called before each
+        # instruction, and charged(engine, units), called for every fee
+        self.tracer = None
+
+    # frame accessors used by interop services
+
+    @property
+    def current_script_hash(self):
+        return self.invocation_stack[-1].script_hash
+
+    @property
+    def calling_script_hash(self):
+        if len(self.invocation_stack) < 2:
+            return b''
+        return self.invocation_stack[-2].script_hash
+
+    @property
+    def entry_script_hash(self):
+        return self.invocation_stack[0].script_hash
+
+    def check_witness(self, hash_or_pubkey):
+        if len(hash_or_pubkey) == 33:
+            hash_or_pubkey = hash160(b'\x21' + hash_or_pubkey + b'\xac')
+        return hash_or_pubkey in self.tx.signers
+
+    def notify(self, state):
+        self.notifications.append((self.current_script_hash, state))
+
+    def log(self, message):
+        self.logs.append((self.current_script_hash, message))
+
+    def charge(self, units):
+        self.gas_units += units
+        if self.tracer is not None:
+            self.tracer.charged(self, units)
+        if self.gas_limit is not None and self.gas_units > self.gas_limit:
+            raise VMFault('insufficient GAS')
+
+    def storage_put(self, script_hash, key, value):
+        self.storage_writes += 1
+        self.storage_bytes_written += len(key) + len(value)
+        self.storage.put(script_hash, key, value)
+
+    def storage_delete(self, script_hash, key):
+        self.storage_deletes += 1
+        self.storage.delete(script_hash, key)
+
+    # running
+
+    def load_script(self, script, script_hash=None):
+        if script_hash is None:
+            script_hash = hash160(script)
+        if len(self.invocation_stack) >= MAX_INVOCATION_DEPTH:
+            raise VMFault('invocation stack overflow')
+        context = ExecutionContext(script, script_hash)
+        self.invocation_stack.append(context)
+        return context
+
+    def execute(self):
+        try:
+            self.run_until(0)
+            self.state = HALT
+        except VMFault as e:
+            self.state = FAULT
+            self.fault = str(e)
+        except (AttributeError, IndexError, KeyError, TypeError, ValueError, OverflowError) as e:
+            self.state = FAULT
+            self.fault = '%s: %s' % (type(e).__name__, e)
+        return self.state
+
+    def run_until(self, depth):
+        while len(self.invocation_stack) > depth:
+            self.step()
+
+    def call_contract(self, script_hash, operation, args):
+        """
+        Invoke ``operation`` on another contract from inside a native
+        contract and return its result, the way an APPCALL would.
+        """
+        depth = len(self.invocation_stack)
+        self.eval_stack.append(args)
+        self.eval_stack.append(operation)
+        self._app_call(script_hash)
+        self.run_until(depth)
+        return self.eval_stack.pop()
+
+    def _app_call(self, script_hash, tail=False):
+        contract = self.chain.contracts.get(script_hash)
+        if contract is None:
+            raise VMFault('contract %s not found' % script_hash[::-1].hex())
+        self.app_calls += 1
+        if tail:
+            self.invocation_stack.pop()
+        if contract.native is not None:
+            operation = to_bytes(self.eval_stack.pop()).decode('utf-8', 'replace')
+            args = self.eval_stack.pop()
+            context = ExecutionContext(b'', script_hash, native=contract.native, operation=operation)
+            self.invocation_stack.append(context)
+            result = contract.native.invoke(self, operation, args)
+            if self.invocation_stack[-1] is not context:
+                raise VMFault('native contract left the invocation stack unbalanced')
+            self.invocation_stack.pop()
+            self.eval_stack.append(result)
+        else:
+            self.load_script(contract.script, script_hash)
+
+    def step(self):
+        context = self.invocation_stack[-1]
+        script = context.script
+        if context.ip >= len(script):
+            opcode = op.RET
+            ins = None
+        else:
+            opcode = script[context.ip]
+            if op.PUSHBYTES1 <= opcode <= op.PUSHBYTES75:
+                ins = None
+            else:
+                ins = op.decode(script, context.ip)
+
+        if self.tracer is not None:
+            self.tracer.step(self, context, opcode)
+
+        self.opcodes += 1
+        self.charge(interop.opcode_price(opcode))
+
+        if opcode <= op.PUSHBYTES75 and opcode != op.PUSH0:
+            start = context.ip + 1
+            self.eval_stack.append(bytes(script[start:start + opcode]))
+            context.ip = start + opcode
+        else:
+            if ins is not None:
+                context.ip += ins.size
+            else:
+                context.ip += 1
+            handler = HANDLERS.get(opcode)
+            if handler is None:
+                raise VMFault('invalid opcode %02x' % opcode)
+            handler(self, context, ins)
+
+        if len(self.eval_stack) + len(self.alt_stack) > MAX_STACK_SIZE:
+            raise VMFault('stack size limit exceeded')
+
+
+def _pop(engine):
+    try:
+        return engine.eval_stack.pop()
+    except IndexError:
+        raise VMFault('evaluation stack underflow')
+
+
+def _peek(engine, n=0):
+    try:
+        return engine.eval_stack[-1 - n]
+    except IndexError:
+        raise VMFault('evaluation stack underflow')
+
+
+def _pop_int(engine):
+    return to_int(_pop(engine))
+
+
+def _push_int(engine, value):
+    if len(int_to_bytes(value)) > MAX_BIGINT_SIZE:
+        raise VMFault('integer result too large')
+    engine.eval_stack.append(value)
+
+
+# push and flow control
+
+def _push0(engine, context, ins):
+    engine.eval_stack.append(b'')
+
+
+def _pushdata(engine, context, ins):
+    engine.eval_stack.append(ins.operand)
+
+
+def _pushm1(engine, context, ins):
+    engine.eval_stack.append(-1)
+
+
+def _make_push(value):
+    def handler(engine, context, ins):
+        engine.eval_stack.append(value)
+    return handler
+
+
+def _nop(engine, context, ins):
+    pass
+
+
+def _jmp(engine, context, ins):
+    target = ins.target
+    if ins.opcode != op.JMP:
+        condition = to_bool(_pop(engine))
+        if ins.opcode == op.JMPIFNOT:
+            condition = not condition
+        if not condition:
+            return
+    if target < 0 or target > len(context.script):
+        raise VMFault('jump out of range')
+    context.ip = target
+
+
+def _call(engine, context, ins):
+    callee = engine.load_script(context.script, context.script_hash)
+    callee.ip = ins.target
+
+
+def _ret(engine, context, ins):
+    engine.invocation_stack.pop()
+
+
+def _appcall(engine, context, ins):
+    script_hash = ins.app_call_hash
+    if script_hash is None:
+        script_hash = to_bytes(_pop(engine))
+    engine._app_call(script_hash, tail=ins.opcode in (op.TAILCALL, op.CALL_ET, op.CALL_EDT))
+
+
+def _syscall(engine, context, ins):
+    name = ins.syscall
+    engine.charge(interop.syscall_price(engine, name) - 1)
+    interop.invoke_syscall(engine, name)
+
+
+# stack
+
+def _dupfromaltstack(engine, context, ins):
+    if not engine.alt_stack:
+        raise VMFault('alt stack underflow')
+    engine.eval_stack.append(engine.alt_stack[-1])
+
+
+def _toaltstack(engine, context, ins):
+    engine.alt_stack.append(_pop(engine))
+
+
+def _fromaltstack(engine, context, ins):
+    if not engine.alt_stack:
+        raise VMFault('alt stack underflow')
+    engine.eval_stack.append(engine.alt_stack.pop())
+
+
+def _xdrop(engine, context, ins):
+    n = _pop_int(engine)
+    if n < 0 or n >= len(engine.eval_stack):
+        raise VMFault('XDROP out of range')
+    del engine.eval_stack[-1 - n]
+
+
+def _xswap(engine, context, ins):
+    n = _pop_int(engine)
+    stack = engine.eval_stack
+    if n < 0 or n >= len(stack):
+        raise VMFault('XSWAP out of range')
+    stack[-1], stack[-1 - n] = stack[-1 - n], stack[-1]
+
+
+def _xtuck(engine, context, ins):
+    n = _pop_int(engine)
+    stack = engine.eval_stack
+    if n <= 0 or n > len(stack):
+        raise VMFault('XTUCK out of range')
+    stack.insert(len(stack) - n, stack[-1])
+
+
+def _depth(engine, context, ins):
+    engine.eval_stack.append(len(engine.eval_stack))
+
+
+def _drop(engine, context, ins):
+    _pop(engine)
+
+
+def _dup(engine, context, ins):
+    engine.eval_stack.append(_peek(engine))
+
+
+def _nip(engine, context, ins):
+    top = _pop(engine)
+    _pop(engine)
+    engine.eval_stack.append(top)
+
+
+def _over(engine, context, ins):
+    engine.eval_stack.append(_peek(engine, 1))
+
+
+def _pick(engine, context, ins):
+    n = _pop_int(engine)
+    if n < 0:
+        raise VMFault('PICK out of range')
+    engine.eval_stack.append(_peek(engine, n))
+
+
+def _roll(engine, context, ins):
+    n = _pop_int(engine)
+    stack = engine.eval_stack
+    if n < 0 or n >= len(stack):
+        raise VMFault('ROLL out of range')
+    if n:
+        stack.append(stack.pop(-1 - n))
+
+
+def _rot(engine, context, ins):
+    stack = engine.eval_stack
+    if len(stack) < 3:
+        raise VMFault('evaluation stack underflow')
+    stack.append(stack.pop(-3))
+
+
+def _swap(engine, context, ins):
+    stack = engine.eval_stack
+    if len(stack) < 2:
+        raise VMFault('evaluation stack underflow')
+    stack[-1], stack[-2] = stack[-2], stack[-1]
+
+
+def _tuck(engine, context, ins):
+    stack = engine.eval_stack
+    if len(stack) < 2:
+        raise VMFault('evaluation stack underflow')
+    stack.insert(-2, stack[-1])
+
+
+# splice
+
+def _cat(engine, context, ins):
+    b = to_bytes(_pop(engine))
+    a = to_bytes(_pop(engine))
+    if len(a) + len(b) > MAX_ITEM_SIZE:
+        raise VMFault('item size limit exceeded')
+    engine.eval_stack.append(a + b)
+
+
+def _substr(engine, context, ins):
+    count = _pop_int(engine)
+    index = _pop_int(engine)
+    if count < 0 or index < 0:
+        raise VMFault('SUBSTR out of range')
+    engine.eval_stack.append(to_bytes(_pop(engine))[index:index + count])
+
+
+def _left(engine, context, ins):
+    count = _pop_int(engine)
+    if count < 0:
+        raise VMFault('LEFT out of range')
+    engine.eval_stack.append(to_bytes(_pop(engine))[:count])
+
+
+def _right(engine, context, ins):
+    count = _pop_int(engine)
+    data = to_bytes(_pop(engine))
+    if count < 0 or count > len(data):
+        raise VMFault('RIGHT out of range')
+    engine.eval_stack.append(data[len(data) - count:])
+
+
+def _size(engine, context, ins):
+    engine.eval_stack.append(len(to_bytes(_pop(engine))))
+
+
+# bitwise and arithmetic
+
+def _unary(fn):
+    def handler(engine, context, ins):
+        _push_int(engine, fn(_pop_int(engine)))
+    return handler
+
+
+def _binary(fn):
+    def handler(engine, context, ins):
+        b = _pop_int(engine)
+        a = _pop_int(engine)
+        _push_int(engine, fn(a, b))
+    return handler
+
+
+def _compare(fn):
+    def handler(engine, context, ins):
+        b = _pop_int(engine)
+        a = _pop_int(engine)
+        engine.eval_stack.append(fn(a, b))
+    return handler
+
+
+def _div(a, b):
+    if b == 0:
+        raise VMFault('division by zero')
+    q = abs(a) // abs(b)
+    return q if (a >= 0) == (b >= 0) else -q
+
+
+def _mod(a, b):
+    if b == 0:
+        raise VMFault('division by zero')
+    return a - _div(a, b) * b
+
+
+def _shl(a, b):
+    if b < 0 or b > 256:
+        raise VMFault('shift out of range')
+    return a << b
+
+
+def _shr(a, b):
+    if b < 0 or b > 256:
+        raise VMFault('shift out of range')
+    return a >> b
+
+
+def _equal(engine, context, ins):
+    b = _pop(engine)
+    a = _pop(engine)
+    engine.eval_stack.append(items_equal(a, b))
+
+
+def _not(engine, context, ins):
+    engine.eval_stack.append(not to_bool(_pop(engine)))
+
+
+def _nz(engine, context, ins):
+    engine.eval_stack.append(_pop_int(engine) != 0)
+
+
+def _booland(engine, context, ins):
+    b = to_bool(_pop(engine))
+    a = to_bool(_pop(engine))
+    engine.eval_stack.append(a and b)
+
+
+def _boolor(engine, context, ins):
+    b = to_bool(_pop(engine))
+    a = to_bool(_pop(engine))
+    engine.eval_stack.append(a or b)
+
+
+def _within(engine, context, ins):
+    b = _pop_int(engine)
+    a = _pop_int(engine)
+    x = _pop_int(engine)
+    engine.eval_stack.append(a <= x < b)
+
+
+# crypto
+
+def _sha1(engine, context, ins):
+    engine.eval_stack.append(hashlib.sha1(to_bytes(_pop(engine))).digest())
+
+
+def _sha256(engine, context, ins):
+    engine.eval_stack.append(sha256(to_bytes(_pop(engine))))
+
+
+def _hash160(engine, context, ins):
+    engine.eval_stack.append(hash160(to_bytes(_pop(engine))))
+
+
+def _hash256(engine, context, ins):
+    engine.eval_stack.append(sha256(sha256(to_bytes(_pop(engine)))))
+
+
+def _unsupported(engine, context, ins):
+    raise VMFault('%s is not supported by the emulator' % op.NAMES[ins.opcode])
+
+
+# arrays and maps
+
+def _arraysize(engine, context, ins):
+    item = _pop(engine)
+    if isinstance(item, (list, Map)):
+        engine.eval_stack.append(len(item))
+    else:
+        engine.eval_stack.append(len(to_bytes(item)))
+
+
+def _pack(engine, context, ins):
+    n = _pop_int(engine)
+    if n < 0 or n > len(engine.eval_stack) or n > MAX_ARRAY_SIZE:
+        raise VMFault('PACK out of range')
+    engine.eval_stack.append(Array(engine.eval_stack.pop() for _ in range(n)))
+
+
+def _unpack(engine, context, ins):
+    item = _pop(engine)
+    if not isinstance(item, list):
+        raise VMFault('UNPACK expects an array')
+    for value in reversed(item):
+        engine.eval_stack.append(value)
+    engine.eval_stack.append(len(item))
+
+
+def _pickitem(engine, context, ins):
+    key = _pop(engine)
+    item = _pop(engine)
+    if isinstance(item, Map):
+        engine.eval_stack.append(item[key])
+    elif isinstance(item, list):
+        index = to_int(key)
+        if index < 0 or index >= len(item):
+            raise VMFault('PICKITEM index out of range')
+        engine.eval_stack.append(item[index])
+    else:
+        data = to_bytes(item)
+        index = to_int(key)
+        if index < 0 or index >= len(data):
+            raise VMFault('PICKITEM index out of range')
+        engine.eval_stack.append(data[index])
+
+
+def _setitem(engine, context, ins):
+    value = _pop(engine)
+    if isinstance(value, Struct):
+        value = value.clone()
+    key = _pop(engine)
+    item = _pop(engine)
+    if isinstance(item, Map):
+        if key not in item and len(item) >= MAX_ARRAY_SIZE:
+            raise VMFault('map size limit exceeded')
+        item[key] = value
+    elif isinstance(item, list):
+        index = to_int(key)
+        if index < 0 or index >= len(item):
+            raise VMFault('SETITEM index out of range')
+        item[index] = value
+    else:
+        raise VMFault('SETITEM expects an array or map')
+
+
+def _newarray(cls):
+    def handler(engine, context, ins):
+        item = _pop(engine)
+        if isinstance(item, list):
+            engine.eval_stack.append(cls(item))
+            return
+        n = to_int(item)
+        if n < 0 or n > MAX_ARRAY_SIZE:
+            raise VMFault('array size out of range')
+        engine.eval_stack.append(cls(False for _ in range(n)))
+    return handler
+
+
+def _newmap(engine, context, ins):
+    engine.eval_stack.append(Map())
+
+
+def _append(engine, context, ins):
+    value = _pop(engine)
+    if isinstance(value, Struct):
+        value = value.clone()
+    array = _pop(engine)
+    if not isinstance(array, list):
+        raise VMFault('APPEND expects an array')
+    if len(array) >= MAX_ARRAY_SIZE:
+        raise VMFault('array size limit exceeded')
+    array.append(value)
+
+
+def _reverse(engine, context, ins):
+    array = _pop(engine)
+    if not isinstance(array, list):
+        raise VMFault('REVERSE expects an array')
+    array.reverse()
+
+
+def _remove(engine, context, ins):
+    key = _pop(engine)
+    item = _pop(engine)
+    if isinstance(item, Map):
+        item.remove(key)
+    elif isinstance(item, list):
+        index = to_int(key)
+        if index < 0 or index >= len(item):
+            raise VMFault('REMOVE index out of range')
+        del item[index]
+    else:
+        raise VMFault('REMOVE expects an array or map')
+
+
+def _haskey(engine, context, ins):
+    key = _pop(engine)
+    item = _pop(engine)
+    if isinstance(item, Map):
+        engine.eval_stack.append(key in item)
+    elif isinstance(item, list):
+        index = to_int(key)
+        if index < 0:
+            raise VMFault('HASKEY index out of range')
+        engine.eval_stack.append(index < len(item))
+    else:
+        raise VMFault('HASKEY expects an array or map')
+
+
+def _keys(engine, context, ins):
+    item = _pop(engine)
+    if not isinstance(item, Map):
+        raise VMFault('KEYS expects a map')
+    engine.eval_stack.append(Array(item.keys()))
+
+
+def _values(engine, context, ins):
+    item = _pop(engine)
+    if isinstance(item, Map):
+        values = item.values()
+    elif isinstance(item, list):
+        values = list(item)
+    else:
+        raise VMFault('VALUES expects an array or map')
+    engine.eval_stack.append(Array(v.clone() if isinstance(v, Struct) else v for v in values))
+
+
+# exceptions
+
+def _throw(engine, context, ins):
+    raise VMFault('THROW at offset %d' % (context.ip - 1))
+
+
+def _throwifnot(engine, context, ins):
+    if not to_bool(_pop(engine)):
+        raise VMFault('THROWIFNOT at offset %d' % (context.ip - 1))
+
+
+HANDLERS = {
+    op.PUSH0: _push0,
+    op.PUSHDATA1: _pushdata,
+    op.PUSHDATA2: _pushdata,
+    op.PUSHDATA4: _pushdata,
+    op.PUSHM1: _pushm1,
+    op.NOP: _nop,
+    op.JMP: _jmp,
+    op.JMPIF: _jmp,
+    op.JMPIFNOT: _jmp,
+    op.CALL: _call,
+    op.RET: _ret,
+    op.APPCALL: _appcall,
+    op.TAILCALL: _appcall,
+    op.CALL_I: _call,
+    op.CALL_E: _appcall,
+    op.CALL_ED: _appcall,
+    op.CALL_ET: _appcall,
+    op.CALL_EDT: _appcall,
+    op.SYSCALL: _syscall,
+    op.DUPFROMALTSTACK: _dupfromaltstack,
+    op.TOALTSTACK: _toaltstack,
+    op.FROMALTSTACK: _fromaltstack,
+    op.XDROP: _xdrop,
+    op.XSWAP: _xswap,
+    op.XTUCK: _xtuck,
+    op.DEPTH: _depth,
+    op.DROP: _drop,
+    op.DUP: _dup,
+    op.NIP: _nip,
+    op.OVER: _over,
+    op.PICK: _pick,
+    op.ROLL: _roll,
+    op.ROT: _rot,
+    op.SWAP: _swap,
+    op.TUCK: _tuck,
+    op.CAT: _cat,
+    op.SUBSTR: _substr,
+    op.LEFT: _left,
+    op.RIGHT: _right,
+    op.SIZE: _size,
+    op.INVERT: _unary(lambda a: ~a),
+    op.AND: _binary(lambda a, b: a & b),
+    op.OR: _binary(lambda a, b: a | b),
+    op.XOR: _binary(lambda a, b: a ^ b),
+    op.EQUAL: _equal,
+    op.INC: _unary(lambda a: a + 1),
+    op.DEC: _unary(lambda a: a - 1),
+    op.SIGN: _unary(lambda a: (a > 0) - (a < 0)),
+    op.NEGATE: _unary(lambda a: -a),
+    op.ABS: _unary(abs),
+    op.NOT: _not,
+    op.NZ: _nz,
+    op.ADD: _binary(lambda a, b: a + b),
+    op.SUB: _binary(lambda a, b: a - b),
+    op.MUL: _binary(lambda a, b: a * b),
+    op.DIV: _binary(_div),
+    op.MOD: _binary(_mod),
+    op.SHL: _binary(_shl),
+    op.SHR: _binary(_shr),
+    op.BOOLAND: _booland,
+    op.BOOLOR: _boolor,
+    op.NUMEQUAL: _compare(lambda a, b: a == b),
+    op.NUMNOTEQUAL: _compare(lambda a, b: a != b),
+    op.LT: _compare(lambda a, b: a < b),
+    op.GT: _compare(lambda a, b: a > b),
+    op.LTE: _compare(lambda a, b: a <= b),
+    op.GTE: _compare(lambda a, b: a >= b),
+    op.MIN: _binary(min),
+    op.MAX: _binary(max),
+    op.WITHIN: _within,
+    op.SHA1: _sha1,
+    op.SHA256: _sha256,
+    op.HASH160: _hash160,
+    op.HASH256: _hash256,
+    op.CHECKSIG: _unsupported,
+    op.VERIFY: _unsupported,
+    op.CHECKMULTISIG: _unsupported,
+    op.ARRAYSIZE: _arraysize,
+    op.PACK: _pack,
+    op.UNPACK: _unpack,
+    op.PICKITEM: _pickitem,
+    op.SETITEM: _setitem,
+    op.NEWARRAY: _newarray(Array),
+    op.NEWSTRUCT: _newarray(Struct),
+    op.NEWMAP: _newmap,
+    op.APPEND: _append,
+    op.REVERSE: _reverse,
+    op.REMOVE: _remove,
+    op.HASKEY: _haskey,
+    op.KEYS: _keys,
+    op.VALUES: _values,
+    op.THROW: _throw,
+    op.THROWIFNOT: _throwifnot,
+}
+
+for _value in range(op.PUSH1, op.PUSH16 + 1):
+    HANDLERS[_value] = _make_push(_value - op.PUSH1 + 1)
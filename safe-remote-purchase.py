@@ -41,20 +41,103 @@ This contract allows for an unlimited number of sales by any number
 of different sellers. A seller can specify the address of a specific
 buyer, or no buyer address (meaning anyone can buy the item).
 
-This contract can be deployed for 90 GAS + 10000 MCT
+This contract needs a stake of 10000 MCT for its storage, and an MCT
+with the batched staked storage operations GetMany, PutMany and
+DeleteMany and with Find. No deployed MCT provides them yet, neither the
+TestNet tokens nor mct-privnet.avm, so for now this contract only runs in
+the local emulator (see docs/emulator.md).
 
 Contract operations
 -------------------
 
 # relayed from the MCT contract transfer() operation
-onTokenTransfer::createSale(buyer, price, description)  # creates a new sale
+onTokenTransfer::createSale(buyer, price, description_hash)  # creates a new sale
 onTokenTransfer::buyerDeposit(sale_id)  # buyer agreement to purchase with deposit
 
 # invoked directly
 confirmShipment(sale_id)  # seller invokes to show that shipment has been made
 confirmReceived(sale_id)  # buyer invokes to show that item has been received
+confirmReceivedMany([sale_id, ...])  # confirmReceived for up to 32 sales, paying each party once
 deleteSale(sale_id)  # delete a sale where no buyer has deposited yet
 sale(sale_id)  # sale details and current state
+salesBy(party, offset, limit)  # ids of a party's open sales, up to 32 per call
+salesPage(party, cursor, limit)  # the same, up to 64 per call, paged with a cursor
+migrateSale(sale_id)  # rewrite a sale stored by an earlier version in the current format
+
+Sale records
+------------
+
+Sales are numbered from 1 in the order they are created; the id is the
+counter value as a byte string, so ids stay one to four bytes long and
+keep the keys, transfer arguments and index entries that refer to a sale
+short. The creating transaction's saleCreated event carries the id, so a
+client that only knows the transaction hash reads it from the
+ApplicationLog (or from the off-chain index, see mct_tools/indexer.py).
+
+    'c'                             id of the last sale created
+
+Each sale is stored as two packed records, read with substr() at fixed
+offsets instead of being deserialized. The terms of the sale never change
+after createSale and are kept apart from the few bytes every state change
+rewrites:
+
+    's' + sale_id                   terms
+        offset  length  field
+        0       20      seller
+        20      1       length n of the price
+        21      n       price
+        21+n    -       description, if given:
+                        'h' + its 32-byte SHA-256 hash, or
+                        't' + its text, for sales of the first version
+
+    't' + sale_id                   state
+        0       1       state (1 new, 2 awaiting shipment, 3 shipment confirmed)
+        1       20      buyer (all zero bytes if any buyer may pay)
+        21      1       length n of the seller's index slot
+        22      n       seller's index slot
+        22+n    -       buyer's index slot, once a buyer has paid
+
+Both are read with one GetMany. The sale operation joins them into a
+single record (state | seller | buyer | price length | price |
+description); decode_sale() in mct_tools/srp.py unpacks it off-chain.
+
+The description itself is kept off-chain, in a content-addressed store
+such as mct_tools/blobstore.py, so a sale costs the same to store however
+long its description is; sale_description() in mct_tools/srp.py fetches
+it and checks it against the hash. Sales created by the first version
+hold the text itself, and the first byte of the field tells the two
+apart.
+
+Every party has an index of their open sales, both as seller and as
+buyer, so they can be listed with salesBy without knowing the ids:
+
+    'n/' + party                    number of slots used so far
+    'i/' + party + slot             id of the sale in that slot
+
+A sale takes the seller's next slot when it is created and the buyer's
+next slot when the buyer pays, and its slots are deleted with the sale.
+Slots are never reused, so a page of salesBy can hold fewer ids than it
+covers slots; salesBy returns the number of slots first so callers know
+when to stop paging. salesPage reads the index with MCT's Find instead,
+so its pages are full and take one call: it returns the cursor of the
+next page first, empty after the last page. Its ids come in key order,
+not the order the sales were created in.
+
+The first version of this contract used the 32-byte hash of the creating
+transaction as the sale id and stored the whole sale under 'sales/' +
+sale_id with Serialize(). Such sales are converted when loaded, and their
+next state change, or migrateSale up front, rewrites them as the terms
+and state records above, under 'sales/' and 'state/' + sale_id. They are
+not in the party indexes.
+
+Events
+------
+
+    saleCreated(sale_id, seller, buyer, price)  # buyer all zero bytes for any buyer
+    saleState(sale_id, state, buyer)  # state 2 or 3 as above, 0 once the sale is completed or deleted
+
+Together with the MCT transfer events they are enough to follow every
+sale off-chain, see mct_tools/indexer.py.
 
 Deployment and usage in neo-python
 ----------------------------------
@@ -68,9 +151,12 @@ sc deploy safe-remote-purchase.avm False False True 0710 05
 # stake 10K MCT tokens in order to use MCT contract storage
 wallet token send MCT {owner_addr} {contract_addr} 1000000000000
 
+# store the item description off-chain, printing its hash
+python -m mct_tools.blobstore put description.txt
+
 # create a sale of an item for 1000 MCT (depositing 2000 at the same time)
 sc invoke {MCT contract hash} transfer ['{seller_addr}','{SRP_contract_addr}',200000000000,
-    ['createSale','{buyer_addr}',100000000000,'item description']]
+    ['createSale','{buyer_addr}',100000000000,bytearray(b'{32-byte description hash}')]]
 
 # make a deposit of 2000 MCT on a sale of an item offered for 1000 MCT
 sc invoke {MCT contract hash} transfer ['{buyer_addr}','{SRP_contract_addr}',200000000000,
@@ -82,14 +168,22 @@ sc invoke {SRP contract hash} confirmShipment [{sale_id}]
 # confirm the receipt of the item, releasing all funds and deleting the sale
 sc invoke {SRP contract hash} confirmReceived [{sale_id}]
 
+# confirm the receipt of several items at once
+sc invoke {SRP contract hash} confirmReceivedMany [[{sale_id},{sale_id},...]]
+
+# list the first 10 open sales of a seller or buyer
+sc invoke {SRP contract hash} salesBy ['{party_addr}',0,10]
+
+# the same with a cursor, passing the first item of each page to get the next
+sc invoke {SRP contract hash} salesPage ['{party_addr}','',10]
+
 """
 
 from boa.interop.Neo.Runtime import GetTrigger, CheckWitness
 from boa.interop.Neo.TriggerType import Application, Verification
-from boa.interop.System.ExecutionEngine import GetExecutingScriptHash, GetCallingScriptHash, GetScriptContainer
-from boa.interop.Neo.Transaction import GetHash
+from boa.interop.System.ExecutionEngine import GetExecutingScriptHash, GetCallingScriptHash
 from boa.interop.Neo.App import RegisterAppCall
-from boa.builtins import concat
+from boa.builtins import concat, substr, has_key, keys
 
 # address that will stake the tokens for the contract to have storage
 OWNER = b'\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00'
@@ -103,32 +197,47 @@ MCTContract = RegisterAppCall('9aff1e08aea2048a26a3d2ddbb3df495b932b1e7', 'opera
 #MCTContract = RegisterAppCall('a87cc2a513f5d8b4a42432343687c2127c60bc3f', 'operation', 'args')
 
 OnError = RegisterAction('error', 'message')
+OnSaleCreated = RegisterAction('saleCreated', 'sale_id', 'seller', 'buyer', 'price')
+OnSaleState = RegisterAction('saleState', 'sale_id', 'state', 'buyer')
 
+# Sale states are written as literals (1 new, 2 awaiting shipment, 3 shipment
+# confirmed) rather than constants: neo-boa loads every module-level constant
+# a function uses into a local on each call of that function.
 
-def Main(operation, args):
+ANY_BUYER = b'\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00'
 
-    trigger = GetTrigger()
 
-    if trigger == Verification():
-        return False  # no withdrawals allowed, even by contract owner
+def Main(operation, args):
 
-    elif trigger == Application():
+    # Most frequent operations first (see mct-dapp-template.py)
 
-        arglen = len(args)
+    trigger = GetTrigger()
+
+    if trigger == Application():
 
         if operation == 'onTokenTransfer':
             return handle_token_received(GetCallingScriptHash(), args)
 
+        arglen = len(args)
+
         if operation == 'confirmShipment':  # seller-only
             assert arglen == 1, 'incorrect argument length'
             sale_id = args[0]
             
-            sale = loadSale(sale_id)
-            assert sale['state'] == 'awaiting shipment', 'sale state incorrect'
-            assert CheckWitness(sale['seller']), 'must be seller to confirm shipment'
-
-            sale['state'] = 'shipment confirmed'
-            r = Put(concat('sales/', sale_id), Serialize(sale))
+            sale_keys = [concat('s', sale_id), concat('t', sale_id)]
+            sale = loadSale(sale_id, sale_keys)
+            terms = sale[0]
+            status = sale[1]
+            assert substr(status, 0, 1) == 2, 'sale state incorrect'  # awaiting shipment
+            assert CheckWitness(substr(terms, 0, 20)), 'must be seller to confirm shipment'
+
+            buyer = substr(status, 1, 20)
+            status = concat(concat(3, buyer), substr(status, 21, len(status) - 21))  # shipment confirmed
+            if len(sale) > 2:
+                r = PutMany(sale_keys, [terms, status])  # split an older record
+            else:
+                r = Put(sale_keys[1], status)
+            OnSaleState(sale_id, 3, buyer)
         
             return True
 
@@ -136,47 +245,83 @@ def Main(operation, args):
             assert arglen == 1, 'incorrect argument length'
             sale_id = args[0]
             
-            sale = loadSale(sale_id)
-            assert sale['state'] == 'shipment confirmed', 'sale state incorrect'
-            seller = sale['seller']
-            buyer = sale['buyer']
-            price = sale['price']
+            sale_keys = [concat('s', sale_id), concat('t', sale_id)]
+            sale = loadSale(sale_id, sale_keys)
+            terms = sale[0]
+            status = sale[1]
+            assert substr(status, 0, 1) == 3, 'sale state incorrect'  # shipment confirmed
+            seller = substr(terms, 0, 20)
+            buyer = substr(status, 1, 20)
+            price = substr(terms, 21, substr(terms, 20, 1)) * 1
 
             myhash = GetExecutingScriptHash()
             assert CheckWitness(buyer), 'must be buyer to complete the sale'
 
             # return the buyer deposit minus the item price
             r = MCTContract('transfer', [myhash, buyer, price])
+            assert r, 'payout transfer failed'
 
             # return the seller deposit plus the item price
             r = MCTContract('transfer', [myhash, seller, price * 3])
+            assert r, 'payout transfer failed'
 
-            # delete the sale
-            r = Delete(concat('sales/', sale_id))
+            # delete the sale and its index slots
+            addSlotKeys(sale_keys, seller, buyer, status)
+            r = DeleteMany(sale_keys)
+            OnSaleState(sale_id, 0, buyer)
             return True
 
+        elif operation == 'confirmReceivedMany':  # buyer-only
+            assert arglen == 1, 'incorrect argument length'
+            return settleSales(args[0])
+
         elif operation == 'deleteSale':  # seller-only, if buyer has not already made deposit
             assert arglen == 1, 'incorrect argument length'
             sale_id = args[0]
-            sale = loadSale(sale_id)
-            assert sale['state'] == 'new', 'cannot cancel sale post-buyer-deposit'
-            seller = sale['seller']
-            price = sale['price']
+            sale_keys = [concat('s', sale_id), concat('t', sale_id)]
+            sale = loadSale(sale_id, sale_keys)
+            terms = sale[0]
+            assert substr(sale[1], 0, 1) == 1, 'cannot cancel sale post-buyer-deposit'  # new
+            seller = substr(terms, 0, 20)
+            price = substr(terms, 21, substr(terms, 20, 1)) * 1
 
             myhash = GetExecutingScriptHash()
             assert CheckWitness(seller), 'must be seller to cancel the sale'
 
             # return the seller deposit to them
-            return MCTContract('transfer', [myhash, seller, price * 2])
+            r = MCTContract('transfer', [myhash, seller, price * 2])
+            assert r, 'refund transfer failed'
 
-            # delete the sale
-            r = Delete(concat('sales/', sale_id))
+            # delete the sale and its index slot
+            addSlotKeys(sale_keys, seller, ANY_BUYER, sale[1])
+            r = DeleteMany(sale_keys)
+            OnSaleState(sale_id, 0, ANY_BUYER)
             return True
 
         elif operation == 'sale':  # get sale details
             assert arglen == 1, 'incorrect argument length'
             sale_id = args[0]
-            return Get(concat('sales/', sale_id))
+            sale = loadSale(sale_id, [concat('s', sale_id), concat('t', sale_id)])
+            terms = sale[0]
+            status = sale[1]
+            parties = concat(concat(substr(status, 0, 1), substr(terms, 0, 20)), substr(status, 1, 20))
+            return concat(parties, substr(terms, 20, len(terms) - 20))
+
+        elif operation == 'salesBy':  # open sales of a seller or buyer
+            assert arglen == 3, 'incorrect argument length'
+            return salesBy(args[0], args[1], args[2])
+
+        elif operation == 'salesPage':  # open sales of a seller or buyer
+            assert arglen == 3, 'incorrect argument length'
+            return salesPage(args[0], args[1], args[2])
+
+        elif operation == 'migrateSale':  # anyone, for sales stored by earlier versions
+            assert arglen == 1, 'incorrect argument length'
+            sale_id = args[0]
+            return migrateSale(sale_id)
+
+    elif trigger == Verification():
+        return False  # no withdrawals allowed, even by contract owner
 
     AssertionError('unknown operation - code: XxXxXxXx')
 
@@ -185,24 +330,26 @@ def handle_token_received(chash, args):
   
     assert chash == MCT_HASH, 'transactions must use MCT'
 
-    if t_from == OWNER:
-        # just staking MCT tokens for storage, nothing else to do here
-        return True
-
     arglen = len(args)
-    assert arglen == 4, 'incorrect arg length'
+    assert arglen > 2, 'incorrect arg length'
 
     # parameters of MCT transfer
     t_from = args[0]
     t_to = args[1]
     t_amount = args[2] * 1
-    p_args = args[3]  # 4th argument passed by MCT transfer()
 
     assert len(t_from) == 20, 'invalid address'
     assert len(t_to) == 20, 'invalid address'
     assert t_to == GetExecutingScriptHash(), 'destination error'
     assert t_amount > 0, 'no funds transferred'
 
+    if t_from == OWNER:
+        # just staking MCT tokens for storage, nothing else to do here
+        return True
+
+    assert arglen == 4, 'incorrect arg length'
+    p_args = args[3]  # 4th argument passed by MCT transfer()
+
     p_len = len(p_args)
     assert p_len > 1, 'incorrect secondary arg length'
 
@@ -211,51 +358,290 @@ def handle_token_received(chash, args):
         assert p_len == 4, 'incorrect arguments to createSale'
         buyer_addr = p_args[1]
         price = p_args[2] * 1
-        description = p_args[3]
+        description = p_args[3]  # SHA-256 hash of the description, optional
       
         assert price > 0, 'must set a price > 0'
         assert t_amount == price * 2, 'seller deposit must be 2x price'
 
-        tx = GetScriptContainer()
-        sale = {}
-
-        sale['id'] = tx.Hash
-        sale['seller'] = t_from
-        sale['buyer'] = buyer_addr  # if empty, any buyer may pay
-        sale['description'] = description  # optional
-        sale['price'] = price
-        sale['state'] = 'new'
-
-        r = Put(concat('sales/', tx.Hash), Serialize(sale))
+        if len(buyer_addr) == 0:
+            buyer_addr = ANY_BUYER  # if empty, any buyer may pay
+        assert len(buyer_addr) == 20, 'invalid buyer address'
+        if len(description) > 0:
+            assert len(description) == 32, 'description must be its 32-byte hash'
+            description = concat('h', description)
+
+        terms = concat(concat(concat(t_from, len(price)), price), description)
+
+        # the next sale id and the next slot in the seller's index
+        count_key = concat('n/', t_from)
+        counts = GetMany(['c', count_key])
+        sale_id = counts[0] + 1
+        slot = counts[1] + 1
+        status = concat(concat(concat(1, buyer_addr), len(slot)), slot)  # new
+
+        sale_keys = ['c', concat('s', sale_id), concat('t', sale_id), count_key, concat(concat('i/', t_from), slot)]
+        r = PutMany(sale_keys, [sale_id, terms, status, slot, sale_id])
+        OnSaleCreated(sale_id, t_from, buyer_addr, price)
         return True
 
     elif p_operation == 'buyerDeposit':
         assert p_len == 2, 'incorrect arguments to buyerDeposit'
         sale_id = p_args[1]
-        sale = loadSale(sale_id)
-
-        assert sale['state'] == 'new', 'sale state incorrect'
-        assert sale['price'] > 0, 'sale price incorrect'
-        assert t_amount == sale['price'] * 2, 'buyer deposit must be 2x price'
 
-        buyer = sale['buyer']
-        if len(buyer) == 20:
-            assert CheckWitness(buyer), 'must be listed buyer to place deposit'
+        # read the payer's index count along with the sale, as the payer
+        # is usually the buyer
+        count_key = concat('n/', t_from)
+        sale_keys = [concat('s', sale_id), concat('t', sale_id), count_key]
+        sale = GetMany(sale_keys)
+        if len(sale[0]) == 0:
+            sale = findLegacySale(sale_id, sale_keys)
+        terms = sale[0]
+        status = sale[1]
+        slot = sale[2] + 1
+        split = len(status) == 0
+        if split:
+            sale = unpackLegacySale(sale_id, terms)
+            terms = sale[0]
+            status = sale[1]
+        price = substr(terms, 21, substr(terms, 20, 1)) * 1
+
+        assert substr(status, 0, 1) == 1, 'sale state incorrect'  # new
+        assert price > 0, 'sale price incorrect'
+        assert t_amount == price * 2, 'buyer deposit must be 2x price'
+
+        buyer = substr(status, 1, 20)
+        if buyer == ANY_BUYER:
+            buyer = t_from  # any-buyer sale claimed
         else:
-            sale['buyer'] = t_from  # any-buyer sale claimed
+            assert CheckWitness(buyer), 'must be listed buyer to place deposit'
 
-        sale['state'] = 'awaiting shipment'
-        r = Put(concat('sales/', sale_id), Serialize(sale))
-        
+        status_len = len(status)
+        if status_len > 21:
+            # the next slot in the buyer's index
+            if buyer != t_from:
+                count_key = concat('n/', buyer)
+                slot = Get(count_key) + 1
+            status = concat(concat(concat(2, buyer), substr(status, 21, status_len - 21)), slot)  # awaiting shipment
+            r = PutMany([sale_keys[1], count_key, concat(concat('i/', buyer), slot)], [status, slot, sale_id])
+        else:
+            # not indexed, stored by an earlier version
+            status = concat(2, buyer)  # awaiting shipment
+            if split:
+                r = PutMany([sale_keys[0], sale_keys[1]], [terms, status])  # split an older record
+            else:
+                r = Put(sale_keys[1], status)
+
+        OnSaleState(sale_id, 2, buyer)
         return True
 
-def loadSale(sale_id):
-    s = Get(concat('sales/', sale_id))
-    assert len(s) > 0, 'no such sale exists'
+def settleSales(sale_ids):
+    """
+    Confirm receipt of every sale in sale_ids, like confirmReceived, with
+    the payouts netted so each buyer and seller gets a single transfer.
+    All sales are checked before anything is paid out.
+    """
+    count = len(sale_ids)
+    assert count > 0, 'no sales to settle'
+    assert count <= 32, 'too many sales to settle at once'
+
+    sale_keys = []
+    for sale_id in sale_ids:
+        sale_keys.append(concat('s', sale_id))
+        sale_keys.append(concat('t', sale_id))
+    sales = GetMany(sale_keys)
+
+    settled = {}
+    payouts = {}
+    slot_keys = []
+    witnessed = ''
+    i = 0
+    for sale_id in sale_ids:
+        assert not has_key(settled, sale_id), 'sale listed twice'
+        settled[sale_id] = True
+
+        terms = sales[i]
+        status = sales[i + 1]
+        if len(terms) == 0:
+            legacy_keys = [0, 0]
+            sale = findLegacySale(sale_id, legacy_keys)
+            terms = sale[0]
+            status = sale[1]
+            sale_keys[i] = legacy_keys[0]
+            sale_keys[i + 1] = legacy_keys[1]
+        i += 2
+        if len(status) == 0:
+            sale = unpackLegacySale(sale_id, terms)
+            terms = sale[0]
+            status = sale[1]
+
+        assert substr(status, 0, 1) == 3, 'sale state incorrect'  # shipment confirmed
+        buyer = substr(status, 1, 20)
+        if buyer != witnessed:
+            assert CheckWitness(buyer), 'must be buyer to complete the sale'
+            witnessed = buyer
+
+        seller = substr(terms, 0, 20)
+        price = substr(terms, 21, substr(terms, 20, 1)) * 1
+        addSlotKeys(slot_keys, seller, buyer, status)
+        OnSaleState(sale_id, 0, buyer)
+
+        # the buyer deposit minus the item price, the seller deposit plus the item price
+        if has_key(payouts, buyer):
+            payouts[buyer] = payouts[buyer] + price
+        else:
+            payouts[buyer] = price
+        if has_key(payouts, seller):
+            payouts[seller] = payouts[seller] + price * 3
+        else:
+            payouts[seller] = price * 3
+
+    myhash = GetExecutingScriptHash()
+    for recipient in keys(payouts):
+        r = MCTContract('transfer', [myhash, recipient, payouts[recipient]])
+        assert r, 'payout transfer failed'
+
+    # the sales and their index slots in one DeleteMany when they fit
+    if len(sale_keys) + len(slot_keys) <= 64:
+        for key in slot_keys:
+            sale_keys.append(key)
+        slot_keys = []
+    r = DeleteMany(sale_keys)
+    if len(slot_keys) > 0:
+        r = DeleteMany(slot_keys)
+    return True
+
+def loadSale(sale_id, sale_keys):
+    """
+    Return [terms, state] of the sale stored under sale_keys. A sale stored
+    by an earlier version is looked up under its old keys, which replace
+    those in sale_keys, converted, and returned with a third item so callers
+    that change its state know to rewrite the terms as well.
+    """
+    sale = GetMany(sale_keys)
+    if len(sale[0]) == 0:
+        sale = findLegacySale(sale_id, sale_keys)
+    if len(sale[1]) == 0:
+        return unpackLegacySale(sale_id, sale[0])
+    assert len(sale[0]) > 21, 'sale data is corrupt'
+    return sale
+
+# party indexes
+
+def addSlotKeys(sale_keys, seller, buyer, status):
+    """
+    Append the index slot keys recorded in a sale's state to sale_keys.
+    """
+    status_len = len(status)
+    if status_len > 21:
+        n = substr(status, 21, 1)
+        sale_keys.append(concat(concat('i/', seller), substr(status, 22, n)))
+        n = 22 + n
+        if status_len > n:
+            sale_keys.append(concat(concat('i/', buyer), substr(status, n, status_len - n)))
+
+def salesBy(party, offset, limit):
+    """
+    Return the number of slots in a party's index, followed by the ids of
+    the open sales in slots offset to offset + limit - 1.
+    """
+    if len(party) != 20:
+        return False
+    assert offset >= 0, 'offset must not be negative'
+    assert limit > 0, 'limit must be at least 1'
+    assert limit <= 32, 'at most 32 sales per call'
+
+    count = Get(concat('n/', party)) * 1
+    page = [count]
+
+    slot_keys = []
+    slot = offset + 1
+    end = offset + limit
+    if end > count:
+        end = count
+    while slot <= end:
+        slot_keys.append(concat(concat('i/', party), slot))
+        slot += 1
+    if len(slot_keys) == 0:
+        return page
+
+    sale_ids = GetMany(slot_keys)
+    for sale_id in sale_ids:
+        if len(sale_id) > 0:
+            page.append(sale_id)
+    return page
+
+def salesPage(party, cursor, limit):
+    """
+    Return the cursor of the next page, empty after the last one, followed
+    by the ids of up to limit open sales of a party, starting after cursor
+    (empty for the first page).
+    """
+    if len(party) != 20:
+        return False
+    assert limit > 0, 'limit must be at least 1'
+    assert limit <= 64, 'at most 64 sales per call'
+
+    found = Find(concat('i/', party), cursor, limit)
+    page = [found[2]]
+    sale_ids = found[1]
+    for sale_id in sale_ids:
+        page.append(sale_id)
+    return page
+
+# sales stored by earlier versions
+
+def findLegacySale(sale_id, sale_keys):
+    """
+    Read a sale with a transaction hash id from the keys earlier versions
+    used, replacing the first two keys in sale_keys with them.
+    """
+    assert len(sale_id) == 32, 'no such sale exists'
+    sale_keys[0] = concat('sales/', sale_id)
+    sale_keys[1] = concat('state/', sale_id)
+    sale = GetMany(sale_keys)
+    assert len(sale[0]) > 0, 'no such sale exists'
+    return sale
+
+def migrateSale(sale_id):
+    """
+    Rewrite a sale stored with Serialize() by the first version as terms
+    and state records.
+    """
+    assert len(sale_id) == 32, 'no such sale exists'
+    sale_keys = [concat('sales/', sale_id), concat('state/', sale_id)]
+    stored = GetMany(sale_keys)
+    assert len(stored[0]) > 0, 'no such sale exists'
+    assert len(stored[1]) == 0, 'sale already migrated'
+    sale = unpackLegacySale(sale_id, stored[0])
+    r = PutMany(sale_keys, [sale[0], sale[1]])
+    return True
+
+def unpackLegacySale(sale_id, s):
+    """
+    Convert a sale stored with Serialize() into [terms, state, True].
+    """
     sale = Deserialize(s)
     assert sale, 'sale deserialization failure'
     assert sale['id'] == sale_id, 'sale data is corrupt'
-    return sale
+
+    state = sale['state']
+    if state == 'new':
+        state = 1
+    elif state == 'awaiting shipment':
+        state = 2
+    else:
+        state = 3  # shipment confirmed
+
+    buyer = sale['buyer']
+    if len(buyer) != 20:
+        buyer = ANY_BUYER
+
+    price = sale['price']
+    terms = concat(concat(sale['seller'], len(price)), price)
+    description = sale['description']
+    if len(description) > 0:
+        terms = concat(concat(terms, 't'), description)
+    return [terms, concat(state, buyer), True]
 
 # staked storage
 
@@ -268,6 +654,18 @@ def Delete(key):
 def Put(key, value):
     return MCTContract('Put', [key, value])
 
+def GetMany(keys):
+    return MCTContract('GetMany', [keys])
+
+def DeleteMany(keys):
+    return MCTContract('DeleteMany', [keys])
+
+def PutMany(keys, values):
+    return MCTContract('PutMany', [keys, values])
+
+def Find(prefix, cursor, limit):
+    return MCTContract('Find', [prefix, cursor, limit])
+
 
 # required in order to use assert
 
@@ -0,0 +1,22 @@
+import pytest
+
+from mct_tools.privnet import Privnet
+
+
+@pytest.fixture
+def net():
+    return Privnet()
+
+
+@pytest.fixture
+def deploy(net):
+    """
+    Deploy an example contract on ``net``, loading it from build/ or
+    compiling it, and skip the test when neither is possible.
+    """
+    def deploy(source, **kwargs):
+        try:
+            return net.deploy(source, **kwargs)
+        except RuntimeError as e:  # no build, and no neo-boa to make one
+            pytest.skip(str(e))
+    return deploy
@@ -0,0 +1,56 @@
+"""
+Test contract for mct_storage.py
+
+write([[key, value], ...]) applies the writes through the cache, an empty
+value deleting the key, and flushes them; read([key, ...]) returns the
+values through the cache, with the writes of the same invocation applied.
+"""
+from boa.interop.Neo.App import RegisterAppCall
+from mct_storage import StorageCache, CachedGet, CachedGetMany, CachedPut, CachedDelete, Flush
+
+# privatenet
+MCTContract = RegisterAppCall('c186bcb4dc6db8e08be09191c6173456144c4b8d', 'operation', 'args')
+
+def Main(operation, args):
+
+    cache = StorageCache()
+    writes = args[0]
+    for write in writes:
+        key = write[0]
+        value = write[1]
+        if len(value) > 0:
+            r = CachedPut(cache, key, value)
+        else:
+            r = CachedDelete(cache, key)
+
+    if operation == 'write':
+        return Flush(cache)
+
+    if operation == 'read':
+        read_keys = args[1]
+        if len(read_keys) == 1:
+            return [CachedGet(cache, read_keys[0])]
+        return CachedGetMany(cache, read_keys)
+
+    return False
+
+
+# Staked storage appcalls
+
+def Get(key):
+    return MCTContract('Get', [key])
+
+def Delete(key):
+    return MCTContract('Delete', [key])
+
+def Put(key, value):
+    return MCTContract('Put', [key, value])
+
+def GetMany(keys):
+    return MCTContract('GetMany', [keys])
+
+def DeleteMany(keys):
+    return MCTContract('DeleteMany', [keys])
+
+def PutMany(keys, values):
+    return MCTContract('PutMany', [keys, values])
@@ -0,0 +1,52 @@
+"""
+The static analyzer, on hand-assembled scripts.
+"""
+from mct_tools import analyze, opcodes as op
+from mct_tools.chain import ScriptBuilder
+
+TOKEN = b'\x22' * 20
+
+
+def script(builder):
+    return analyze.Script(builder.to_bytes())
+
+
+def test_deploy_fee():
+    static = script(ScriptBuilder().emit(op.APPCALL, TOKEN).emit(op.RET))
+    assert not static.uses_dynamic_invoke
+    assert static.deploy_fee == analyze.DEPLOY_FEE
+
+    # a zero hash takes the callee from the stack
+    dynamic = script(ScriptBuilder().emit(op.APPCALL, bytes(20)).emit(op.RET))
+    assert dynamic.uses_dynamic_invoke
+
+    # neo-boa compiles DynamicAppCall to CALL_ED
+    call_ed = script(ScriptBuilder().emit(op.CALL_ED, bytes([2, 0])).emit(op.RET))
+    assert call_ed.uses_dynamic_invoke
+    assert call_ed.deploy_fee == analyze.DEPLOY_FEE + analyze.DYNAMIC_INVOKE_FEE
+
+    storage = script(ScriptBuilder().emit_push(1).emit(op.SYSCALL, b'\x15Neo.Storage.GetContext').emit(op.RET))
+    assert storage.uses_storage and not storage.uses_dynamic_invoke
+    assert storage.deploy_fee == analyze.DEPLOY_FEE + analyze.STORAGE_FEE
+
+
+def dispatcher(body):
+    # operation == 'foo' ? body : 0
+    builder = ScriptBuilder().emit(op.DUP).emit_push(b'foo').emit(op.EQUAL)
+    builder.emit(op.JMPIFNOT, (3 + len(body) + 1).to_bytes(2, 'little', signed=True))
+    for opcode in body:
+        builder.emit(opcode)
+    return builder.emit(op.RET).emit(op.PUSH0).emit(op.RET)
+
+
+def test_operations():
+    short = script(dispatcher([op.PUSH1]))
+    assert short.operations() == {'foo': 6}
+    assert short.longest_path(short.functions[0]) == 6
+
+    long = script(dispatcher([op.PUSH1, op.PUSH1, op.ADD]))
+    assert long.operations() == {'foo': 8}
+
+    lines, regressions = analyze.compare(short.summary(), long.summary())
+    assert regressions == ['script bytes: 13 -> 15', 'operation foo: 6 -> 8']
+    assert analyze.compare(long.summary(), short.summary())[1] == []
@@ -0,0 +1,121 @@
+"""
+atomicswap.py on the emulated privnet.
+"""
+import pytest
+
+from mct_tools.privnet import ZERO_OWNER
+from mct_tools.mct import MIN_STORAGE_STAKE
+from mct_tools.types import to_bool, to_int
+
+COIN = 10 ** 8
+ALICE = b'\x11' * 20
+
+
+@pytest.fixture
+def swap(net, deploy):
+    contract = deploy('atomicswap.py', stake=('CTX',))
+    for symbol in ('CTX', 'CTY'):
+        net.fund(symbol, ZERO_OWNER, 100000 * COIN)
+        net.expect(net.chain.invoke(contract, 'registerToken', [net.tokens[symbol]], signers=[ZERO_OWNER]))
+    net.expect(net.transfer('CTY', ZERO_OWNER, contract, 50000 * COIN))
+    net.fund('CTX', ALICE, 1000 * COIN)
+    return contract
+
+
+def reserve(net, swap, symbol):
+    return to_int(net.staked_items('CTX', swap).get(b'reserve/' + net.tokens[symbol], b''))
+
+
+def owner(net, swap, operation, *args):
+    return net.chain.invoke(swap, operation, list(args), signers=[ZERO_OWNER])
+
+
+def test_reserves_follow_swaps(net, swap):
+    ctx = net.tokens['CTX']
+    cty = net.tokens['CTY']
+    net.expect(owner(net, swap, 'setExchangeRate', ctx, cty, 2 * COIN))
+    assert (reserve(net, swap, 'CTX'), reserve(net, swap, 'CTY')) == (0, 50000 * COIN)
+
+    net.expect(net.transfer('CTX', ALICE, swap, 10 * COIN, cty))
+    assert (reserve(net, swap, 'CTX'), reserve(net, swap, 'CTY')) == (10 * COIN, 49980 * COIN)
+    assert net.balance('CTY', ALICE) == 20 * COIN
+
+    net.expect(owner(net, swap, 'resyncReserves', ctx))
+    assert reserve(net, swap, 'CTX') == MIN_STORAGE_STAKE + 10 * COIN
+
+
+def test_owner_withdraw_is_limited_to_the_reserve(net, swap):
+    ctx = net.tokens['CTX']
+    cty = net.tokens['CTY']
+    # the storage stake was never counted, and cannot be withdrawn once it is
+    assert not to_bool(owner(net, swap, 'ownerWithdraw', ctx, 5 * COIN).result)
+    net.expect(net.transfer('CTX', ZERO_OWNER, swap, 5 * COIN))
+    net.expect(owner(net, swap, 'resyncReserves', ctx))
+    assert not to_bool(owner(net, swap, 'ownerWithdraw', ctx, 6 * COIN).result)
+    net.expect(owner(net, swap, 'ownerWithdraw', ctx, 5 * COIN))
+    assert reserve(net, swap, 'CTX') == MIN_STORAGE_STAKE
+    assert net.balance('CTX', swap) == MIN_STORAGE_STAKE
+
+    assert not to_bool(owner(net, swap, 'ownerWithdraw', cty, 50001 * COIN).result)
+    assert not to_bool(owner(net, swap, 'ownerWithdraw', cty, 0).result)
+    net.expect(owner(net, swap, 'ownerWithdraw', cty, COIN))
+    assert reserve(net, swap, 'CTY') == 49999 * COIN
+    assert net.balance('CTY', ZERO_OWNER) == 50001 * COIN
+
+
+def test_same_token_swap_is_rejected(net, swap):
+    ctx = net.tokens['CTX']
+    net.expect(owner(net, swap, 'setExchangeRate', ctx, ctx, COIN))
+    assert not to_bool(net.transfer('CTX', ALICE, swap, 10 * COIN, ctx).result)
+    assert net.balance('CTX', ALICE) == 1000 * COIN
+    assert reserve(net, swap, 'CTX') == 0
+
+
+def test_token_arguments_are_script_hashes(net, swap):
+    ctx = net.tokens['CTX']
+    assert not to_bool(owner(net, swap, 'unregisterToken', b'token/').result)
+    assert not to_bool(owner(net, swap, 'resyncReserves', ctx, b'\x01' * 19).result)
+    assert reserve(net, swap, 'CTX') == 0
+    assert not to_bool(owner(net, swap, 'resyncReserves', *([ctx] * 33)).result)
+    net.expect(owner(net, swap, 'resyncReserves', *([ctx] * 32)))
+    assert reserve(net, swap, 'CTX') == MIN_STORAGE_STAKE
+
+
+def test_slippage(net, swap):
+    ctx = net.tokens['CTX']
+    cty = net.tokens['CTY']
+    net.expect(owner(net, swap, 'setExchangeRate', ctx, cty, 2 * COIN))
+    quoted = 210000000  # 2.1, quoted before the rate dropped to 2
+
+    def swap_at(*terms):
+        return net.transfer('CTX', ALICE, swap, 10 * COIN, cty, *terms)
+
+    assert not to_bool(swap_at(quoted).result)
+    assert not to_bool(swap_at(quoted, 400).result)
+    assert not to_bool(swap_at(quoted, 10001).result)
+    assert net.balance('CTX', ALICE) == 1000 * COIN
+
+    net.expect(swap_at(quoted, 500))
+    net.expect(swap_at(2 * COIN, 0))
+    net.expect(swap_at(190000000, 0))  # a better rate than desired
+    assert net.balance('CTY', ALICE) == 60 * COIN
+
+
+def test_partial_fill(net, swap):
+    ctx = net.tokens['CTX']
+    cty = net.tokens['CTY']
+    net.expect(owner(net, swap, 'setExchangeRate', ctx, cty, 100 * COIN))
+    # without a counted CTX reserve above the stake there is nothing to refund from
+    assert not to_bool(net.transfer('CTX', ALICE, swap, 1000 * COIN, cty).result)
+
+    net.expect(net.transfer('CTX', ZERO_OWNER, swap, 1000 * COIN))
+    net.expect(owner(net, swap, 'resyncReserves', ctx))
+    result = net.expect(net.transfer('CTX', ALICE, swap, 1000 * COIN, cty))
+    assert len([n for n in result.notifications if n[1][0] == b'transfer']) == 3
+    assert (net.balance('CTX', ALICE), net.balance('CTY', ALICE)) == (500 * COIN, 50000 * COIN)
+    assert reserve(net, swap, 'CTX') == MIN_STORAGE_STAKE + 1500 * COIN
+    assert reserve(net, swap, 'CTY') == 0
+
+    # an empty reserve fills nothing
+    assert not to_bool(net.transfer('CTX', ALICE, swap, 10 * COIN, cty).result)
+    assert net.balance('CTX', ALICE) == 500 * COIN
@@ -0,0 +1,50 @@
+"""
+The emulator and the benchmark runner. The suites load the example
+contracts from build/, compiling them with neo-boa if needed; the tests
+that run them are skipped when neither is available.
+"""
+import pytest
+
+from mct_tools import bench, opcodes as op
+from mct_tools.chain import Chain, ScriptBuilder
+from mct_tools.privnet import SetupError
+from mct_tools.types import to_int
+
+
+def test_script_runs():
+    chain = Chain()
+    script = ScriptBuilder().emit_push(2).emit_push(40).emit(op.ADD).emit(op.RET).to_bytes()
+    result = chain.run_script(script)
+    assert result.halted and to_int(result.result) == 42
+    assert result.opcodes == 4
+
+    result = chain.run_script(bytes([op.PUSH0, op.THROWIFNOT]))
+    assert result.state == 'FAULT'
+
+
+def test_unexpected_faults():
+    rows = [
+        {'contract': 'mct-vesting-contract', 'operation': 'withdrawMany (locked)', 'state': 'FAULT'},
+        {'contract': 'mct-vesting-contract', 'operation': 'withdrawMany', 'state': 'FAULT'},
+        {'contract': 'atomicswap', 'operation': 'exchangeRate', 'state': 'HALT'},
+    ]
+    assert bench.unexpected_faults(rows) == rows[1:2]
+
+
+def test_setup_failure_is_a_row(monkeypatch):
+    def suite(net):
+        yield 'first', net.chain.run_script(bytes([op.PUSH1]))
+        raise SetupError('no such sale')
+
+    monkeypatch.setattr(bench, 'SUITES', [('broken', suite)])
+    rows = bench.run()
+    assert [(row['operation'], row['state']) for row in rows] == [('first', 'HALT'), ('setup', 'FAULT')]
+    assert bench.unexpected_faults(rows) == rows[1:]
+
+
+def test_suites_have_no_unexpected_faults():
+    try:
+        rows = bench.run()
+    except RuntimeError as e:  # no build, and no neo-boa to make one
+        pytest.skip(str(e))
+    assert bench.unexpected_faults(rows) == []
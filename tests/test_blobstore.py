@@ -0,0 +1,32 @@
+"""
+The content-addressed blob store for sale descriptions.
+"""
+import os
+
+import pytest
+
+from mct_tools.blobstore import BlobStore, digest_of
+
+
+def test_put_and_get(tmp_path):
+    store = BlobStore(str(tmp_path))
+    digest = store.put('vintage mechanical keyboard')
+    assert digest == digest_of(b'vintage mechanical keyboard') and len(digest) == 32
+    assert digest in store
+    assert store.get(digest) == b'vintage mechanical keyboard'
+    assert store.put(b'vintage mechanical keyboard') == digest
+    assert os.listdir(os.path.dirname(store.path(digest))) == [digest.hex()[2:]]
+
+
+def test_get_checks_the_hash(tmp_path):
+    store = BlobStore(str(tmp_path))
+    digest = store.put(b'boxed keyboard')
+    with open(store.path(digest), 'wb') as f:
+        f.write(b'unboxed keyboard')
+    with pytest.raises(ValueError):
+        store.get(digest)
+
+    with pytest.raises(KeyError):
+        store.get(digest_of(b'no such blob'))
+    with pytest.raises(ValueError):
+        store.get(digest[:20])
@@ -0,0 +1,34 @@
+"""
+The release profile's source rewriting.
+"""
+from mct_tools.build import release_source
+
+SOURCE = """def Main(operation, args):
+    print('Main called')
+    assert len(args) == 1, 'incorrect argument length'  # one argument
+    if operation == 'fail':
+        AssertionError('unknown operation')
+    assert len(args[0]) == 20, "invalid address"
+    raise Exception('incorrect argument length')
+    return args[0]  # print('kept')
+"""
+
+
+def test_release_source():
+    codes = {}
+    text = release_source(SOURCE, codes)
+    assert text.splitlines() == [
+        'def Main(operation, args):',
+        '    pass',
+        "    assert len(args) == 1, 1  # one argument",
+        "    if operation == 'fail':",
+        '        AssertionError(2)',
+        '    assert len(args[0]) == 20, 3',
+        '    raise Exception(1)',
+        "    return args[0]  # print('kept')",
+    ]
+    assert codes == {'incorrect argument length': 1, 'unknown operation': 2, 'invalid address': 3}
+
+    # codes are shared across the contract and the modules it imports
+    assert release_source("    assert x, 'invalid address'\n", codes) == '    assert x, 3\n'
+    assert release_source("    assert x, 'no funds'\n", codes) == '    assert x, 4\n'
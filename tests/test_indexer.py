@@ -0,0 +1,101 @@
+"""
+The off-chain indexer, on hand-written ApplicationLogs and on the logs of
+the emulated privnet.
+"""
+from mct_tools.indexer import Indexer, display_hash
+from mct_tools.srp import created_sale_id
+from mct_tools.types import int_to_bytes, to_json
+
+COIN = 10 ** 8
+ALICE = b'\x11' * 20
+CAROL = b'\x13' * 20
+SWAP = b'\x31' * 20
+CTX = b'\x41' * 20
+CTY = b'\x42' * 20
+
+
+def transfer(token, t_from, t_to, amount):
+    return token, [b'transfer', t_from, t_to, int_to_bytes(amount)]
+
+
+def log(block, txid, *notifications, **kwargs):
+    return {
+        'txid': '0x%064x' % txid,
+        'block': block,
+        'executions': [{
+            'vmstate': kwargs.get('vmstate', 'HALT'),
+            'notifications': [{'contract': display_hash(h), 'state': to_json(state)} for h, state in notifications],
+        }],
+    }
+
+
+def test_swap_fills(tmp_path):
+    index = Indexer(str(tmp_path / 'index.sqlite'), swap=[SWAP])
+    partial = [transfer(CTX, ALICE, SWAP, 10 * COIN), transfer(CTY, SWAP, ALICE, 8 * COIN),
+               transfer(CTX, SWAP, ALICE, 6 * COIN)]
+    faulted = [transfer(CTX, ALICE, SWAP, COIN), transfer(CTY, SWAP, ALICE, COIN),
+               (SWAP, [b'error', b'rate changed'])]
+    index.index([log(1, 1, *partial), log(2, 2, *faulted, vmstate='FAULT')])
+
+    fills = index.swap_fills(ALICE)
+    assert [(f['amount_in'], f['amount_out']) for f in fills] == [(4 * COIN, 8 * COIN)]
+    assert fills[0]['token_in'] == display_hash(CTX) and fills[0]['token_out'] == display_hash(CTY)
+    assert [(e['block'], e['message']) for e in index.errors()] == [(2, 'rate changed')]
+
+
+def test_checkpoint(tmp_path):
+    path = str(tmp_path / 'index.sqlite')
+    logs = [log(1, 1, transfer(CTX, ALICE, SWAP, COIN), transfer(CTY, SWAP, ALICE, COIN)),
+            log(1, 2, (SWAP, [b'error', b'first'])),
+            log(3, 3, (SWAP, [b'error', b'second']))]
+    index = Indexer(path, swap=[SWAP])
+    assert index.height == -1
+    assert index.index(logs[:2]) == 2
+    assert index.height == 1
+    index.close()
+
+    # a run that starts over only adds the blocks after the checkpoint
+    index = Indexer(path, swap=[SWAP])
+    assert index.index(logs) == 1
+    assert index.height == 3
+    assert index.index(logs) == 0
+    assert [e['message'] for e in index.errors()] == ['first', 'second']
+    assert len(index.swap_fills()) == 1
+
+
+def test_lock_withdrawals(net, deploy, tmp_path):
+    vesting = deploy('mct-vesting-contract.py')
+    net.fund('MCT', ALICE, 1000 * COIN)
+    unlock_time = net.chain.timestamp + 3600
+    net.expect(net.transfer('MCT', ALICE, vesting, 1000 * COIN, [CAROL, unlock_time, 2, 3600]))
+    net.chain.advance_to(unlock_time)
+    net.expect(net.chain.invoke(vesting, 'withdrawMany', [CAROL]))
+    net.chain.advance_to(unlock_time + 3600)
+    result = net.expect(net.chain.invoke(vesting, 'withdrawMany', [CAROL]))
+
+    index = Indexer(str(tmp_path / 'index.sqlite'), lock=[vesting])
+    index.index(net.chain.application_logs())
+    withdrawals = index.lock_withdrawals(CAROL)
+    assert [w['amount'] for w in withdrawals] == [500 * COIN, 500 * COIN]
+    assert withdrawals[1]['txid'] == '0x' + result.tx.hash[::-1].hex()
+    assert set(w['token'] for w in withdrawals) == set([display_hash(net.tokens['MCT'])])
+    assert index.lock_withdrawals(ALICE) == []
+
+
+def test_sales(net, deploy, tmp_path):
+    srp = deploy('safe-remote-purchase.py', stake=('CTX',))
+    for party in (ALICE, CAROL):
+        net.fund('CTX', party, 1000 * COIN)
+    created = net.expect(net.transfer('CTX', ALICE, srp, 200 * COIN, ['createSale', CAROL, 100 * COIN, b'']))
+    sale_id = created_sale_id(created)
+    net.chain.advance()
+    net.expect(net.transfer('CTX', CAROL, srp, 200 * COIN, ['buyerDeposit', sale_id]))
+
+    index = Indexer(str(tmp_path / 'index.sqlite'), srp=[srp])
+    index.index(net.chain.application_logs())
+    found = index.sale_by_txid(created.tx.hash)
+    assert found == index.sale_by_txid('0x' + created.tx.hash[::-1].hex())
+    assert found['sale_id'] == sale_id.hex() and found['price'] == 100 * COIN
+    assert (found['state'], found['created_block']) == ('awaiting shipment', found['updated_block'] - 1)
+    assert index.sales(seller=ALICE) == index.sales(buyer=CAROL) == [found]
+    assert index.sale_by_txid(b'\x00' * 32) is None
@@ -0,0 +1,34 @@
+"""
+The load simulation harness, on small scenarios.
+"""
+import pytest
+
+from mct_tools import loadsim
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert loadsim.percentile(values, 0.5) == 50
+    assert loadsim.percentile(values, 0.99) == 99
+    assert loadsim.percentile([7], 0.99) == 7
+
+
+@pytest.mark.parametrize('workload', sorted(loadsim.WORKLOADS))
+def test_scenarios_are_reproducible(workload):
+    task = (workload, 3, 6, 40, 4, 'native', None)
+    try:
+        first = loadsim.run_scenario(task)
+    except RuntimeError as e:  # no build, and no neo-boa to make one
+        pytest.skip(str(e))
+    second = loadsim.run_scenario(task)
+    assert first['invocations'] == second['invocations']
+    assert first['footprint'] == second['footprint']
+    assert len(first['invocations']) == 40 and first['blocks'] == 10
+    assert any(state == 'ok' for label, state, reason, gas, opcodes, written in first['invocations'])
+
+    summary = loadsim.summarize([first, second], 1.0)
+    report = summary['workloads'][workload]
+    assert summary['invocations'] == 80 and report['scenarios'] == 2
+    assert sum(op['count'] for op in report['operations'].values()) == 80
+    assert sum(report['failures'].values()) == sum(op['failed'] for op in report['operations'].values())
+    assert workload in loadsim.format_report(summary)
@@ -0,0 +1,71 @@
+"""
+mct-lock-contract.py on the emulated privnet, with the MCT stand-in and
+with mct-privnet.avm, which has no conditional operations.
+"""
+import pytest
+
+from mct_tools.bench import LOCK_PARTY2, LOCK_UNLOCK_TIME
+from mct_tools.mct import PRIVNET_OWNER
+from mct_tools.privnet import Privnet
+from mct_tools.types import to_bool, to_bytes
+
+COIN = 10 ** 8
+BOB = b'\x12' * 20
+CAROL = b'\x13' * 20
+
+
+@pytest.fixture(params=['native', 'avm'])
+def net(request):
+    return Privnet(mct=request.param)
+
+
+@pytest.fixture
+def lock(net, deploy):
+    contract = deploy('mct-lock-contract.py', stake=())
+    net.expect(net.transfer('MCT', PRIVNET_OWNER, contract, 20000 * COIN))
+    return contract
+
+
+def payee(net, lock):
+    return to_bytes(net.expect(net.chain.invoke(lock, 'getCurrentPayee'), value=None).result)
+
+
+def propose(net, lock, new_payee, signer):
+    return net.chain.invoke(lock, 'setNewPayee', [new_payee], signers=[signer])
+
+
+@pytest.mark.parametrize('first, second', [(PRIVNET_OWNER, LOCK_PARTY2), (LOCK_PARTY2, PRIVNET_OWNER)])
+def test_payee_change_needs_both_parties(net, lock, first, second):
+    assert payee(net, lock) == LOCK_PARTY2
+    net.expect(propose(net, lock, CAROL, first))
+    assert payee(net, lock) == LOCK_PARTY2
+    net.expect(propose(net, lock, CAROL, second))
+    assert payee(net, lock) == CAROL
+
+    # CAROL is now the one whose approval counts
+    net.expect(propose(net, lock, BOB, PRIVNET_OWNER))
+    assert not to_bool(propose(net, lock, BOB, LOCK_PARTY2).result)
+    assert payee(net, lock) == CAROL
+    net.expect(propose(net, lock, BOB, CAROL))
+    assert payee(net, lock) == BOB
+
+
+def test_different_proposals(net, lock):
+    net.expect(propose(net, lock, CAROL, PRIVNET_OWNER))
+    net.expect(propose(net, lock, BOB, LOCK_PARTY2))
+    assert payee(net, lock) == LOCK_PARTY2
+    net.expect(propose(net, lock, BOB, PRIVNET_OWNER))
+    assert payee(net, lock) == BOB
+
+    assert not to_bool(propose(net, lock, CAROL, CAROL).result)
+    assert not to_bool(propose(net, lock, bytes(20), PRIVNET_OWNER).result)
+
+
+def test_withdraw_pays_the_current_payee(net, lock):
+    net.expect(propose(net, lock, CAROL, PRIVNET_OWNER))
+    net.expect(propose(net, lock, CAROL, LOCK_PARTY2))
+    assert not to_bool(net.chain.invoke(lock, 'withdraw').result)
+    net.chain.advance_to(LOCK_UNLOCK_TIME)
+    net.expect(net.chain.invoke(lock, 'withdraw'))
+    assert net.balance('MCT', CAROL) == 20000 * COIN
+    assert net.balance('MCT', lock) == 0
@@ -0,0 +1,180 @@
+"""
+Staked storage and transfer operations of the MCT stand-in, called from
+minimal hand-assembled contracts so no compiler is needed.
+"""
+import pytest
+
+from mct_tools import multisend, opcodes as op
+from mct_tools.chain import ScriptBuilder
+from mct_tools.mct import MAX_BATCH_KEYS, MIN_STORAGE_STAKE, PRIVNET_OWNER
+from mct_tools.types import to_bool, to_bytes
+
+ALICE = b'\x11' * 20
+BOB = b'\x12' * 20
+
+
+def deploy_script(net, script, stake=True, whitelist=False):
+    contract = net.chain.deploy(script)
+    if stake:
+        net.fund('MCT', contract, MIN_STORAGE_STAKE)
+    if whitelist:
+        net.expect(net.chain.invoke(net.tokens['MCT'], 'whitelistContract', [contract, True],
+                                    signers=[PRIVNET_OWNER]))
+    return contract
+
+
+def forwarder(net):
+    """A contract script that passes its operation and arguments on to MCT."""
+    return bytes([op.APPCALL]) + net.tokens['MCT'] + bytes([op.RET])
+
+
+def receiver(net, value, stake=True):
+    """A whitelisted contract whose onTokenTransfer returns ``value``."""
+    script = ScriptBuilder().emit(op.DROP).emit(op.DROP).emit_push(value).emit(op.RET).to_bytes()
+    return deploy_script(net, script, stake=stake, whitelist=True)
+
+
+@pytest.fixture
+def proxy(net):
+    """Invoke an MCT operation from a staked contract."""
+    contract = deploy_script(net, forwarder(net))
+
+    def call(operation, *args):
+        result = net.chain.invoke(contract, operation, list(args))
+        assert result.halted, result.fault
+        return result.result
+    return call
+
+
+def test_batch_limit(proxy):
+    keys = [b'k%d' % i for i in range(MAX_BATCH_KEYS)]
+    assert to_bool(proxy('PutMany', keys, [b'v'] * len(keys)))
+    assert [to_bytes(v) for v in proxy('GetMany', keys)] == [b'v'] * len(keys)
+
+    too_many = keys + [b'extra']
+    assert not to_bool(proxy('PutMany', too_many, [b'v'] * len(too_many)))
+    assert not to_bool(proxy('GetMany', too_many))
+    assert not to_bool(proxy('DeleteMany', too_many))
+    assert not to_bool(proxy('GetMany', []))
+    assert not to_bool(proxy('PutMany', keys, [b'v']))
+
+    assert to_bool(proxy('DeleteMany', keys))
+    assert [to_bytes(v) for v in proxy('GetMany', keys)] == [b''] * len(keys)
+
+
+def test_batch_needs_stake(net):
+    contract = deploy_script(net, forwarder(net), stake=False)
+    assert not to_bool(net.chain.invoke(contract, 'PutMany', [[b'key'], [b'value']]).result)
+    # nor can a transaction call it directly
+    assert not to_bool(net.chain.invoke(net.tokens['MCT'], 'PutMany', [[b'key'], [b'value']]).result)
+
+
+def test_deferred_writes(net):
+    net.fund('MCT', ALICE, 100)
+    contract = receiver(net, [True, [b'paid', b'old'], [b'yes', b'']])
+    net.put_staked('MCT', contract, b'old', b'value')
+    net.expect(net.transfer('MCT', ALICE, contract, 10, b'extra'))
+    assert net.staked_items('MCT', contract) == {b'paid': b'yes'}
+    assert net.balance('MCT', ALICE) == 90
+
+    # a plain True still accepts the transfer
+    net.expect(net.transfer('MCT', ALICE, receiver(net, True), 10, b'extra'))
+    assert net.balance('MCT', ALICE) == 80
+
+
+@pytest.mark.parametrize('value, stake', [
+    ([True, [b'paid'], [b'yes', b'no']], True),  # lists differ in length
+    ([True, [b'k%d' % i for i in range(MAX_BATCH_KEYS + 1)], [b'v'] * (MAX_BATCH_KEYS + 1)], True),
+    ([False, [b'paid'], [b'yes']], True),
+    ([True, [b'paid'], [b'yes']], False),
+])
+def test_deferred_writes_rejected(net, value, stake):
+    net.fund('MCT', ALICE, 100)
+    contract = receiver(net, value, stake)
+    assert not to_bool(net.transfer('MCT', ALICE, contract, 10, b'extra').result)
+    assert net.staked_items('MCT', contract) == {}
+    assert net.balance('MCT', ALICE) == 100
+
+
+def test_conditional_operations(proxy):
+    assert to_bool(proxy('PutIfAbsent', b'key', b'one'))
+    assert not to_bool(proxy('PutIfAbsent', b'key', b'two'))
+    assert to_bytes(proxy('Get', b'key')) == b'one'
+
+    assert not to_bool(proxy('CompareAndSwap', b'key', b'two', b'three'))
+    assert to_bool(proxy('CompareAndSwap', b'key', b'one', b'three'))
+    assert to_bytes(proxy('Get', b'key')) == b'three'
+
+    assert not to_bool(proxy('DeleteIfEquals', b'key', b'one'))
+    assert to_bool(proxy('DeleteIfEquals', b'key', b'three'))
+    assert to_bytes(proxy('Get', b'key')) == b''
+
+    # an empty expected value matches a key that is not set
+    assert to_bool(proxy('CompareAndSwap', b'key', b'', b'four'))
+    assert to_bytes(proxy('Get', b'key')) == b'four'
+
+
+def test_conditional_operations_need_stake(net):
+    contract = deploy_script(net, forwarder(net), stake=False)
+    assert not to_bool(net.chain.invoke(contract, 'PutIfAbsent', [b'key', b'value']).result)
+    assert not to_bool(net.chain.invoke(contract, 'CompareAndSwap', [b'key', b'', b'value']).result)
+    assert net.staked_items('MCT', contract) == {}
+
+
+def test_transfer_multi(net):
+    mct = net.tokens['MCT']
+    net.fund('MCT', ALICE, 100)
+    payload = multisend.pack([(BOB, 30), (PRIVNET_OWNER, 20), (BOB, 5)])
+    result = net.expect(net.chain.invoke(mct, 'transferMulti', [ALICE, payload], signers=[ALICE]))
+    assert len(result.notifications) == 3
+    assert net.balance('MCT', ALICE) == 45
+    assert net.balance('MCT', BOB) == 35
+
+    # the sender's witness and balance cover the whole payload
+    assert not to_bool(net.chain.invoke(mct, 'transferMulti', [ALICE, payload], signers=[BOB]).result)
+    payload = multisend.pack([(BOB, 40), (BOB, 10)])
+    assert not to_bool(net.chain.invoke(mct, 'transferMulti', [ALICE, payload], signers=[ALICE]).result)
+    for payload in (multisend.pack([(BOB, 0)]), multisend.pack([(BOB, 1)])[:-1], b''):
+        assert not to_bool(net.chain.invoke(mct, 'transferMulti', [ALICE, payload], signers=[ALICE]).result)
+    assert net.balance('MCT', ALICE) == 45
+
+
+def test_transfer_multi_rejects_whitelisted_contracts(net):
+    mct = net.tokens['MCT']
+    net.fund('MCT', ALICE, 100)
+    contract = receiver(net, True)
+    payload = multisend.pack([(BOB, 10), (contract, 10)])
+    assert not to_bool(net.chain.invoke(mct, 'transferMulti', [ALICE, payload], signers=[ALICE]).result)
+    assert net.balance('MCT', ALICE) == 100
+    assert net.balance('MCT', BOB) == 0
+
+
+def find_all(proxy, prefix, limit):
+    found = []
+    pages = 0
+    cursor = b''
+    while True:
+        page = proxy('Find', prefix, cursor, limit)
+        assert [to_bytes(v) for v in page[1]] == [b'v' + to_bytes(k) for k in page[0]]
+        found.extend(to_bytes(k) for k in page[0])
+        cursor = to_bytes(page[2])
+        pages += 1
+        if not cursor:
+            return found, pages
+
+
+def test_find_pages(net, proxy):
+    keys = [b'p/%02d' % i for i in range(10)]
+    assert to_bool(proxy('PutMany', keys, [b'v' + key for key in keys]))
+    assert to_bool(proxy('Put', b'q/00', b'other prefix'))
+    # another contract's keys with the same prefix
+    other = deploy_script(net, bytes([op.NOP]) + forwarder(net))
+    assert to_bool(net.chain.invoke(other, 'Put', [b'p/05x', b'other contract']).result)
+
+    assert find_all(proxy, b'p/', 4) == (keys, 3)
+    assert find_all(proxy, b'p/', 5) == (keys, 2)
+    assert find_all(proxy, b'p/0', MAX_BATCH_KEYS) == (keys, 1)
+
+    assert not to_bool(proxy('Find', b'p/', b'q/00', 4))
+    assert not to_bool(proxy('Find', b'p/', b'', MAX_BATCH_KEYS + 1))
+    assert not to_bool(proxy('Find', b'p/', b'', 0))
@@ -0,0 +1,50 @@
+"""
+Reading recipient lists and splitting them into transferMulti batches.
+"""
+import pytest
+
+from mct_tools import multisend
+from mct_tools.mct import PRIVNET_HASH
+
+ALICE = b'\x11' * 20
+OWNER = bytes.fromhex('23ba2703c53263e8d6e522dc32203339dcd8eee9')  # AK2nJJpJr6o664CWJKi1QRXjqeic2zRp8y
+
+
+def test_parse_amount():
+    assert multisend.parse_amount('3000') == 3000 * 10 ** 8
+    assert multisend.parse_amount(' 12.5 ') == 1250000000
+    assert multisend.parse_amount('0.00000001') == 1
+    for text in ('0', '-1', '0.000000001', 'ten', '92233720368.54775808'):
+        with pytest.raises(ValueError):
+            multisend.parse_amount(text)
+
+
+def test_read_recipients():
+    lines = [
+        'address,amount',
+        'AK2nJJpJr6o664CWJKi1QRXjqeic2zRp8y,3000',
+        '',
+        '# refunds',
+        '0x' + ALICE[::-1].hex() + ',12.5',
+    ]
+    assert multisend.read_recipients(lines) == [(OWNER, 3000 * 10 ** 8), (ALICE, 1250000000)]
+
+    with pytest.raises(ValueError, match='line 2'):
+        multisend.read_recipients(['address,amount', 'AK2nJJpJr6o664CWJKi1QRXjqeic2zRp8z,1'])
+    with pytest.raises(ValueError, match='line 1'):
+        multisend.read_recipients(['AK2nJJpJr6o664CWJKi1QRXjqeic2zRp8y,1,2'])
+
+
+def test_batches():
+    recipients = [(bytes([i % 256]) * 20, i + 1) for i in range(8000)]
+    split = multisend.batches(recipients, PRIVNET_HASH, OWNER)
+    assert [len(b) for b in split] == [3636, 3636, 728]
+    assert sum(split, []) == recipients
+    for batch in split:
+        script = multisend.invocation_script(PRIVNET_HASH, OWNER, batch)
+        assert multisend.transaction_size(script) <= multisend.MAX_TRANSACTION_SIZE
+
+    assert [len(b) for b in multisend.batches(recipients[:10], PRIVNET_HASH, OWNER, max_count=4)] == [4, 4, 2]
+    assert [len(b) for b in multisend.batches(recipients[:10], PRIVNET_HASH, OWNER, max_size=1024)] == [10]
+    with pytest.raises(ValueError):
+        multisend.batches(recipients, PRIVNET_HASH, OWNER, max_size=512)
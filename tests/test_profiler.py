@@ -0,0 +1,41 @@
+"""
+The GAS profiler, on a hand-assembled script and on a contract built with
+its debug map.
+"""
+from mct_tools import opcodes as op
+from mct_tools.chain import ScriptBuilder
+from mct_tools.mct import PRIVNET_OWNER
+from mct_tools.profiler import Profiler
+
+
+def test_frames_without_a_debug_map(net):
+    profiler = Profiler(net.chain)
+    # entry: CALL sub; RET   sub: PUSH1 PUSH1 ADD RET
+    script = ScriptBuilder().emit(op.CALL, (4).to_bytes(2, 'little')).emit(op.RET)
+    script.emit(op.PUSH1).emit(op.PUSH1).emit(op.ADD).emit(op.RET)
+    result = net.chain.run_script(script.to_bytes())
+    profile = profiler.profile_of(result)
+
+    assert [row[0] for row in profile.functions()] == ['tx:entry', 'tx:sub_0004']
+    assert profile.folded('opcodes') == 'tx:entry 2\ntx:entry;tx:sub_0004 4\n'
+    assert (profile.total_gas, profile.total_opcodes) == (result.gas_units, result.opcodes)
+
+
+def test_contract_functions(net, deploy):
+    dapp = deploy('mct-dapp-template.py')
+    profiler = Profiler(net.chain)
+    result = net.expect(net.transfer('MCT', PRIVNET_OWNER, dapp, 100))
+    profile = profiler.profile_of(result)
+    assert (profile.total_gas, profile.total_opcodes) == (result.gas_units, result.opcodes)
+
+    rows = dict((row[0], row[1:]) for row in profile.functions())
+    # the stand-in MCT is one frame per operation, the contract is split by function
+    assert rows['MCT:transfer'][0] == result.gas_units - rows['tx:entry'][1]
+    assert rows['mct-dapp-template:Main'][0] >= rows['mct-dapp-template:handle_token_received'][0]
+    assert rows['MCT:Put'][3] == 1
+    assert 'mct-dapp-template.py:' in profile.table()
+
+    folded = profile.folded()
+    assert sum(int(line.rsplit(' ', 1)[1]) for line in folded.splitlines()) == result.gas_units
+    assert 'tx:entry;MCT:transfer;mct-dapp-template:Main;mct-dapp-template:handle_token_received' in folded
+    assert profile.svg('transfer').startswith('<svg')
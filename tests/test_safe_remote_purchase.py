@@ -0,0 +1,198 @@
+"""
+safe-remote-purchase.py on the emulated privnet.
+"""
+import pytest
+
+from mct_tools.privnet import ZERO_OWNER
+from mct_tools.blobstore import BlobStore
+from mct_tools.srp import (created_sale_id, create_sale_args, decode_legacy_sale, decode_sale, encode_legacy_sale,
+                            sale_description)
+from mct_tools.types import to_bool, to_bytes
+
+COIN = 10 ** 8
+ALICE = b'\x11' * 20
+BOB = b'\x12' * 20
+CAROL = b'\x13' * 20
+PRICE = 100 * COIN
+
+
+@pytest.fixture
+def srp(net, deploy):
+    contract = deploy('safe-remote-purchase.py', stake=('CTX',))
+    for party in (ALICE, BOB, CAROL):
+        net.fund('CTX', party, 10000 * COIN)
+    return contract
+
+
+def create_sale(net, srp, seller=ALICE, buyer=BOB, description=b''):
+    created = net.expect(net.transfer('CTX', seller, srp, 2 * PRICE, ['createSale', buyer, PRICE, description]))
+    return created_sale_id(created)
+
+
+def sale(net, srp, sale_id):
+    return decode_sale(to_bytes(net.expect(net.chain.invoke(srp, 'sale', [sale_id]), value=None).result))
+
+
+def test_sale_record(net, srp):
+    record = sale(net, srp, create_sale(net, srp))
+    assert record['state'] == 'new'
+    assert (record['seller'], record['buyer'], record['price']) == (ALICE, BOB, PRICE)
+    assert sale(net, srp, create_sale(net, srp, buyer=b''))['buyer'] is None
+
+
+def test_owner_stakes_without_terms(net, srp):
+    net.fund('CTX', ZERO_OWNER, 100 * COIN)
+    assert to_bool(net.transfer('CTX', ZERO_OWNER, srp, 100 * COIN).result)
+    assert not net.transfer('CTX', ALICE, srp, 100 * COIN).halted
+
+
+def put_legacy_sale(net, srp, legacy_id, state):
+    record = encode_legacy_sale(legacy_id, ALICE, BOB, PRICE, b'boxed keyboard', state)
+    net.put_staked('CTX', srp, b'sales/' + legacy_id, record)
+    return record
+
+
+def test_legacy_sale_is_converted(net, srp):
+    legacy_id = b'\x42' * 32
+    record = put_legacy_sale(net, srp, legacy_id, 'awaiting shipment')
+    assert decode_legacy_sale(record)['state'] == 'awaiting shipment'
+    converted = sale(net, srp, legacy_id)
+    assert converted['state'] == 'awaiting shipment'
+    assert (converted['seller'], converted['buyer'], converted['price']) == (ALICE, BOB, PRICE)
+
+    net.expect(net.chain.invoke(srp, 'confirmShipment', [legacy_id], signers=[ALICE]))
+    assert sale(net, srp, legacy_id)['state'] == 'shipment confirmed'
+    assert net.staked_items('CTX', srp)[b'state/' + legacy_id][:1] == b'\x03'
+
+    net.expect(net.chain.invoke(srp, 'confirmReceived', [legacy_id], signers=[BOB]))
+    assert not net.chain.invoke(srp, 'sale', [legacy_id]).halted
+    assert net.balance('CTX', ALICE) == 10000 * COIN + 3 * PRICE
+
+
+def test_legacy_sale_deposit(net, srp):
+    legacy_id = b'\x43' * 32
+    put_legacy_sale(net, srp, legacy_id, 'new')
+    net.expect(net.transfer('CTX', BOB, srp, 2 * PRICE, ['buyerDeposit', legacy_id]))
+    assert sale(net, srp, legacy_id)['state'] == 'awaiting shipment'
+
+
+def test_migrate_sale(net, srp):
+    legacy_id = b'\x44' * 32
+    put_legacy_sale(net, srp, legacy_id, 'new')
+    net.expect(net.chain.invoke(srp, 'migrateSale', [legacy_id]))
+    stored = net.staked_items('CTX', srp)
+    assert stored[b'sales/' + legacy_id][:20] == ALICE
+    assert stored[b'state/' + legacy_id] == b'\x01' + BOB
+    assert sale(net, srp, legacy_id)['state'] == 'new'
+    assert not net.chain.invoke(srp, 'migrateSale', [b'\x45' * 32]).halted
+
+    again = net.chain.invoke(srp, 'migrateSale', [legacy_id])
+    assert not again.halted and to_bytes(again.result) == b'sale already migrated'
+
+
+def shipped_sale(net, srp, seller=ALICE, buyer=BOB):
+    sale_id = create_sale(net, srp, seller, buyer)
+    net.expect(net.transfer('CTX', buyer, srp, 2 * PRICE, ['buyerDeposit', sale_id]))
+    net.expect(net.chain.invoke(srp, 'confirmShipment', [sale_id], signers=[seller]))
+    return sale_id
+
+
+def test_confirm_received(net, srp):
+    sale_id = shipped_sale(net, srp)
+    assert not net.chain.invoke(srp, 'confirmReceived', [sale_id], signers=[ALICE]).halted
+    net.expect(net.chain.invoke(srp, 'confirmReceived', [sale_id], signers=[BOB]))
+    assert net.balance('CTX', ALICE) == 10000 * COIN + PRICE
+    assert net.balance('CTX', BOB) == 10000 * COIN - PRICE
+    assert not net.chain.invoke(srp, 'sale', [sale_id]).halted
+
+
+def test_confirm_received_keeps_sale_if_payout_fails(net, srp):
+    # a sale worth more than the contract holds
+    price = (10 ** 6 * COIN).to_bytes(8, 'little')
+    sale_id = b'\x7f'
+    net.put_staked('CTX', srp, b's' + sale_id, ALICE + bytes([len(price)]) + price)
+    net.put_staked('CTX', srp, b't' + sale_id, b'\x03' + BOB)
+    assert not net.chain.invoke(srp, 'confirmReceived', [sale_id], signers=[BOB]).halted
+    assert sale(net, srp, sale_id)['state'] == 'shipment confirmed'
+
+
+def test_confirm_received_many(net, srp):
+    sale_ids = [shipped_sale(net, srp) for _ in range(3)] + [shipped_sale(net, srp, seller=CAROL)]
+    assert not net.chain.invoke(srp, 'confirmReceivedMany', [sale_ids + sale_ids[:1]], signers=[BOB]).halted
+    result = net.expect(net.chain.invoke(srp, 'confirmReceivedMany', [sale_ids], signers=[BOB]))
+    assert len([n for n in result.notifications if n[1][0] == b'transfer']) == 3  # BOB, ALICE, CAROL
+    assert net.balance('CTX', ALICE) == 10000 * COIN + 3 * PRICE
+    assert net.balance('CTX', CAROL) == 10000 * COIN + PRICE
+    assert net.balance('CTX', BOB) == 10000 * COIN - 4 * PRICE
+    for sale_id in sale_ids:
+        assert not net.chain.invoke(srp, 'sale', [sale_id]).halted
+
+
+def sales_by(net, srp, party, offset=0, limit=32):
+    page = net.expect(net.chain.invoke(srp, 'salesBy', [party, offset, limit]), value=None).result
+    return [page[0]] + [to_bytes(sale_id) for sale_id in page[1:]]
+
+
+def test_sales_by(net, srp):
+    new = create_sale(net, srp)
+    shipped = shipped_sale(net, srp)
+    closed = shipped_sale(net, srp)
+    net.expect(net.chain.invoke(srp, 'confirmReceived', [closed], signers=[BOB]))
+
+    assert sales_by(net, srp, ALICE) == [3, new, shipped]
+    assert sales_by(net, srp, ALICE, 1, 1) == [3, shipped]
+    assert sales_by(net, srp, BOB) == [2, shipped]
+    assert sales_by(net, srp, CAROL) == [0]
+
+    assert not to_bool(net.chain.invoke(srp, 'salesBy', [ALICE[:19], 0, 10]).result)
+    assert not net.chain.invoke(srp, 'salesBy', [ALICE, 0, 33]).halted
+
+
+def test_sales_page(net, srp):
+    sale_ids = [create_sale(net, srp) for _ in range(4)]
+    net.expect(net.chain.invoke(srp, 'deleteSale', [sale_ids[1]], signers=[ALICE]))
+
+    found = []
+    cursor = b''
+    pages = 0
+    while True:
+        page = net.expect(net.chain.invoke(srp, 'salesPage', [ALICE, cursor, 2]), value=None).result
+        found.extend(to_bytes(sale_id) for sale_id in page[1:])
+        cursor = to_bytes(page[0])
+        pages += 1
+        if not cursor:
+            break
+    assert sorted(found) == sorted(sale_ids[:1] + sale_ids[2:])
+    assert pages == 2
+
+    assert not to_bool(net.chain.invoke(srp, 'salesPage', [ALICE[:19], b'', 10]).result)
+    assert not net.chain.invoke(srp, 'salesPage', [ALICE, b'', 65]).halted
+
+
+def test_description_hash(net, srp, tmp_path):
+    store = BlobStore(str(tmp_path))
+    text = 'a description of exactly 32 byte'
+    created = net.expect(net.transfer('CTX', ALICE, srp, 2 * PRICE, create_sale_args(store, BOB, PRICE, text)))
+    record = sale(net, srp, created_sale_id(created))
+    assert record['description'] is None
+    assert sale_description(store, record) == text.encode()
+
+    record = sale(net, srp, create_sale(net, srp))
+    assert record['description_hash'] is None and sale_description(store, record) == b''
+
+    assert not net.transfer('CTX', ALICE, srp, 2 * PRICE, ['createSale', BOB, PRICE, b'too short']).halted
+
+
+def test_legacy_sale_keeps_its_text(net, srp, tmp_path):
+    store = BlobStore(str(tmp_path))
+    legacy_id = b'\x46' * 32
+    text = b'32 bytes of text, not a hash....'
+    record = encode_legacy_sale(legacy_id, ALICE, BOB, PRICE, text, 'awaiting shipment')
+    net.put_staked('CTX', srp, b'sales/' + legacy_id, record)
+    assert sale_description(store, decode_sale(record)) == text
+    assert sale_description(store, sale(net, srp, legacy_id)) == text
+
+    net.expect(net.chain.invoke(srp, 'migrateSale', [legacy_id]))
+    migrated = sale(net, srp, legacy_id)
+    assert migrated['state'] == 'awaiting shipment' and migrated['description'] == text
+    assert migrated['description_hash'] is None
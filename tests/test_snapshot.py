@@ -0,0 +1,59 @@
+"""
+Saving and loading emulated privnet state.
+"""
+import pytest
+
+from mct_tools import snapshot
+from mct_tools.srp import created_sale_id, decode_sale
+from mct_tools.types import to_bytes
+
+COIN = 10 ** 8
+ALICE = b'\x11' * 20
+BOB = b'\x12' * 20
+
+
+def test_round_trip(net, tmp_path):
+    path = str(tmp_path / 'mct.snap')
+    net.fund('MCT', ALICE, 100 * COIN)
+    net.chain.advance(5)
+    snapshot.save(net, path)
+    loaded = snapshot.load(path)
+
+    assert loaded.tokens == net.tokens
+    assert sorted(loaded.chain.contracts) == sorted(net.chain.contracts)
+    assert loaded.chain.storage.contracts == net.chain.storage.contracts
+    assert [h.hash for h in loaded.chain.headers] == [h.hash for h in net.chain.headers]
+    assert loaded.chain.nonce == net.chain.nonce
+
+    # the loaded chain carries on independently of the one saved
+    loaded.expect(loaded.transfer('MCT', ALICE, BOB, 40 * COIN))
+    assert (loaded.balance('MCT', ALICE), loaded.balance('MCT', BOB)) == (60 * COIN, 40 * COIN)
+    assert (net.balance('MCT', ALICE), net.balance('MCT', BOB)) == (100 * COIN, 0)
+    assert 'height %d' % net.chain.height in snapshot.info(path)
+
+
+def sale_state(net, srp, sale_id):
+    return decode_sale(to_bytes(net.chain.invoke(srp, 'sale', [sale_id]).result))['state']
+
+
+def test_contract_state(net, deploy, tmp_path):
+    path = str(tmp_path / 'srp.snap')
+    srp = deploy('safe-remote-purchase.py', stake=('CTX',))
+    for party in (ALICE, BOB):
+        net.fund('CTX', party, 1000 * COIN)
+    created = net.expect(net.transfer('CTX', ALICE, srp, 200 * COIN, ['createSale', BOB, 100 * COIN, b'']))
+    sale_id = created_sale_id(created)
+    snapshot.save(net, path)
+
+    loaded = snapshot.load(path)
+    assert loaded.chain.contracts[srp].script == net.chain.contracts[srp].script
+    loaded.expect(loaded.transfer('CTX', BOB, srp, 200 * COIN, ['buyerDeposit', sale_id]))
+    assert sale_state(loaded, srp, sale_id) == 'awaiting shipment'
+    assert sale_state(net, srp, sale_id) == 'new'
+
+
+def test_not_a_snapshot(tmp_path):
+    path = tmp_path / 'other.snap'
+    path.write_bytes(b'MCTSNAP0' + bytes(8))
+    with pytest.raises(ValueError):
+        snapshot.load(str(path))
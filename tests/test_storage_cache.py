@@ -0,0 +1,58 @@
+"""
+mct_storage.py, through the test contract in tests/contracts.
+"""
+import pytest
+
+from mct_tools.profiler import Profiler
+from mct_tools.types import to_bytes
+
+
+@pytest.fixture
+def cache(net, deploy):
+    return deploy('tests/contracts/storage_cache.py')
+
+
+def mct_calls(net, cache, operation, writes, read_keys=()):
+    """Run ``operation`` and return ({MCT operation: calls}, result)."""
+    profiler = Profiler(net.chain)
+    result = net.expect(net.chain.invoke(cache, operation, [writes, list(read_keys)]), value=None)
+    calls = {}
+    for frame, incl, own, opcodes, count in profiler.profile_of(result).functions():
+        if frame.startswith('MCT:') and count:
+            calls[frame[4:]] = count
+    return calls, result
+
+
+def test_flush_coalesces_writes(net, cache):
+    calls, _ = mct_calls(net, cache, 'write', [[b'a', b'1'], [b'b', b'1'], [b'c', b'1']])
+    assert calls == {'PutMany': 1}
+
+    # a key written twice is stored once, a key written and then deleted is only deleted
+    writes = [[b'a', b'2'], [b'a', b'3'], [b'b', b'2'], [b'b', b''], [b'c', b''], [b'd', b'1'], [b'd', b'']]
+    calls, _ = mct_calls(net, cache, 'write', writes)
+    assert calls == {'Put': 1, 'DeleteMany': 1}
+    assert net.staked_items('MCT', cache) == {b'a': b'3'}
+
+    assert mct_calls(net, cache, 'write', [])[0] == {}
+
+
+def test_flush_splits_batches(net, cache):
+    writes = [[bytes([i]), b'\x01'] for i in range(1, 66)]
+    calls, _ = mct_calls(net, cache, 'write', writes)
+    assert calls == {'PutMany': 1, 'Put': 1}
+    assert len(net.staked_items('MCT', cache)) == 65
+
+    calls, _ = mct_calls(net, cache, 'write', [[key, b''] for key, value in writes])
+    assert calls == {'DeleteMany': 1, 'Delete': 1}
+    assert net.staked_items('MCT', cache) == {}
+
+
+def test_reads_see_the_writes(net, cache):
+    mct_calls(net, cache, 'write', [[b'a', b'1'], [b'b', b'1']])
+    calls, result = mct_calls(net, cache, 'read', [[b'a', b'2'], [b'c', b'']], [b'a', b'b', b'c', b'd'])
+    assert [to_bytes(v) for v in result.result] == [b'2', b'1', b'', b'']
+    assert calls == {'GetMany': 1}
+
+    calls, result = mct_calls(net, cache, 'read', [], [b'b'])
+    assert [to_bytes(v) for v in result.result] == [b'1']
+    assert calls == {'Get': 1}
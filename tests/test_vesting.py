@@ -0,0 +1,60 @@
+"""
+mct-vesting-contract.py on the emulated privnet.
+"""
+import pytest
+
+from mct_tools.types import to_bytes, to_int
+
+COIN = 10 ** 8
+ALICE = b'\x11' * 20
+CAROL = b'\x13' * 20
+
+
+@pytest.fixture
+def vesting(net, deploy):
+    contract = deploy('mct-vesting-contract.py')
+    net.fund('MCT', ALICE, 100000 * COIN)
+    return contract
+
+
+def lock(net, vesting, amount, *terms):
+    unlock_time = net.chain.timestamp + 3600
+    return net.expect(net.transfer('MCT', ALICE, vesting, amount, [CAROL, unlock_time] + list(terms)))
+
+
+def locks_of(net, vesting, payee=CAROL):
+    ids = to_bytes(net.chain.invoke(vesting, 'locksOf', [payee]).result)
+    return [ids[i:i + 32] for i in range(0, len(ids), 32)]
+
+
+def test_lock_list_is_capped(net, vesting):
+    created = [lock(net, vesting, COIN).tx.hash for _ in range(30)]
+    assert locks_of(net, vesting) == created
+
+    unlock_time = net.chain.timestamp + 3600
+    result = net.transfer('MCT', ALICE, vesting, COIN, [CAROL, unlock_time])
+    assert result.state == 'FAULT' and net.balance('MCT', ALICE) == 99970 * COIN
+
+    net.expect(net.chain.invoke(vesting, 'rejectLock', [created[5]], signers=[CAROL]))
+    extra = lock(net, vesting, COIN).tx.hash
+    assert locks_of(net, vesting) == created[:5] + created[6:] + [extra]
+
+
+def test_only_the_payee_rejects(net, vesting):
+    lock_id = lock(net, vesting, 10 * COIN).tx.hash
+    result = net.chain.invoke(vesting, 'rejectLock', [lock_id], signers=[ALICE])
+    assert result.state == 'FAULT'
+    assert locks_of(net, vesting) == [lock_id]
+
+
+def test_reject_refunds_unpaid_tranches(net, vesting):
+    kept = lock(net, vesting, 10 * COIN).tx.hash
+    lock_id = lock(net, vesting, 1000 * COIN, 4, 3600).tx.hash
+    net.chain.advance_to(net.chain.timestamp + 3600)
+    net.expect(net.chain.invoke(vesting, 'withdrawMany', [CAROL]))
+    assert net.balance('MCT', CAROL) == 260 * COIN
+
+    refund = net.chain.invoke(vesting, 'rejectLock', [lock_id], signers=[CAROL])
+    assert to_int(net.expect(refund).result) == 750 * COIN
+    assert net.balance('MCT', ALICE) == (100000 - 260) * COIN
+    assert locks_of(net, vesting) == []